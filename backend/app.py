@@ -1,29 +1,426 @@
 # app.py
 
+import math
 import os
+import time
 
+import click
 from flask_cors import CORS
-from flask import Flask, request, jsonify
+from flask import Flask, current_app, request, jsonify, send_file
 from dotenv import load_dotenv
 from flask_jwt_extended import (
     JWTManager, create_access_token,
     jwt_required, get_jwt_identity
 )
-from werkzeug.security import generate_password_hash, check_password_hash
-from base64 import b64encode, b64decode
+from base64 import b64decode
 from datetime import datetime
-from sqlalchemy import func  # Dodany import
+from sqlalchemy import event, func  # Dodany import
+from sqlalchemy.orm import load_only
 
-from db_models import db, User, Product, TransportType, Order, Province
+from db_models import (
+    db, User, Product, TransportType, Order, Province, ReportJob, Vehicle, VehicleUnavailability,
+    TransportAssignment,
+)
+from database import database_uri_from_env, configure_database, init_database, insert_returning_ids
+from image_store import init_image_store, get_image_store
+from thumbnails import init_thumbnails, get_thumbnails, VARIANTS
+from catalog_cache import init_catalog_cache, catalog_cached, commit_catalog_change
+from streaming import stream_json_array, stream_ndjson, stream_csv
+from search import search_products
+from bulk_import import CSV_TYPES, NDJSON_TYPES, iter_records, import_products
+from rollups import add_orders_to_rollups, rebuild_rollups
+from migrations import upgrade_orders_schema, upgrade_products_schema
+from bootstrap import init_db, bootstrap_admin
+from seed import generate_data
+from reports import parse_group_by, build_report
+from passwords import init_password_hasher, get_password_hasher, PasswordHasherBusy
+from metrics import init_metrics
+from query_log import init_query_log
+from rate_limit import init_rate_limits, rate_limited
+from user_cache import init_user_cache, role_claims, get_current_user, current_user_is_admin
+from report_jobs import init_report_jobs, get_report_jobs, invalidate_cached_reports, job_to_dict
+from fleet import PLANNED_TRANSPORTS, plan_transports, transport_plan, vehicle_to_dict
 
 load_dotenv()
 
 
+def product_image_url(product_id, image_hash):
+    """
+    URL obrazu produktu. Skrót obrazu w parametrze v sprawia, że po zmianie
+    obrazu zmienia się też URL, więc klient może go cache'ować bez rewalidacji.
+    """
+    if not image_hash:
+        return None
+    return f"/product/{product_id}/image?v={image_hash}"
+
+
+# Pola produktu dostępne w projekcji (?fields=) i kolumny potrzebne do ich zbudowania
+PRODUCT_FIELDS = {
+    "id": (),
+    "description": (Product.description,),
+    "price": (Product.price,),
+    "image_url": (Product.image_hash,),
+    "image_hash": (Product.image_hash,),
+}
+
+
+def product_to_dict(product, fields=None):
+    data = {
+        "id": product.id,
+        "description": product.description,
+        "price": product.price,
+        "image_url": product_image_url(product.id, product.image_hash),
+        "image_hash": product.image_hash
+    } if fields is None else {}
+    for field in fields or ():
+        if field == "image_url":
+            data[field] = product_image_url(product.id, product.image_hash)
+        else:
+            data[field] = getattr(product, field)
+    return data
+
+
+def parse_fields(fields_str, allowed):
+    """
+    Parsuje parametr ?fields=a,b,c. Zwraca None (wszystkie pola), gdy parametr
+    nie został podany; rzuca ValueError przy nieznanym polu.
+    """
+    if not fields_str:
+        return None
+    fields = [field.strip() for field in fields_str.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise ValueError(f"Nieznane pola: {unknown}. Dozwolone: {list(allowed)}")
+    return fields
+
+
+def parse_page_args(default_limit, max_limit):
+    """
+    Parsuje parametry stronicowania kluczem (keyset): limit i after.
+    after to identyfikator ostatniego elementu z poprzedniej strony.
+    max_limit=None oznacza brak górnego ograniczenia (a default_limit=None
+    - brak limitu, gdy klient go nie poda), np. dla odpowiedzi strumieniowych.
+    Rzuca ValueError przy niepoprawnych wartościach.
+    """
+    try:
+        limit = request.args.get('limit', default_limit)
+        limit = int(limit) if limit is not None else None
+        after = request.args.get('after')
+        after = int(after) if after is not None else None
+    except ValueError:
+        raise ValueError("Parametry limit i after muszą być liczbami całkowitymi")
+    if limit is not None and (limit < 1 or (max_limit is not None and limit > max_limit)):
+        raise ValueError(f"Parametr limit musi być z zakresu 1-{max_limit or 'inf'}")
+    return limit, after
+
+
+def is_page_requested():
+    """
+    Czy klient prosi o stronę listy (podał limit albo after). Bez tych
+    parametrów listy zwracane są w całości, jak przed wprowadzeniem
+    stronicowania.
+    """
+    return 'limit' in request.args or 'after' in request.args
+
+
+def parse_date_arg(name, source=None):
+    """
+    Parsuje opcjonalny parametr w formacie 'YYYY-MM-DD' z query params
+    (albo ze słownika source, np. ciała JSON).
+    Zwraca date albo None; rzuca ValueError przy złym formacie.
+    """
+    value = (request.args if source is None else source).get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError("Nieprawidłowy format daty. Użyj 'YYYY-MM-DD'")
+
+
+ORDER_EXPORT_COLUMNS = [
+    "order_id", "user_id", "product_id", "product_description", "product_price",
+    "delivery_date", "address", "transport_type", "province", "quantity", "order_value"
+]
+
+
+def order_export_row(order, product_description):
+    """
+    Wiersz eksportu zamówień w kolejności ORDER_EXPORT_COLUMNS;
+    product_price to cena z chwili złożenia zamówienia, a order_value
+    - cena razy ilość.
+    """
+    return {
+        "order_id": order.id,
+        "user_id": order.user_id,
+        "product_id": order.product_id,
+        "product_description": product_description,
+        "product_price": order.unit_price,
+        "delivery_date": order.delivery_date.isoformat(),
+        "address": order.address,
+        "transport_type": order.transport_type.value,
+        "province": order.province.value,
+        "quantity": order.quantity,
+        "order_value": order.value
+    }
+
+
+def parse_report_range(source=None):
+    """
+    Parsuje wymagane parametry start_date i end_date raportów
+    (z query params albo ze słownika source).
+    Zwraca (start_date, end_date); rzuca ValueError z komunikatem dla klienta.
+    """
+    source = request.args if source is None else source
+    if not source.get('start_date') or not source.get('end_date'):
+        raise ValueError("Musisz podać datę początkową i końcową")
+    try:
+        start_date = parse_date_arg('start_date', source)
+        end_date = parse_date_arg('end_date', source)
+    except TypeError:
+        raise ValueError("Nieprawidłowy format daty. Użyj 'YYYY-MM-DD'")
+    if start_date > end_date:
+        raise ValueError("Data początkowa nie może być po dacie końcowej")
+    return start_date, end_date
+
+
+def is_stream_requested():
+    return request.args.get('stream') in ('1', 'true')
+
+
+def order_to_dict(order, product_description):
+    return {
+        "order_id": order.id,
+        "product_id": order.product_id,
+        "product_description": product_description,
+        "delivery_date": order.delivery_date.isoformat(),
+        "address": order.address,
+        "transport_type": order.transport_type.value,
+        "province": order.province.value,
+        "quantity": order.quantity
+    }
+
+
+VALID_TRANSPORTS = [t.value for t in TransportType]
+# Pojazdy obsługują tylko transporty z dostawą (odbiór własny nie wymaga floty)
+VALID_VEHICLE_TRANSPORTS = [t.value for t in PLANNED_TRANSPORTS]
+VALID_PROVINCES = [p.value for p in Province]
+
+
+def is_positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def parse_product_id(value):
+    """
+    Id produktu z ciała JSON: liczba całkowita albo napis z cyframi
+    (klient Android wysyła zamówienie jako Map<String, String>).
+    Zwraca int albo None dla innych wartości.
+    """
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return value if is_positive_int(value) else None
+
+
+class OrderValidationError(ValueError):
+    """Błąd walidacji zamówienia wraz z kodem HTTP odpowiedzi."""
+
+    def __init__(self, msg, status=400):
+        super().__init__(msg)
+        self.status = status
+
+
+def validate_order_data(data, product_prices):
+    """
+    Sprawdza dane pojedynczego zamówienia (wspólne dla /order i /orders/bulk)
+    i zwraca słownik kolumn zamówienia (bez user_id).
+    product_prices - słownik {product_id: cena} istniejących produktów.
+    Rzuca OrderValidationError z komunikatem i kodem HTTP.
+    """
+    if not isinstance(data, dict):
+        raise OrderValidationError("Niekompletne dane zamówienia")
+
+    product_id = parse_product_id(data.get('product_id'))
+    delivery_date = data.get('delivery_date')
+    address = data.get('address')
+    transport_type_str = data.get('transport_type')
+    province_str = data.get('province')
+    quantity = data.get('quantity', 1)
+
+    if not data.get('product_id') or not delivery_date or not address or not transport_type_str \
+            or not province_str:
+        raise OrderValidationError("Niekompletne dane zamówienia")
+
+    if product_id not in product_prices:
+        raise OrderValidationError("Produkt nie istnieje", 404)
+
+    if transport_type_str not in VALID_TRANSPORTS:
+        raise OrderValidationError(
+            f"Nieprawidłowy środek transportu. Dozwolone: {VALID_TRANSPORTS}"
+        )
+
+    if province_str not in VALID_PROVINCES:
+        raise OrderValidationError(
+            f"Nieprawidłowe województwo. Dozwolone: {VALID_PROVINCES}"
+        )
+
+    if not is_positive_int(quantity):
+        raise OrderValidationError("Ilość musi być dodatnią liczbą całkowitą")
+
+    try:
+        delivery_date = datetime.strptime(delivery_date, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise OrderValidationError("Nieprawidłowy format daty. Użyj 'YYYY-MM-DD'")
+
+    return {
+        "product_id": product_id,
+        "delivery_date": delivery_date,
+        "address": address,
+        "transport_type": TransportType(transport_type_str),
+        "province": Province(province_str),
+        "quantity": quantity,
+        "unit_price": product_prices[product_id]
+    }
+
+
+def parse_vehicle_data(data, partial=False):
+    """
+    Sprawdza pola pojazdu z ciała JSON i zwraca słownik kolumn Vehicle.
+    partial=True (edycja) - wszystkie pola są opcjonalne.
+    Rzuca ValueError z komunikatem dla użytkownika.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Brak danych w żądaniu")
+    required = () if partial else ('registration', 'transport_type', 'capacity', 'depot_province')
+    if any(data.get(name) is None for name in required):
+        raise ValueError("Niekompletne dane pojazdu")
+
+    fields = {}
+    if data.get('registration') is not None:
+        registration = data['registration']
+        if not isinstance(registration, str) or not registration.strip() or len(registration) > 20:
+            raise ValueError("Numer rejestracyjny musi mieć od 1 do 20 znaków")
+        fields['registration'] = registration.strip().upper()
+    if data.get('transport_type') is not None:
+        if data['transport_type'] not in VALID_VEHICLE_TRANSPORTS:
+            raise ValueError(f"Nieprawidłowy rodzaj pojazdu. Dozwolone: {VALID_VEHICLE_TRANSPORTS}")
+        fields['transport_type'] = TransportType(data['transport_type'])
+    if data.get('capacity') is not None:
+        if not is_positive_int(data['capacity']):
+            raise ValueError("Ładowność musi być dodatnią liczbą całkowitą")
+        fields['capacity'] = data['capacity']
+    if data.get('depot_province') is not None:
+        if data['depot_province'] not in VALID_PROVINCES:
+            raise ValueError(f"Nieprawidłowe województwo. Dozwolone: {VALID_PROVINCES}")
+        fields['depot_province'] = Province(data['depot_province'])
+    if data.get('active') is not None:
+        if not isinstance(data['active'], bool):
+            raise ValueError("Pole active musi mieć wartość true albo false")
+        fields['active'] = data['active']
+    return fields
+
+
+def fetch_product_prices(product_ids):
+    """Ceny produktów o podanych id jednym zapytaniem (IN): {product_id: cena}."""
+    ids = {parse_product_id(product_id) for product_id in product_ids} - {None}
+    if not ids:
+        return {}
+    return dict(db.session.query(Product.id, Product.price).filter(Product.id.in_(ids)).all())
+
+
+def save_orders(rows):
+    """
+    Zapisuje zamówienia (wiersze z validate_order_data, z ceną z chwili
+    zamówienia w unit_price) jednym INSERT-em razem z aktualizacją dziennych
+    agregatów raportów (rollups.py) i commituje transakcję.
+    Każda operacja tworząca zamówienia powinna przechodzić przez tę funkcję.
+    Zwraca listę id utworzonych zamówień (w kolejności rows).
+    """
+    order_ids = insert_returning_ids(Order, rows)
+    add_orders_to_rollups(
+        (row["delivery_date"], row["province"], row["transport_type"], row["unit_price"] * row["quantity"])
+        for row in rows
+    )
+    invalidate_cached_reports({row["delivery_date"] for row in rows})
+    db.session.commit()
+    return order_ids
+
+
+def decode_image(image_base64):
+    """
+    Dekoduje obraz z base64, zapisuje go w magazynie obrazów i zleca
+    wygenerowanie miniatur w tle.
+    Zwraca skrót obrazu; rzuca ValueError przy niepoprawnym base64.
+    """
+    try:
+        image_bytes = b64decode(image_base64, validate=True)
+    except Exception:
+        raise ValueError("Niepoprawny format obrazu")
+    store = get_image_store()
+    image_hash, created_ns = store.add(image_bytes)
+    if created_ns is not None:
+        # Obraz trafił na dysk przed commitem - przy rollbacku usuwa go _discard_new_images
+        db.session.info.setdefault('new_images', []).append((store, image_hash, created_ns))
+    get_thumbnails().schedule(image_hash)
+    return image_hash
+
+
+def _keep_new_images(session):
+    session.info.pop('new_images', None)
+
+
+def _discard_new_images(session, transaction):
+    """
+    Transakcja zakończona bez commita (rollback albo zamknięcie sesji):
+    usuwa obrazy, które zapisała, chyba że od tego czasu użyło ich
+    inne żądanie (remove_unused sprawdza czas ostatniego użycia).
+    """
+    if transaction.parent is not None:
+        return
+    for store, image_hash, created_ns in session.info.pop('new_images', ()):
+        store.remove_unused(image_hash, created_ns, variants=VARIANTS)
+
+
+def release_image(image_hash):
+    """
+    Usuwa obraz z magazynu, jeśli żaden produkt już się do niego nie odwołuje
+    i nikt go nie użył przez ostatnie IMAGE_GC_GRACE sekund - równoległe
+    żądanie mogło właśnie zapisać ten sam obraz dla nowego produktu.
+    Pominięte obrazy usuwa później `flask gc-images`.
+    Wywoływane po commicie, który odłączył obraz od produktu.
+    """
+    if not image_hash:
+        return
+    still_used = db.session.query(Product.id).filter_by(image_hash=image_hash).first()
+    if not still_used:
+        unused_since_ns = time.time_ns() - int(current_app.config['IMAGE_GC_GRACE'] * 1e9)
+        get_image_store().remove_unused(image_hash, unused_since_ns, variants=VARIANTS)
+
+
+def collect_unused_images(grace):
+    """
+    Usuwa z magazynu obrazy, do których nie odwołuje się żaden produkt
+    i których nikt nie użył przez ostatnie grace sekund.
+    Zwraca liczbę usuniętych obrazów.
+    """
+    store = get_image_store()
+    # Czas liczony przed zapytaniem: obraz użyty później zostaje w magazynie
+    unused_since_ns = time.time_ns() - int(grace * 1e9)
+    used = {image_hash for (image_hash,) in db.session.query(Product.image_hash).distinct()}
+    return sum(
+        store.remove_unused(digest, unused_since_ns, variants=VARIANTS)
+        for digest in list(store.digests())
+        if digest not in used
+    )
+
+
 def create_app(test_config=None):
     app = Flask(__name__)
-    CORS(app)
+    # Nagłówki stronicowania muszą być widoczne dla klienta webowego
+    CORS(app, expose_headers=['X-Total-Count', 'X-Next-Cursor', 'X-Next-Offset'])
     # Konfiguracja bazy danych
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///mydb.db'
+    # Domyślnie plik SQLite; produkcyjnie DATABASE_URL, np. postgresql://...
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri_from_env()
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET', 'change_me_in_env')
 
@@ -32,27 +429,48 @@ def create_app(test_config=None):
         for key, value in test_config.items():
             app.config[key] = value
 
+    # Obrazy produktów w wersjonowanym URL są niezmienne - domyślnie rok
+    app.config.setdefault('IMAGE_CACHE_MAX_AGE', 365 * 24 * 3600)
+    # Nieużywany obraz jest usuwany dopiero po tylu sekundach od ostatniego użycia
+    app.config.setdefault('IMAGE_GC_GRACE', 600)
+    # Stronicowanie listy produktów
+    app.config.setdefault('PRODUCTS_PAGE_LIMIT', 100)
+    app.config.setdefault('PRODUCTS_PAGE_MAX_LIMIT', 1000)
+    app.config.setdefault('BULK_IMPORT_BATCH_SIZE', 500)
+    app.config.setdefault('BULK_ORDER_MAX_ITEMS', 1000)
+    # Stronicowanie listy zamówień użytkownika
+    app.config.setdefault('ORDERS_PAGE_LIMIT', 100)
+    app.config.setdefault('ORDERS_PAGE_MAX_LIMIT', 1000)
+
+    configure_database(app)
     db.init_app(app)
+    init_database(app)
     jwt = JWTManager(app)
-
-    with app.app_context():
-        db.create_all()
-
-        # --- Tworzenie konta admina (jeśli nie istnieje) ---
-        ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
-        ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'secret')
-
-        admin_user = User.query.filter_by(username=ADMIN_USERNAME).first()
-        if not admin_user:
-            hashed_admin_password = generate_password_hash(ADMIN_PASSWORD)
-            new_admin = User(
-                username=ADMIN_USERNAME,
-                email="admin@example.com",
-                password=hashed_admin_password,
-                is_admin=True
-            )
-            db.session.add(new_admin)
-            db.session.commit()
+    image_store = init_image_store(app)
+    if not event.contains(db.session, 'after_commit', _keep_new_images):
+        event.listen(db.session, 'after_commit', _keep_new_images)
+        event.listen(db.session, 'after_transaction_end', _discard_new_images)
+    init_thumbnails(app, image_store)
+    init_catalog_cache(app)
+    init_report_jobs(app)
+    init_user_cache(app)
+    init_password_hasher(app)
+    init_rate_limits(app)
+    init_metrics(app)
+    init_query_log(app)
+
+    # Fabryka nie wykonuje żadnej pracy na bazie - tabele i konto admina
+    # tworzą komendy `flask init-db` i `flask bootstrap-admin` (uruchamiane
+    # raz przy wdrożeniu), więc start workera kosztuje tyle, co sam Flask
+    # i można go utworzyć przed fork() (gunicorn --preload).
+
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(e):
+        # Seria logowań/rejestracji wysyca pulę haszowania - odrzucamy
+        # nadmiar zamiast blokować workery obsługujące resztę aplikacji
+        response = jsonify({"msg": "Serwer jest przeciążony, spróbuj ponownie za chwilę"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
 
     @app.route('/')
     def home():
@@ -75,6 +493,11 @@ def create_app(test_config=None):
         """
         ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
 
+        # Limit przed jakąkolwiek pracą - każda rejestracja to kosztowne haszowanie
+        limited = rate_limited(("register_ip", request.remote_addr))
+        if limited:
+            return limited
+
         data = request.get_json()
         if not data:
             return jsonify({"msg": "Brak danych w żądaniu"}), 400
@@ -86,6 +509,12 @@ def create_app(test_config=None):
         if not username or not email or not password:
             return jsonify({"msg": "Nieprawidłowe dane"}), 400
 
+        # Limit na adres email nie zależy od IP - utrudnia sprawdzanie
+        # z wielu adresów, czy konto o danym emailu istnieje
+        limited = rate_limited(("register_email", str(email).strip().lower()))
+        if limited:
+            return limited
+
         # Sprawdzamy, czy to nie próba rejestracji admina
         if username == ADMIN_USERNAME:
             return jsonify({"msg": "Nie można zarejestrować konta admina"}), 403
@@ -97,7 +526,7 @@ def create_app(test_config=None):
         if existing_user:
             return jsonify({"msg": "Użytkownik o takiej nazwie lub emailu już istnieje"}), 400
 
-        hashed_password = generate_password_hash(password)
+        hashed_password = get_password_hasher().hash(password)
         new_user = User(username=username, email=email, password=hashed_password)
         db.session.add(new_user)
         db.session.commit()
@@ -127,12 +556,29 @@ def create_app(test_config=None):
         if not email or not password:
             return jsonify({"msg": "Nieprawidłowe dane"}), 400
 
+        # Limity prób z jednego adresu IP i na jedno konto - chronią pulę
+        # haszowania haseł i utrudniają zgadywanie haseł
+        limited = rate_limited(
+            ("login_ip", request.remote_addr),
+            ("login_email", str(email).strip().lower())
+        )
+        if limited:
+            return limited
+
+        hasher = get_password_hasher()
         user = User.query.filter_by(email=email).first()
-        if not user or not check_password_hash(user.password, password):
+        if not user or not hasher.verify(user.password, password):
             return jsonify({"msg": "Błędny email lub hasło"}), 401
 
-        # Tworzymy access_token z user.id
-        access_token = create_access_token(identity=user.id)
+        # Hasło zapisane ze starszymi parametrami (metoda, koszt) haszujemy
+        # ponownie - tylko teraz znamy jego jawną postać
+        if hasher.needs_rehash(user.password):
+            user.password = hasher.hash(password)
+            db.session.commit()
+
+        # Tworzymy access_token z user.id; rola w claims, żeby zwykły
+        # użytkownik był odrzucany przez endpointy admina bez zapytania do bazy
+        access_token = create_access_token(identity=user.id, additional_claims=role_claims(user))
         return jsonify({"access_token": access_token}), 200
 
     # --------------------- DANE UŻYTKOWNIKA ---------------------
@@ -142,8 +588,7 @@ def create_app(test_config=None):
         """
         Retrieves user details for the currently logged-in user.
         """
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         if not user:
             return jsonify({"msg": "User not found"}), 404
 
@@ -169,9 +614,7 @@ def create_app(test_config=None):
             "image": "base64 string (optional)"
         }
         """
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        if not user or not user.is_admin:
+        if not current_user_is_admin():
             return jsonify({"msg": "Brak uprawnień"}), 403
 
         data = request.get_json()
@@ -185,44 +628,198 @@ def create_app(test_config=None):
         if description is None or price is None:
             return jsonify({"msg": "Opis i cena są wymagane"}), 400
 
-        image_bytes = None
+        image_hash = None
         if image_base64:
             try:
-                image_bytes = b64decode(image_base64)
-            except Exception:
+                image_hash = decode_image(image_base64)
+            except ValueError:
                 return jsonify({"msg": "Niepoprawny format obrazu"}), 400
 
-        new_product = Product(description=description, price=price, image=image_bytes)
+        new_product = Product(description=description, price=price, image_hash=image_hash)
         db.session.add(new_product)
-        db.session.commit()
+        commit_catalog_change()
 
         return jsonify({"msg": "Produkt dodany", "product_id": new_product.id}), 201
 
+    @app.route('/products/bulk', methods=['POST'])
+    @jwt_required()
+    def bulk_import_products():
+        """
+        Masowy import produktów - wyłącznie przez admina.
+        Plik jest parsowany strumieniowo, a poprawne wiersze wstawiane partiami
+        po BULK_IMPORT_BATCH_SIZE w osobnych transakcjach. Błędne wiersze
+        nie przerywają importu - trafiają do raportu w polu errors.
+
+        Input (body, Content-Type: text/csv lub application/x-ndjson):
+            CSV z nagłówkiem: description,price[,image][,image_hash]
+            NDJSON: {"description": "string", "price": float,
+                     "image": "base64 (optional)", "image_hash": "sha256 (optional)"}
+            image_hash odwołuje się do obrazu już obecnego w magazynie obrazów.
+
+        Output JSON (201; 400 gdy pliku nie da się dalej czytać - wtedy
+        raport obejmuje wiersze zapisane przed błędem i "aborted": true):
+        {
+            "msg": "string",
+            "created": integer,
+            "product_ids": [integer, ...],
+            "errors": [{"row": integer, "msg": "string"}, ...],
+            "aborted": boolean
+        }
+        """
+        if not current_user_is_admin():
+            return jsonify({"msg": "Brak uprawnień"}), 403
+
+        if request.mimetype not in CSV_TYPES + NDJSON_TYPES:
+            return jsonify({
+                "msg": f"Nieobsługiwany format. Dozwolone: {list(CSV_TYPES + NDJSON_TYPES)}"
+            }), 415
+
+        store = get_image_store()
+        report = import_products(
+            iter_records(request.stream, request.mimetype),
+            store_image=decode_image,
+            # touch sprawdza istnienie i odświeża czas użycia (patrz release_image)
+            image_exists=store.touch,
+            commit_batch=commit_catalog_change,
+            batch_size=app.config['BULK_IMPORT_BATCH_SIZE']
+        )
+        if report["aborted"]:
+            return jsonify({"msg": "Niepoprawny plik - import przerwany", **report}), 400
+        return jsonify({"msg": "Import zakończony", **report}), 201
+
     @app.route('/products', methods=['GET'])
+    @catalog_cached
     def get_all_products():
         """
-        Zwraca listę wszystkich produktów w formie JSON.
-        Pole image (o ile istnieje w bazie) jest zwracane w formacie base64.
+        Zwraca stronę listy produktów w formie JSON, posortowaną po id.
+        Sam obraz nie jest przesyłany - pole image_url wskazuje na
+        endpoint /product/<id>/image, a image_hash to skrót SHA-256 obrazu.
+
+        Bez parametrów limit i after zwracana jest cała lista (tak jak
+        przed wprowadzeniem stronicowania - na tym polegają obecni klienci).
+        Stronicowanie kluczem: kolejną stronę pobieramy podając w after
+        wartość z nagłówka X-Next-Cursor (brak nagłówka = ostatnia strona).
+        Nagłówek X-Total-Count (liczba wszystkich produktów) jest liczony
+        tylko dla pierwszej strony (bez after).
+
+        Odpowiedzi są cache'owane per wersja katalogu (catalog_cache.py)
+        i obsługują ETag / If-None-Match -> 304.
 
-        Input: None
+        Z stream=1 lista jest wysyłana strumieniowo (chunked) i domyślnie
+        bez limitu - wiersze są czytane partiami, więc pamięć serwera nie
+        rośnie z rozmiarem katalogu. Taka odpowiedź nie jest cache'owana
+        i nie ma nagłówków X-Next-Cursor / X-Total-Count.
+
+        Query Parameters:
+            - limit: int (optional, domyślnie PRODUCTS_PAGE_LIMIT, gdy podano after)
+            - after: int (optional) - id ostatniego produktu z poprzedniej strony
+            - fields: "id,description,price,image_url,image_hash" (optional)
+            - stream: "1" (optional)
+
+        Example:
+            GET /products?limit=20&after=140&fields=id,description,price
         """
-        products = Product.query.all()
-        result = []
-        for product in products:
-            image_base64 = b64encode(product.image).decode('utf-8') if product.image else None
-            result.append({
-                "id": product.id,
-                "description": product.description,
-                "price": product.price,
-                "image": image_base64
-            })
-        return jsonify(result), 200
+        stream = is_stream_requested()
+        try:
+            if stream or not is_page_requested():
+                limit, after = parse_page_args(None, None)
+            else:
+                limit, after = parse_page_args(app.config['PRODUCTS_PAGE_LIMIT'],
+                                               app.config['PRODUCTS_PAGE_MAX_LIMIT'])
+            fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        query = Product.query
+        if fields is not None:
+            # Ładujemy tylko kolumny potrzebne do żądanych pól
+            columns = {column for field in fields for column in PRODUCT_FIELDS[field]}
+            query = query.options(load_only(Product.id, *columns))
+        if after is not None:
+            query = query.filter(Product.id > after)
+
+        if stream:
+            query = query.order_by(Product.id)
+            if limit is not None:
+                query = query.limit(limit)
+            return stream_json_array(query, lambda product: product_to_dict(product, fields))
+
+        if limit is None:
+            products = query.order_by(Product.id).all()
+            response = jsonify([product_to_dict(product, fields) for product in products])
+            response.headers['X-Total-Count'] = str(len(products))
+            return response, 200
+
+        # Pobieramy o jeden wiersz więcej, żeby wiedzieć, czy jest kolejna strona
+        products = query.order_by(Product.id).limit(limit + 1).all()
+        has_more = len(products) > limit
+        products = products[:limit]
+
+        response = jsonify([product_to_dict(product, fields) for product in products])
+        if has_more:
+            response.headers['X-Next-Cursor'] = str(products[-1].id)
+        if after is None:
+            total = db.session.query(func.count(Product.id)).scalar()
+            response.headers['X-Total-Count'] = str(total)
+        return response, 200
+
+    @app.route('/products/search', methods=['GET'])
+    @catalog_cached
+    def search_products_endpoint():
+        """
+        Wyszukiwanie pełnotekstowe produktów po opisie (SQLite FTS5),
+        z opcjonalnym filtrem ceny. Wyniki posortowane wg trafności.
+        Każde słowo frazy traktowane jest jako prefiks, np. "ziem jad"
+        znajdzie "Ziemniaki jadalne". Wielkość liter i polskie znaki
+        diakrytyczne (poza "ł") nie mają znaczenia.
+
+        Kolejną stronę pobieramy podając w offset wartość z nagłówka
+        X-Next-Offset (brak nagłówka = ostatnia strona).
+
+        Query Parameters:
+            - q: "string" - szukana fraza
+            - min_price: float (optional)
+            - max_price: float (optional)
+            - limit: int (optional, domyślnie PRODUCTS_PAGE_LIMIT)
+            - offset: int (optional, domyślnie 0)
+
+        Example:
+            GET /products/search?q=ziemniaki&max_price=10&limit=20
+        """
+        phrase = request.args.get('q', '').strip()
+        if not phrase:
+            return jsonify({"msg": "Musisz podać frazę wyszukiwania (q)"}), 400
+
+        try:
+            min_price = float(request.args['min_price']) if 'min_price' in request.args else None
+            max_price = float(request.args['max_price']) if 'max_price' in request.args else None
+        except ValueError:
+            return jsonify({"msg": "Cena musi być liczbą"}), 400
+        # float() przyjmuje też "nan" i "inf", które psują porównania w zapytaniu
+        if any(price is not None and not math.isfinite(price) for price in (min_price, max_price)):
+            return jsonify({"msg": "Cena musi być liczbą"}), 400
+        try:
+            limit = int(request.args.get('limit', app.config['PRODUCTS_PAGE_LIMIT']))
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({"msg": "Parametry limit i offset muszą być liczbami całkowitymi"}), 400
+        if limit < 1 or limit > app.config['PRODUCTS_PAGE_MAX_LIMIT'] or offset < 0:
+            return jsonify({"msg": "Nieprawidłowe parametry stronicowania"}), 400
+
+        # Pobieramy o jeden wiersz więcej, żeby wiedzieć, czy jest kolejna strona
+        rows = search_products(phrase, min_price, max_price, limit=limit + 1, offset=offset)
+        response = jsonify([product_to_dict(row) for row in rows[:limit]])
+        if len(rows) > limit:
+            response.headers['X-Next-Offset'] = str(offset + limit)
+        return response, 200
 
     @app.route('/product/<int:product_id>', methods=['GET'])
+    @catalog_cached
     def get_product(product_id):
         """
         Pobiera produkt o danym ID i zwraca go w formacie JSON.
-        W polu image zwracamy base64-encoded, jeśli istnieje.
+        Pola image_url / image_hash są None, jeśli produkt nie ma obrazu.
+        Odpowiedź jest cache'owana per wersja katalogu (ETag / If-None-Match -> 304).
 
         Input:
             - URL Parameter: product_id (integer)
@@ -231,13 +828,58 @@ def create_app(test_config=None):
         if not product:
             return jsonify({"msg": "Produkt nie istnieje"}), 404
 
-        image_base64 = b64encode(product.image).decode('utf-8') if product.image else None
-        return jsonify({
-            "id": product.id,
-            "description": product.description,
-            "price": product.price,
-            "image": image_base64
-        }), 200
+        return jsonify(product_to_dict(product)), 200
+
+    @app.route('/product/<int:product_id>/image', methods=['GET'])
+    def get_product_image(product_id):
+        """
+        Zwraca surowe bajty obrazu produktu (strumieniowo, z dysku).
+        Obsługuje ETag (skrót obrazu) / If-None-Match -> 304 oraz nagłówek Range.
+        Jeśli parametr v jest równy aktualnemu skrótowi, odpowiedź może być
+        cache'owana przez klienta przez IMAGE_CACHE_MAX_AGE sekund.
+
+        Parametr size wybiera pomniejszony wariant obrazu (thumbnails.VARIANTS).
+        Dopóki wariant nie zostanie wygenerowany w tle, zwracany jest oryginał
+        (bez długiego cache'owania, żeby klient później pobrał właściwy wariant).
+
+        Input:
+            - URL Parameter: product_id (integer)
+            - Query Parameter: v (optional) - skrót obrazu z image_url
+            - Query Parameter: size (optional) - "thumb", "medium" lub "original"
+        """
+        size = request.args.get('size', 'original')
+        if size != 'original' and size not in VARIANTS:
+            return jsonify({
+                "msg": f"Nieprawidłowy rozmiar obrazu. Dozwolone: {['original', *VARIANTS]}"
+            }), 400
+
+        image_hash = db.session.query(Product.image_hash).filter_by(id=product_id).scalar()
+        store = get_image_store()
+        if not image_hash or not store.exists(image_hash):
+            return jsonify({"msg": "Obraz nie istnieje"}), 404
+
+        path, etag = store.path(image_hash), image_hash
+        versioned = request.args.get('v') == image_hash
+        if size != 'original':
+            if store.exists(image_hash, size):
+                path, etag = store.variant_path(image_hash, size), f"{image_hash}.{size}"
+            else:
+                # Wariant jeszcze nie gotowy - upewniamy się, że jest w kolejce
+                get_thumbnails().schedule(image_hash)
+                versioned = False
+
+        response = send_file(
+            path,
+            mimetype=store.mimetype(path),
+            etag=etag,
+            conditional=True,
+            max_age=app.config['IMAGE_CACHE_MAX_AGE'] if versioned else 0
+        )
+        if versioned:
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
 
     # --------------------- EDYCJA PRODUKTU ---------------------
     @app.route('/product/<int:product_id>', methods=['PUT'])
@@ -254,9 +896,7 @@ def create_app(test_config=None):
             "image": "base64 string or empty string to remove (optional)"
         }
         """
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        if not user or not user.is_admin:
+        if not current_user_is_admin():
             return jsonify({"msg": "Brak uprawnień"}), 403
 
         data = request.get_json()
@@ -278,16 +918,19 @@ def create_app(test_config=None):
             if not isinstance(price, (int, float)):
                 return jsonify({"msg": "Cena musi być liczbą"}), 400
             product.price = price
+        old_image_hash = product.image_hash
         if image_base64 is not None:
             if image_base64 == "":
-                product.image = None  # Możliwość usunięcia obrazu
+                product.image_hash = None  # Możliwość usunięcia obrazu
             else:
                 try:
-                    product.image = b64decode(image_base64)
-                except Exception:
+                    product.image_hash = decode_image(image_base64)
+                except ValueError:
                     return jsonify({"msg": "Niepoprawny format obrazu"}), 400
 
-        db.session.commit()
+        commit_catalog_change()
+        if old_image_hash != product.image_hash:
+            release_image(old_image_hash)
 
         return jsonify({"msg": "Produkt zaktualizowany"}), 200
 
@@ -312,7 +955,8 @@ def create_app(test_config=None):
             "delivery_date": "YYYY-MM-DD",
             "address": "string",
             "transport_type": "string",  # "TRUCK", "COURIER", or "COURIER"
-            "province": "string"         # e.g., "mazowieckie"
+            "province": "string",        # e.g., "mazowieckie"
+            "quantity": integer          # optional, ładunek w paletach (domyślnie 1)
         }
         """
         data = request.get_json()
@@ -320,46 +964,72 @@ def create_app(test_config=None):
             return jsonify({"msg": "Brak danych w żądaniu"}), 400
 
         current_user_id = get_jwt_identity()
-        product_id = data.get('product_id')
-        delivery_date = data.get('delivery_date')
-        address = data.get('address')
-        transport_type_str = data.get('transport_type')
-        province_str = data.get('province')  # Nowe pole
+        product_prices = fetch_product_prices([data.get('product_id')])
+        try:
+            order_data = validate_order_data(data, product_prices)
+        except OrderValidationError as e:
+            return jsonify({"msg": str(e)}), e.status
 
-        if not product_id or not delivery_date or not address or not transport_type_str or not province_str:
-            return jsonify({"msg": "Niekompletne dane zamówienia"}), 400
+        [order_id] = save_orders([{"user_id": current_user_id, **order_data}])
 
-        product = Product.query.get(product_id)
-        if not product:
-            return jsonify({"msg": "Produkt nie istnieje"}), 404
+        return jsonify({"msg": "Zamówienie utworzone pomyślnie", "order_id": order_id}), 201
 
-        valid_transports = [t.value for t in TransportType]
-        if transport_type_str not in valid_transports:
-            return jsonify({
-                "msg": f"Nieprawidłowy środek transportu. Dozwolone: {valid_transports}"
-            }), 400
+    @app.route('/orders/bulk', methods=['POST'])
+    @jwt_required()
+    def create_orders_bulk():
+        """
+        Tworzy wiele zamówień zalogowanego użytkownika w jednym żądaniu.
+        Wszystkie produkty sprawdzane są jednym zapytaniem (IN), a zamówienia
+        wstawiane jednym INSERT-em w jednej transakcji. Operacja jest
+        atomowa: jeśli którakolwiek pozycja jest błędna, nic nie jest
+        zapisywane, a odpowiedź zawiera listę błędów z indeksami pozycji.
 
-        valid_provinces = [p.value for p in Province]
-        if province_str not in valid_provinces:
+        Input JSON:
+        {
+            "orders": [
+                {
+                    "product_id": integer,
+                    "delivery_date": "YYYY-MM-DD",
+                    "address": "string",
+                    "transport_type": "string",
+                    "province": "string"
+                },
+                ...
+            ]
+        }
+
+        Output JSON (201): {"msg": "string", "order_ids": [integer, ...]}
+        Output JSON (400): {"msg": "string", "errors": [{"index": integer, "msg": "string"}, ...]}
+        """
+        data = request.get_json()
+        items = data.get('orders') if isinstance(data, dict) else None
+        if not items or not isinstance(items, list):
+            return jsonify({"msg": "Brak zamówień w żądaniu"}), 400
+        if len(items) > app.config['BULK_ORDER_MAX_ITEMS']:
             return jsonify({
-                "msg": f"Nieprawidłowe województwo. Dozwolone: {valid_provinces}"
+                "msg": f"Maksymalnie {app.config['BULK_ORDER_MAX_ITEMS']} zamówień w jednym żądaniu"
             }), 400
 
-        # Pobranie wartości enum dla województwa
-        province_enum = Province(province_str)
-
-        new_order = Order(
-            user_id=current_user_id,
-            product_id=product_id,
-            delivery_date=delivery_date,
-            address=address,
-            transport_type=transport_type_str,
-            province=province_enum
+        current_user_id = get_jwt_identity()
+        product_prices = fetch_product_prices(
+            item.get('product_id') for item in items if isinstance(item, dict)
         )
-        db.session.add(new_order)
-        db.session.commit()
 
-        return jsonify({"msg": "Zamówienie utworzone pomyślnie", "order_id": new_order.id}), 201
+        rows, errors = [], []
+        for index, item in enumerate(items):
+            try:
+                order_data = validate_order_data(item, product_prices)
+            except OrderValidationError as e:
+                errors.append({"index": index, "msg": str(e)})
+                continue
+            rows.append({"user_id": current_user_id, **order_data})
+
+        if errors:
+            return jsonify({"msg": "Nieprawidłowe zamówienia - nic nie zapisano", "errors": errors}), 400
+
+        order_ids = save_orders(rows)
+
+        return jsonify({"msg": "Zamówienia utworzone pomyślnie", "order_ids": order_ids}), 201
 
     @app.route('/order/<int:order_id>', methods=['GET'])
     @jwt_required()
@@ -372,23 +1042,32 @@ def create_app(test_config=None):
             - URL Parameter: order_id (integer)
         """
         current_user_id = get_jwt_identity()
-        order = Order.query.get(order_id)
-        if not order or order.user_id != current_user_id:
+        # Jedno zapytanie: zamówienie + potrzebne kolumny produktu i pojazd z planu transportów
+        row = db.session.query(
+            Order, Product.description, Product.image_hash, Vehicle.registration
+        ).outerjoin(Order.product).outerjoin(
+            TransportAssignment, TransportAssignment.order_id == Order.id
+        ).outerjoin(
+            Vehicle, Vehicle.id == TransportAssignment.vehicle_id
+        ).filter(Order.id == order_id).first()
+        if not row or row.Order.user_id != current_user_id:
             return jsonify({"msg": "Brak dostępu do tego zamówienia"}), 403
 
-        product = Product.query.get(order.product_id)
-        image_base64 = b64encode(product.image).decode('utf-8') if product.image else None
+        order = row.Order
         return jsonify({
             "order_id": order.id,
             "user_id": order.user_id,
             "product_id": order.product_id,
-            "product_description": product.description if product else None,
-            "delivery_date": order.delivery_date,
+            "product_description": row.description,
+            "delivery_date": order.delivery_date.isoformat(),
             "address": order.address,
             "transport_type": order.transport_type.value,
             "province": order.province.value,  # Nowe pole
-            "image": image_base64,
-            "total_sum": product.price if product else None
+            "quantity": order.quantity,
+            # Numer rejestracyjny pojazdu, gdy zamówienie jest już w planie transportów
+            "vehicle": row.registration,
+            "image_url": product_image_url(order.product_id, row.image_hash),
+            "total_sum": order.value
 
         }), 200
 
@@ -401,7 +1080,7 @@ def create_app(test_config=None):
         Przyjmuje daty początkową i końcową w formacie 'YYYY-MM-DD' jako query params.
         Zwraca:
             - całkowita liczba zamówień
-            - łączna suma pieniędzy z zamówień
+            - łączna suma pieniędzy z zamówień (wg cen z chwili złożenia zamówienia)
             - liczba zamówień z każdego województwa (jeśli > 0)
 
         Query Parameters:
@@ -411,70 +1090,194 @@ def create_app(test_config=None):
         Example:
             GET /admin/report?start_date=2025-01-01&end_date=2025-12-31
         """
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        if not user or not user.is_admin:
+        if not current_user_is_admin():
             return jsonify({"msg": "Brak uprawnień"}), 403
 
-        # Pobranie dat z query parameters
-        start_date_str = request.args.get('start_date')
-        end_date_str = request.args.get('end_date')
+        try:
+            start_date, end_date = parse_report_range()
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        # Raport liczony wyłącznie z dziennych agregatów (rollups.py) - jedno
+        # zapytanie po wierszach z zakresu dat zamiast trzech skanów tabeli orders.
+        return jsonify(build_report(start_date, end_date)), 200
+
+    @app.route('/admin/report/cube', methods=['GET'])
+    @jwt_required()
+    def report_cube_endpoint():
+        """
+        Raport wielowymiarowy: liczba i wartość zamówień z zakresu dat
+        pogrupowane po dowolnej kombinacji wymiarów. Wynik liczony jednym
+        zapytaniem agregującym (z dziennych agregatów, o ile group_by nie
+        zawiera product), sumy całkowite wyliczane z pogrupowanych wierszy.
+
+        Query Parameters:
+            - start_date: "YYYY-MM-DD"
+            - end_date: "YYYY-MM-DD"
+            - group_by: lista wymiarów po przecinku, podzbiór
+                        province,transport_type,product,month (pusta = same sumy)
+
+        Output JSON:
+        {
+            "start_date": "YYYY-MM-DD",
+            "end_date": "YYYY-MM-DD",
+            "group_by": [...],
+            "rows": [
+                {"province": ..., "product_id": ..., "product_description": ...,
+                 "month": "YYYY-MM", "order_count": int, "order_value": float}
+            ],
+            "totals": {"order_count": int, "order_value": float}
+        }
 
-        if not start_date_str or not end_date_str:
-            return jsonify({"msg": "Musisz podać datę początkową i końcową"}), 400
+        Example:
+            GET /admin/report/cube?start_date=2025-01-01&end_date=2025-12-31&group_by=province,month
+        """
+        if not current_user_is_admin():
+            return jsonify({"msg": "Brak uprawnień"}), 403
 
-        # Parsowanie dat
         try:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-        except ValueError:
-            return jsonify({"msg": "Nieprawidłowy format daty. Użyj 'YYYY-MM-DD'"}), 400
+            start_date, end_date = parse_report_range()
+            group_by = parse_group_by(request.args.get('group_by'))
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
 
-        if start_date > end_date:
-            return jsonify({"msg": "Data początkowa nie może być po dacie końcowej"}), 400
+        return jsonify(build_report(start_date, end_date, group_by)), 200
 
-        # Filtracja zamówień w podanym zakresie dat
-        # Zakładamy, że 'delivery_date' jest przechowywana jako string w formacie 'YYYY-MM-DD'
-        # Porównywanie stringów działa poprawnie ze względu na format
-        orders_query = Order.query.filter(
-            Order.delivery_date >= start_date_str,
-            Order.delivery_date <= end_date_str
-        )
+    @app.route('/admin/orders/export', methods=['GET'])
+    @jwt_required()
+    def export_orders():
+        """
+        Eksport zamówień z okresu (po dacie dostawy) dla księgowości,
+        razem z opisem produktu i ceną z chwili zamówienia. Odpowiedź jest strumieniowa:
+        wiersze czytane są kursorem partiami (STREAM_BATCH_SIZE), więc pamięć
+        nie zależy od długości okresu.
 
-        # Obliczenie całkowitej liczby zamówień
-        total_orders = orders_query.count()
+        Query Parameters:
+            - start_date: "YYYY-MM-DD"
+            - end_date: "YYYY-MM-DD"
+            - format: "csv" (domyślnie) albo "ndjson"
 
-        # Obliczenie łącznej sumy pieniędzy z zamówień przy użyciu funkcji SUM
-        total_sum = db.session.query(func.sum(Product.price)).join(Order, Order.product_id == Product.id).filter(
-            Order.delivery_date >= start_date_str,
-            Order.delivery_date <= end_date_str
-        ).scalar() or 0  # Używamy 'or 0', aby uniknąć None, gdy brak zamówień
+        Kolumny: ORDER_EXPORT_COLUMNS, wiersze posortowane po dacie dostawy i order_id.
 
-        # Liczba zamówień z każdego województwa
-        province_counts_query = db.session.query(Order.province, func.count(Order.id)).filter(
-            Order.delivery_date >= start_date_str,
-            Order.delivery_date <= end_date_str
-        ).group_by(Order.province).all()
+        Example:
+            GET /admin/orders/export?start_date=2025-01-01&end_date=2025-12-31&format=csv
+        """
+        if not current_user_is_admin():
+            return jsonify({"msg": "Brak uprawnień"}), 403
+
+        export_format = request.args.get('format', 'csv')
+        if export_format not in ('csv', 'ndjson'):
+            return jsonify({"msg": "Parametr format musi mieć wartość csv albo ndjson"}), 400
+        try:
+            start_date, end_date = parse_report_range()
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        query = db.session.query(Order, Product.description).outerjoin(
+            Order.product
+        ).filter(
+            Order.delivery_date >= start_date,
+            Order.delivery_date <= end_date
+        ).order_by(Order.delivery_date, Order.id)
+
+        if export_format == 'csv':
+            response = stream_csv(query, ORDER_EXPORT_COLUMNS,
+                                  lambda row: list(order_export_row(*row).values()))
+        else:
+            response = stream_ndjson(query, lambda row: order_export_row(*row))
+        filename = f"orders_{start_date.isoformat()}_{end_date.isoformat()}.{export_format}"
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @app.route('/admin/report/jobs', methods=['POST'])
+    @jwt_required()
+    def create_report_job():
+        """
+        Zleca raport do wykonania w tle - długie zakresy dat nie blokują
+        wtedy workera obsługującego żądanie. Bez group_by liczony jest raport
+        jak /admin/report, z group_by - kostka jak /admin/report/cube.
+        Raporty zakresów zakończonych przed dniem dzisiejszym są zapamiętywane:
+        ponowne zlecenie zwraca istniejące zadanie (cached: true).
 
-        # Przekształcenie wyników w słownik, filtrując województwa z liczbą zamówień > 0
-        orders_per_province = {province.value: count for province, count in province_counts_query if count > 0}
+        Input JSON:
+        {
+            "start_date": "YYYY-MM-DD",
+            "end_date": "YYYY-MM-DD",
+            "group_by": "province,month" (opcjonalne, także lista)
+        }
 
-        return jsonify({
-            "total_orders": total_orders,
-            "total_sum": total_sum,
-            "orders_per_province": orders_per_province
-        }), 200
+        Output JSON (202):
+        {"job_id": "string", "status": "queued|running|done", "cached": bool}
+        + nagłówek Location z adresem statusu zadania
+        """
+        if not current_user_is_admin():
+            return jsonify({"msg": "Brak uprawnień"}), 403
+
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"msg": "Brak danych JSON"}), 400
+        try:
+            start_date, end_date = parse_report_range(data)
+            group_by = data.get('group_by')
+            if group_by is not None:
+                if isinstance(group_by, list) and all(isinstance(d, str) for d in group_by):
+                    group_by = ','.join(group_by)
+                elif not isinstance(group_by, str):
+                    raise ValueError("group_by musi być listą wymiarów")
+                group_by = parse_group_by(group_by)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        job, cached = get_report_jobs().submit(start_date, end_date, group_by)
+        response = jsonify({"job_id": job.id, "status": job.status, "cached": cached})
+        response.headers['Location'] = f"/admin/report/jobs/{job.id}"
+        return response, 202
+
+    @app.route('/admin/report/jobs/<job_id>', methods=['GET'])
+    @jwt_required()
+    def get_report_job(job_id):
+        """
+        Status zadania raportu. Output JSON:
+        {
+            "job_id": "string",
+            "status": "queued|running|done|failed",
+            "params": {"start_date", "end_date", "group_by"},
+            "created_at": "...", "finished_at": "..." | null,
+            "result": {...}   (dla status=done, jak odpowiedź raportu synchronicznego)
+            "error": "string" (dla status=failed)
+        }
+        """
+        if not current_user_is_admin():
+            return jsonify({"msg": "Brak uprawnień"}), 403
+
+        job = db.session.get(ReportJob, job_id)
+        if not job:
+            return jsonify({"msg": "Zadanie nie istnieje"}), 404
+        return jsonify(job_to_dict(job)), 200
 
     # --------------------- MOJE ZAMÓWIENIA ---------------------
     @app.route('/my_orders', methods=['GET'])
     @jwt_required()
     def my_orders():
         """
-        Endpoint dla użytkownika do pobrania swoich zamówień.
+        Endpoint dla użytkownika do pobrania swoich zamówień,
+        posortowanych po order_id. Zamówienia i opisy produktów pobierane
+        są jednym zapytaniem (JOIN).
+
+        Bez parametrów limit i after zwracane są wszystkie zamówienia
+        (tak jak przed wprowadzeniem stronicowania). Stronicowanie kluczem:
+        kolejną stronę pobieramy podając w after wartość z nagłówka
+        X-Next-Cursor (brak nagłówka = ostatnia strona).
 
         Input:
             - Header:
                 Authorization: Bearer <JWT Token>
+            - Query Parameters (optional):
+                limit: int (domyślnie ORDERS_PAGE_LIMIT, gdy podano after)
+                after: int - order_id ostatniego zamówienia z poprzedniej strony
+                start_date, end_date: "YYYY-MM-DD" - zakres dat dostawy
+                stream: "1" - odpowiedź strumieniowa (domyślnie bez limitu),
+                        zamówienia czytane z bazy partiami
 
         Output JSON:
         [
@@ -491,22 +1294,42 @@ def create_app(test_config=None):
         ]
         """
         current_user_id = get_jwt_identity()
-        orders = Order.query.filter_by(user_id=current_user_id).all()
-
-        result = []
-        for order in orders:
-            product = Product.query.get(order.product_id)
-            result.append({
-                "order_id": order.id,
-                "product_id": order.product_id,
-                "product_description": product.description if product else None,
-                "delivery_date": order.delivery_date,
-                "address": order.address,
-                "transport_type": order.transport_type.value,
-                "province": order.province.value
-            })
-
-        return jsonify(result), 200
+        stream = is_stream_requested()
+        try:
+            if stream or not is_page_requested():
+                limit, after = parse_page_args(None, None)
+            else:
+                limit, after = parse_page_args(app.config['ORDERS_PAGE_LIMIT'],
+                                               app.config['ORDERS_PAGE_MAX_LIMIT'])
+            start_date = parse_date_arg('start_date')
+            end_date = parse_date_arg('end_date')
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        query = db.session.query(Order, Product.description).outerjoin(
+            Order.product
+        ).filter(Order.user_id == current_user_id)
+        if after is not None:
+            query = query.filter(Order.id > after)
+        if start_date is not None:
+            query = query.filter(Order.delivery_date >= start_date)
+        if end_date is not None:
+            query = query.filter(Order.delivery_date <= end_date)
+        query = query.order_by(Order.id)
+
+        if stream:
+            if limit is not None:
+                query = query.limit(limit)
+            return stream_json_array(query, lambda row: order_to_dict(*row))
+        if limit is None:
+            return jsonify([order_to_dict(order, description) for order, description in query]), 200
+
+        # Pobieramy o jeden wiersz więcej, żeby wiedzieć, czy jest kolejna strona
+        rows = query.limit(limit + 1).all()
+        response = jsonify([order_to_dict(order, description) for order, description in rows[:limit]])
+        if len(rows) > limit:
+            response.headers['X-Next-Cursor'] = str(rows[limit - 1].Order.id)
+        return response, 200
 
     # --------------------- USUŃ PRODUKT ---------------------
     @app.route('/product/<int:product_id>', methods=['DELETE'])
@@ -514,6 +1337,9 @@ def create_app(test_config=None):
     def delete_product(product_id):
         """
         Endpoint do usuwania produktu - wyłącznie przez admina.
+        Produktu, który ma zamówienia, nie można usunąć (409) - zamówienia
+        odwołują się do niego kluczem obcym (PostgreSQL odrzuciłby usunięcie,
+        a SQLite zostawiłby zamówienia bez produktu).
 
         Input:
             - URL Parameter: product_id (integer)
@@ -521,20 +1347,272 @@ def create_app(test_config=None):
         Header:
             Authorization: Bearer <JWT Token>
         """
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        if not user or not user.is_admin:
+        if not current_user_is_admin():
             return jsonify({"msg": "Brak uprawnień"}), 403
 
         product = Product.query.get(product_id)
         if not product:
             return jsonify({"msg": "Produkt nie istnieje"}), 404
+        if db.session.query(Order.id).filter_by(product_id=product_id).first() is not None:
+            return jsonify({"msg": "Nie można usunąć produktu, który ma zamówienia"}), 409
 
+        image_hash = product.image_hash
         db.session.delete(product)
-        db.session.commit()
+        commit_catalog_change()
+        release_image(image_hash)
 
         return jsonify({"msg": "Produkt usunięty"}), 200
 
+    # --------------------- FLOTA I PLAN TRANSPORTÓW ---------------------
+    @app.route('/admin/vehicles', methods=['POST'])
+    @jwt_required()
+    def add_vehicle():
+        """
+        Dodaje pojazd do floty - wyłącznie przez admina.
+
+        Input JSON:
+        {
+            "registration": "string",       # numer rejestracyjny, unikalny
+            "transport_type": "string",     # "TRUCK" albo "COURIER"
+            "capacity": integer,            # ładowność w paletach (jak quantity zamówień)
+            "depot_province": "string",     # województwo bazy, np. "mazowieckie"
+            "active": boolean               # optional, domyślnie true
+        }
+        """
+        if not current_user_is_admin():
+            return jsonify({"msg": "Brak uprawnień"}), 403
+        try:
+            fields = parse_vehicle_data(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        if Vehicle.query.filter_by(registration=fields['registration']).first():
+            return jsonify({"msg": "Pojazd o tym numerze rejestracyjnym już istnieje"}), 400
+
+        vehicle = Vehicle(**fields)
+        db.session.add(vehicle)
+        db.session.commit()
+        return jsonify(vehicle_to_dict(vehicle)), 201
+
+    @app.route('/admin/vehicles', methods=['GET'])
+    @jwt_required()
+    def list_vehicles():
+        """
+        Lista pojazdów floty posortowana po id. Z parametrem date
+        ("YYYY-MM-DD") tylko pojazdy dostępne w tym dniu (aktywne i bez
+        wpisu w kalendarzu niedostępności).
+        """
+        if not current_user_is_admin():
+            return jsonify({"msg": "Brak uprawnień"}), 403
+        try:
+            day = parse_date_arg('date')
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        query = Vehicle.query
+        if day is not None:
+            query = query.filter(Vehicle.active.is_(True), ~Vehicle.unavailability.any(
+                (VehicleUnavailability.start_date <= day) & (VehicleUnavailability.end_date >= day)
+            ))
+        return jsonify([vehicle_to_dict(v) for v in query.order_by(Vehicle.id)]), 200
+
+    @app.route('/admin/vehicles/<int:vehicle_id>', methods=['PUT'])
+    @jwt_required()
+    def edit_vehicle(vehicle_id):
+        """
+        Edytuje pojazd - body JSON może zawierać dowolne z pól jak przy
+        dodawaniu. Wycofanie pojazdu z floty: {"active": false}
+        (zapisane plany transportów pozostają bez zmian).
+        """
+        if not current_user_is_admin():
+            return jsonify({"msg": "Brak uprawnień"}), 403
+        vehicle = db.session.get(Vehicle, vehicle_id)
+        if not vehicle:
+            return jsonify({"msg": "Pojazd nie istnieje"}), 404
+        try:
+            fields = parse_vehicle_data(request.get_json(silent=True), partial=True)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        registration = fields.get('registration')
+        if registration and registration != vehicle.registration and \
+                Vehicle.query.filter_by(registration=registration).first():
+            return jsonify({"msg": "Pojazd o tym numerze rejestracyjnym już istnieje"}), 400
+
+        for name, value in fields.items():
+            setattr(vehicle, name, value)
+        db.session.commit()
+        return jsonify(vehicle_to_dict(vehicle)), 200
+
+    @app.route('/admin/vehicles/<int:vehicle_id>/unavailability', methods=['POST'])
+    @jwt_required()
+    def add_vehicle_unavailability(vehicle_id):
+        """
+        Dodaje do kalendarza pojazdu okres niedostępności (serwis, urlop
+        kierowcy itp.). Obie daty włącznie.
+
+        Input JSON:
+        {
+            "start_date": "YYYY-MM-DD",
+            "end_date": "YYYY-MM-DD",
+            "reason": "string"              # optional
+        }
+        """
+        if not current_user_is_admin():
+            return jsonify({"msg": "Brak uprawnień"}), 403
+        if not db.session.get(Vehicle, vehicle_id):
+            return jsonify({"msg": "Pojazd nie istnieje"}), 404
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"msg": "Brak danych w żądaniu"}), 400
+        try:
+            start_date, end_date = parse_report_range(data)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        reason = data.get('reason')
+        if reason is not None and (not isinstance(reason, str) or len(reason) > 200):
+            return jsonify({"msg": "Powód może mieć najwyżej 200 znaków"}), 400
+
+        entry = VehicleUnavailability(vehicle_id=vehicle_id, start_date=start_date,
+                                      end_date=end_date, reason=reason)
+        db.session.add(entry)
+        db.session.commit()
+        return jsonify({
+            "unavailability_id": entry.id,
+            "vehicle_id": vehicle_id,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "reason": reason,
+        }), 201
+
+    @app.route('/admin/transport-plan', methods=['POST'])
+    @jwt_required()
+    def create_transport_plan():
+        """
+        Planuje transporty na dzień dostawy: zamówienia TRUCK i COURIER
+        są rozdzielane na dostępne pojazdy (fleet.py) z uwzględnieniem
+        ładowności i województwa. Poprzedni plan tego dnia jest zastępowany.
+
+        Input JSON:
+        {
+            "date": "YYYY-MM-DD"
+        }
+
+        Output JSON:
+        {
+            "date": "YYYY-MM-DD",
+            "orders": integer,
+            "assigned": integer,
+            "vehicles_used": integer,
+            "unassigned_order_ids": [integer, ...]
+        }
+        """
+        if not current_user_is_admin():
+            return jsonify({"msg": "Brak uprawnień"}), 403
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('date'), str):
+            return jsonify({"msg": "Brak parametru date"}), 400
+        try:
+            day = parse_date_arg('date', data)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        return jsonify(plan_transports(day)), 200
+
+    @app.route('/admin/transport-plan', methods=['GET'])
+    @jwt_required()
+    def get_transport_plan():
+        """
+        Zapisany plan transportów na dzień (?date=YYYY-MM-DD): lista kursów
+        z pojazdem, województwem dostawy, ładunkiem i id zamówień.
+        """
+        if not current_user_is_admin():
+            return jsonify({"msg": "Brak uprawnień"}), 403
+        try:
+            day = parse_date_arg('date')
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        if day is None:
+            return jsonify({"msg": "Brak parametru date"}), 400
+        return jsonify({"date": day.isoformat(), "trips": transport_plan(day)}), 200
+
+    # --------------------- KOMENDY CLI ---------------------
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Tworzy tabele bazy i indeks wyszukiwania produktów (jeśli ich brak)."""
+        init_db()
+        print("Baza danych gotowa")
+
+    @app.cli.command('bootstrap-admin')
+    @click.option('--username', default=None, help='Domyślnie ADMIN_USERNAME z .env.')
+    @click.option('--password', default=None, help='Domyślnie ADMIN_PASSWORD z .env.')
+    def bootstrap_admin_command(username, password):
+        """Tworzy konto admina, jeśli jeszcze nie istnieje."""
+        if bootstrap_admin(username, password):
+            print("Utworzono konto admina")
+        else:
+            print("Konto admina już istnieje")
+
+    @app.cli.command('seed-data')
+    @click.option('--users', default=100, show_default=True)
+    @click.option('--products', default=1000, show_default=True)
+    @click.option('--orders', default=10000, show_default=True)
+    @click.option('--start-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Pierwszy dzień dostaw (domyślnie --days dni przed dziś).')
+    @click.option('--days', default=365, show_default=True, help='Liczba dni, na które rozkładane są dostawy.')
+    @click.option('--images', default=100, show_default=True, help='Liczba różnych obrazów produktów.')
+    @click.option('--image-size', default=0, show_default=True,
+                  help='Rozmiar obrazów w pikselach (0 = produkty bez obrazów).')
+    @click.option('--vehicles', default=0, show_default=True, help='Liczba pojazdów floty.')
+    @click.option('--seed', default=0, show_default=True, help='Ziarno losowania - te same dane dla tego samego ziarna.')
+    @click.option('--batch-size', default=50000, show_default=True, help='Wierszy na INSERT i transakcję.')
+    def seed_data_command(users, products, orders, start_date, days, images, image_size, vehicles, seed,
+                          batch_size):
+        """
+        Generuje dane testowe (użytkownicy, produkty, zamówienia) do testów
+        wydajności. Hasło użytkowników: seed.SEED_PASSWORD.
+        """
+        init_db()
+        generate_data(users=users, products=products, orders=orders,
+                      start_date=start_date.date() if start_date else None, days=days,
+                      images=images, image_size=image_size, vehicles=vehicles, seed=seed,
+                      batch_size=batch_size)
+
+    @app.cli.command('plan-transports')
+    @click.option('--date', 'day', type=click.DateTime(formats=['%Y-%m-%d']), required=True,
+                  help='Dzień dostawy do zaplanowania.')
+    def plan_transports_command(day):
+        """Przydziela zamówienia z dnia dostawy do pojazdów floty (jak POST /admin/transport-plan)."""
+        summary = plan_transports(day.date())
+        print(f"{summary['date']}: {summary['assigned']}/{summary['orders']} zamówień "
+              f"w {summary['vehicles_used']} pojazdach, bez pojazdu: {len(summary['unassigned_order_ids'])}")
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Przelicza dzienne agregaty raportów na podstawie tabeli orders."""
+        rows = rebuild_rollups()
+        print(f"Przeliczono agregaty raportów: {rows} wierszy")
+
+    @app.cli.command('upgrade-db')
+    @click.option('--batch-size', default=5000, show_default=True,
+                  help='Liczba zamówień kopiowanych w jednej partii.')
+    def upgrade_db_command(batch_size):
+        """
+        Migruje istniejącą bazę: obrazy produktów z kolumny products.image do
+        magazynu obrazów, orders.delivery_date jako DATE, kolumny
+        orders.quantity i orders.unit_price oraz indeksy zamówień.
+        Bezpieczne do wielokrotnego uruchomienia.
+        """
+        upgrade_products_schema()
+        upgrade_orders_schema(batch_size=batch_size)
+
+    @app.cli.command('gc-images')
+    @click.option('--grace', type=float, default=None,
+                  help='Sekundy od ostatniego użycia obrazu; domyślnie IMAGE_GC_GRACE.')
+    def gc_images_command(grace):
+        """Usuwa z magazynu obrazy, do których nie odwołuje się żaden produkt."""
+        if grace is None:
+            grace = app.config['IMAGE_GC_GRACE']
+        removed = collect_unused_images(grace)
+        print(f"Usunięto nieużywane obrazy: {removed}")
+
     # --------------------- HANDLER BŁĘDÓW ---------------------
     @app.errorhandler(422)
     def handle_unprocessable_entity(err):
@@ -0,0 +1,113 @@
+# bench_auth.py
+"""
+Koszt autoryzacji na ścieżce żądań admina: czas żądania i liczba zapytań
+do tabeli users, przed i po wprowadzeniu claims roli i cache użytkowników.
+
+"przed" - token bez claims, cache wyłączony (USER_CACHE_TTL=0): każde
+          żądanie czyta użytkownika z bazy, tak jak dawniej User.query.get
+"po"    - token z claims is_admin i cache użytkowników (domyślna konfiguracja)
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.bench_auth --requests 2000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CASES = [
+    # (opis, metoda, endpoint, czy admin, oczekiwany status)
+    ("admin GET /admin/report", "get", "/admin/report?start_date=2025-01-01&end_date=2025-01-31", True, 200),
+    ("user  POST /product (403)", "post", "/product", False, 403),
+]
+
+
+def make_app(db_path, mode):
+    from app import create_app
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'IMAGE_STORE_PATH': os.path.join(os.path.dirname(db_path), 'images'),
+    }
+    if mode == "before":
+        config['USER_CACHE_TTL'] = 0
+    return create_app(test_config=config)
+
+
+def make_tokens(app, mode):
+    from flask_jwt_extended import create_access_token
+    from bootstrap import init_db, bootstrap_admin
+    from db_models import db, User
+    from user_cache import role_claims
+
+    with app.app_context():
+        init_db()
+        bootstrap_admin()
+        user = User.query.filter_by(username="bench").first()
+        if user is None:
+            user = User(username="bench", email="bench@example.com", password="x")
+            db.session.add(user)
+            db.session.commit()
+        admin = User.query.filter_by(is_admin=True).first()
+        tokens = {}
+        for is_admin, account in ((True, admin), (False, user)):
+            claims = role_claims(account) if mode == "after" else None
+            tokens[is_admin] = create_access_token(identity=account.id, additional_claims=claims)
+        return tokens
+
+
+def measure(db_path, mode, requests):
+    from sqlalchemy import event
+    from db_models import db
+
+    app = make_app(db_path, mode)
+    tokens = make_tokens(app, mode)
+    client = app.test_client()
+    user_queries = [0]
+
+    def count(conn, cursor, statement, *args):
+        if "FROM users" in statement:
+            user_queries[0] += 1
+
+    results = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", count)
+    for label, method, endpoint, is_admin, status in CASES:
+        headers = {"Authorization": f"Bearer {tokens[is_admin]}"}
+        call = getattr(client, method)
+        assert call(endpoint, headers=headers, json={}).status_code == status
+        user_queries[0] = 0
+        start = time.perf_counter()
+        for _ in range(requests):
+            call(endpoint, headers=headers, json={})
+        elapsed = time.perf_counter() - start
+        results.append({
+            "case": label,
+            "mode": mode,
+            "us_per_request": round(elapsed / requests * 1e6, 1),
+            "user_queries_per_request": round(user_queries[0] / requests, 3),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        results = measure(db_path, "before", args.requests) + measure(db_path, "after", args.requests)
+
+    print(f"{'case':<28} {'mode':<7} {'us/request':>11} {'users queries/request':>22}")
+    for r in sorted(results, key=lambda r: r["case"]):
+        print(f"{r['case']:<28} {r['mode']:<7} {r['us_per_request']:>11.1f} "
+              f"{r['user_queries_per_request']:>22.3f}")
+
+
+if __name__ == "__main__":
+    main()
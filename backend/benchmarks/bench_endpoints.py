@@ -0,0 +1,318 @@
+# bench_endpoints.py
+"""
+Opóźnienia (p50/p95/p99) i przepustowość głównych endpointów na bazie
+o zadanej wielkości: /products, /product/<id>, /my_orders, /order,
+/login i /admin/report - przez klienta testowego Flaska (bez sieci,
+sekwencyjnie) i przez prawdziwy proces gunicorna (gunicorn.conf.py,
+równoległe połączenia keep-alive).
+
+Wyniki zapisywane są do JSON (domyślnie benchmarks/results/), razem
+z commitem i parametrami, więc kolejne wersje można porównać:
+    python -m benchmarks.bench_endpoints --compare benchmarks/results/poprzedni.json
+
+Baza budowana jest raz dla danych parametrów w --data-dir i używana
+ponownie przy kolejnych uruchomieniach (budowa 1M zamówień trwa).
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.bench_endpoints --products 10000 --orders 1000000
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench_serving import free_port, wait_for_port  # noqa: E402
+from seed import SEED_PASSWORD  # noqa: E402
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+ENDPOINTS = ["/products", "/product/<id>", "/my_orders", "/order", "/login", "/admin/report"]
+
+
+def make_server_app():
+    """Fabryka aplikacji benchmarku: baza z BENCH_DB, obrazy z BENCH_IMAGES, bez limitów logowania."""
+    from app import create_app
+    return create_app(test_config={
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.environ['BENCH_DB']}",
+        'IMAGE_STORE_PATH': os.environ['BENCH_IMAGES'],
+        'RATE_LIMIT_ENABLED': False,
+    })
+
+
+def build_fixture(users, products, orders, image_size, seed):
+    """Buduje bazę generatorem danych (seed.py): zamówienia z ostatnich 2 lat."""
+    from bootstrap import init_db, bootstrap_admin
+    from seed import generate_data
+
+    app = make_server_app()
+    with app.app_context():
+        init_db()
+        bootstrap_admin()
+        generate_data(users=users, products=products, orders=orders, days=730,
+                      images=500, image_size=image_size, seed=seed, log=lambda msg: None)
+
+
+def make_tokens(count=200):
+    """Tokeny admina i pierwszych count użytkowników oraz ich adresy email (dla /login)."""
+    from flask_jwt_extended import create_access_token
+    from db_models import User
+    from user_cache import role_claims
+
+    app = make_server_app()
+    with app.app_context():
+        admin = User.query.filter_by(is_admin=True).first()
+        users = User.query.filter_by(is_admin=False).order_by(User.id).limit(count).all()
+        return {
+            "admin": create_access_token(identity=admin.id, additional_claims=role_claims(admin)),
+            "users": {u.id: create_access_token(identity=u.id, additional_claims=role_claims(u))
+                      for u in users},
+            "emails": [u.email for u in users],
+        }
+
+
+def request_factory(endpoint, tokens, products, rng):
+    """Zwraca funkcję generującą kolejne żądanie: (metoda, ścieżka, json, nagłówki)."""
+    user_ids = list(tokens["users"])
+    auth = lambda uid: {"Authorization": f"Bearer {tokens['users'][uid]}"}  # noqa: E731
+    today = date.today()
+
+    def make():
+        if endpoint == "/products":
+            return "GET", f"/products?limit=100&after={rng.randrange(products)}", None, {}
+        if endpoint == "/product/<id>":
+            return "GET", f"/product/{rng.randint(1, products)}", None, {}
+        if endpoint == "/my_orders":
+            return "GET", "/my_orders?limit=100", None, auth(rng.choice(user_ids))
+        if endpoint == "/order":
+            return "POST", "/order", {
+                "product_id": rng.randint(1, products),
+                "delivery_date": (today + timedelta(days=rng.randrange(30))).isoformat(),
+                "address": "ul. Benchmarkowa 1",
+                "transport_type": "TRUCK",
+                "province": "mazowieckie",
+            }, auth(rng.choice(user_ids))
+        if endpoint == "/login":
+            return "POST", "/login", {"email": rng.choice(tokens["emails"]),
+                                      "password": SEED_PASSWORD}, {}
+        if endpoint == "/admin/report":
+            year = today.year - rng.randint(0, 1)
+            return "GET", f"/admin/report?start_date={year}-01-01&end_date={year}-12-31", None, \
+                {"Authorization": f"Bearer {tokens['admin']}"}
+        raise ValueError(endpoint)
+
+    return make
+
+
+def summarize(target, endpoint, latencies, errors, elapsed):
+    latencies = sorted(latencies)
+
+    def pct(p):
+        return round(latencies[max(0, int(len(latencies) * p) - 1)] * 1000, 2) if latencies else None
+
+    return {
+        "target": target,
+        "endpoint": endpoint,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def bench_test_client(tokens, args):
+    app = make_server_app()
+    client = app.test_client()
+    results = []
+    for endpoint in ENDPOINTS:
+        make = request_factory(endpoint, tokens, args.products, random.Random(args.seed))
+        for _ in range(args.warmup):
+            method, path, body, headers = make()
+            client.open(path, method=method, json=body, headers=headers)
+        latencies, errors = [], 0
+        start_all = time.perf_counter()
+        for _ in range(args.requests):
+            method, path, body, headers = make()
+            start = time.perf_counter()
+            response = client.open(path, method=method, json=body, headers=headers)
+            response.get_data()
+            if response.status_code < 400:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+        results.append(summarize("testclient", endpoint, latencies, errors,
+                                 time.perf_counter() - start_all))
+    return results
+
+
+def _http_worker(port, endpoint, tokens, products, count, seed, out, lock):
+    make = request_factory(endpoint, tokens, products, random.Random(seed))
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    latencies, errors = [], 0
+    for _ in range(count):
+        method, path, body, headers = make()
+        payload = json.dumps(body) if body is not None else None
+        if payload is not None:
+            headers = {**headers, "Content-Type": "application/json"}
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+    conn.close()
+    with lock:
+        out["latencies"].extend(latencies)
+        out["errors"] += errors
+
+
+def bench_gunicorn(tokens, args, env):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "benchmarks.bench_endpoints:make_server_app()"],
+        cwd=BACKEND_DIR, env={**env, "PORT": str(port), "GUNICORN_ACCESSLOG": ""},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    results = []
+    try:
+        wait_for_port(port)
+        for endpoint in ENDPOINTS:
+            per_thread = max(1, args.requests // args.concurrency)
+            out, lock = {"latencies": [], "errors": 0}, threading.Lock()
+            threads = [
+                threading.Thread(target=_http_worker, args=(
+                    port, endpoint, tokens, args.products, per_thread, args.seed + n, out, lock))
+                for n in range(args.concurrency)
+            ]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            results.append(summarize("gunicorn", endpoint, out["latencies"], out["errors"],
+                                     time.perf_counter() - start))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, previous=None):
+    baseline = {(r["target"], r["endpoint"]): r for r in (previous or {}).get("results", [])}
+    print(f"{'target':<11} {'endpoint':<15} {'req':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'req/s':>8}" + ("  p95 vs poprzedni" if baseline else ""))
+    for r in results:
+        line = (f"{r['target']:<11} {r['endpoint']:<15} {r['requests']:>6} {r['errors']:>4} "
+                f"{r['p50_ms'] or 0:>8.2f} {r['p95_ms'] or 0:>8.2f} {r['p99_ms'] or 0:>8.2f} "
+                f"{r['throughput_rps'] or 0:>8.1f}")
+        old = baseline.get((r["target"], r["endpoint"]))
+        if old and old.get("p95_ms") and r["p95_ms"]:
+            line += f"  {(r['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--image-size", type=int, default=64, help="obrazy produktów image-size x image-size px")
+    parser.add_argument("--requests", type=int, default=500, help="żądań na endpoint")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8, help="połączeń do gunicorna")
+    parser.add_argument("--target", choices=["testclient", "gunicorn", "both"], default="both")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "agrox-bench"))
+    parser.add_argument("--output", help="plik wyników JSON (domyślnie benchmarks/results/<czas>-<commit>.json)")
+    parser.add_argument("--compare", help="poprzedni plik wyników do porównania")
+    args = parser.parse_args()
+
+    fixture = f"u{args.users}-p{args.products}-o{args.orders}-i{args.image_size}-s{args.seed}"
+    fixture_dir = os.path.join(args.data_dir, fixture)
+    env = {
+        **os.environ,
+        "BENCH_DB": os.path.join(fixture_dir, "bench.db"),
+        "BENCH_IMAGES": os.path.join(fixture_dir, "images"),
+    }
+    os.environ.update(env)
+
+    ready_marker = os.path.join(fixture_dir, "ready")
+    if os.path.exists(ready_marker):
+        print(f"Używam istniejącej bazy {fixture_dir}")
+    else:
+        os.makedirs(fixture_dir, exist_ok=True)
+        if os.path.exists(env["BENCH_DB"]):
+            os.remove(env["BENCH_DB"])
+        start = time.perf_counter()
+        build_fixture(args.users, args.products, args.orders, args.image_size, args.seed)
+        open(ready_marker, "w").close()
+        print(f"Zbudowano bazę {fixture_dir} w {time.perf_counter() - start:.1f} s")
+
+    tokens = make_tokens()
+    results = []
+    if args.target in ("testclient", "both"):
+        results += bench_test_client(tokens, args)
+    if args.target in ("gunicorn", "both"):
+        # /order zapisuje do bazy - kolejne uruchomienia mają nieco więcej zamówień
+        results += bench_gunicorn(tokens, args, env)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "cpu_count": multiprocessing.cpu_count(),
+            "fixture": {"users": args.users, "products": args.products, "orders": args.orders,
+                        "image_size": args.image_size, "seed": args.seed},
+            "requests_per_endpoint": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_results(results, previous)
+    print(f"Wyniki zapisane w {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# bench_fleet.py
+"""
+Czas planowania transportów (fleet.py) dla jednego dnia dostaw:
+wczytanie zamówień i dostępnych pojazdów, bin packing oraz zapis
+przydziałów, osobno i łącznie (plan_transports), a także odczyt planu.
+
+Dane tworzy generator (seed.py): --orders zamówień z jednym dniem dostawy
+i flota --vehicles pojazdów z bazami w całym kraju. Co dziesiąty pojazd
+ma tego dnia wpis w kalendarzu niedostępności.
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.bench_fleet --orders 100000 --vehicles 40000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DAY = date(2025, 5, 15)
+
+
+def timed(results, name, fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    results[name] = round(time.perf_counter() - start, 3)
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--vehicles", type=int, default=40000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from sqlalchemy import insert
+    from app import create_app
+    from bootstrap import init_db
+    from db_models import db, Vehicle, VehicleUnavailability
+    from fleet import available_vehicles, load_orders, pack_orders, plan_transports, save_assignments, \
+        transport_plan
+    from seed import generate_data
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = create_app(test_config={
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+            'IMAGE_STORE_PATH': os.path.join(tmp_dir, 'images'),
+            # Wsadowe INSERT-y generatora i planu są z założenia długie
+            'SQL_SLOW_QUERY_MS': None,
+        })
+        with app.app_context():
+            init_db()
+            generate_data(users=1000, products=1000, orders=args.orders, start_date=DAY, days=1,
+                          vehicles=args.vehicles, seed=args.seed, log=lambda message: None)
+            vehicle_ids = [v for (v,) in db.session.query(Vehicle.id).order_by(Vehicle.id)]
+            db.session.execute(insert(VehicleUnavailability), [
+                {"vehicle_id": v, "start_date": DAY, "end_date": DAY, "reason": "serwis"}
+                for v in vehicle_ids[::10]
+            ])
+            db.session.commit()
+
+            results = {}
+            orders = timed(results, "load_orders_s", load_orders, DAY)
+            vehicles = timed(results, "available_vehicles_s", available_vehicles, DAY)
+            trips, unassigned = timed(results, "pack_orders_s", pack_orders, orders, vehicles)
+            timed(results, "save_assignments_s", lambda: (save_assignments(DAY, trips), db.session.commit()))
+            summary = timed(results, "plan_transports_s", plan_transports, DAY)
+            plan = timed(results, "read_plan_s", transport_plan, DAY)
+
+    load = sum(t["load"] for t in trips)
+    capacity = sum(t["capacity"] for t in trips)
+    print(f"Zamówienia do rozwiezienia: {summary['orders']}, dostępne pojazdy: {len(vehicles)}")
+    print(f"Przydzielone: {summary['assigned']}, bez pojazdu: {len(summary['unassigned_order_ids'])}, "
+          f"kursy: {len(plan)}, wypełnienie: {load / capacity:.1%}" if capacity else "Brak kursów")
+    for name, seconds in results.items():
+        print(f"{name:<22} {seconds:>8.3f} s")
+    print(json.dumps({"orders": summary["orders"], "vehicles": len(vehicles),
+                      "assigned": summary["assigned"], "trips": len(plan), **results}))
+
+
+if __name__ == "__main__":
+    main()
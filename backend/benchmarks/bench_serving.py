@@ -0,0 +1,229 @@
+# bench_serving.py
+"""
+Przepustowość serwera gunicorn (gunicorn.conf.py) w różnych trybach:
+sync z jednym procesem (dawna konfiguracja obrazu Docker) oraz tryby
+sync, gthread i gevent z domyślnym doborem liczby procesów/wątków.
+
+Każdy tryb dostaje tę samą bazę SQLite i mieszankę żądań:
+lista produktów, obraz produktu i strona zamówień użytkownika.
+Obciążenie generuje --clients procesów po --threads wątków, każdy
+z własnym połączeniem keep-alive.
+
+Uruchomienie (z katalogu backend; wymaga gunicorna, tryb gevent - gevent):
+    python -m benchmarks.bench_serving --seconds 10
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# (nazwa, GUNICORN_MODE, WEB_CONCURRENCY; None = domyślnie z gunicorn.conf.py)
+CASES = [
+    ("sync x1 (przed)", "sync", "1"),
+    ("sync", "sync", None),
+    ("gthread", "gthread", None),
+    ("gevent", "gevent", None),
+]
+
+
+def make_server_app():
+    """Fabryka aplikacji dla gunicorna: baza i obrazy z BENCH_DB/BENCH_IMAGES."""
+    from app import create_app
+    return create_app(test_config={
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.environ['BENCH_DB']}",
+        'IMAGE_STORE_PATH': os.environ['BENCH_IMAGES'],
+    })
+
+
+def populate(products, orders):
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import insert
+    from bootstrap import init_db
+    from db_models import db, User, Product, Order, Province, TransportType
+    from image_store import get_image_store
+
+    app = make_server_app()
+    with app.app_context():
+        init_db()
+        image_hash = get_image_store().put(b'\x89PNG\r\n\x1a\n' + os.urandom(20000))
+        user = User(username="bench", email="bench@example.com", password="x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.execute(insert(Product), [
+            {"description": f"Produkt {i}", "price": 1.0 + i % 100, "image_hash": image_hash}
+            for i in range(products)
+        ])
+        db.session.execute(insert(Order), [
+            {
+                "user_id": user.id,
+                "product_id": 1 + i % products,
+                "unit_price": 1.0 + i % products % 100,
+                "delivery_date": date(2025, 1 + i % 12, 1 + i % 28),
+                "address": f"ul. Testowa {i}",
+                "transport_type": list(TransportType)[i % 3],
+                "province": list(Province)[i % len(Province)],
+            }
+            for i in range(orders)
+        ])
+        db.session.commit()
+        return create_access_token(identity=user.id)
+
+
+def request_paths(token):
+    headers = {"Authorization": f"Bearer {token}"}
+    return [
+        ("/products?limit=20", {}),
+        ("/product/1/image", {}),
+        ("/my_orders?limit=50", headers),
+    ]
+
+
+def client_worker(port, token, seconds, threads, queue):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+    paths = request_paths(token)
+
+    def run(offset):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local = []
+        i = offset
+        while time.monotonic() < deadline:
+            path, headers = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                ok = False
+            if ok:
+                local.append(time.perf_counter() - start)
+            else:
+                with lock:
+                    errors[0] += 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    queue.put((latencies, errors[0]))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("gunicorn nie wystartował")
+
+
+def run_case(mode, workers, env, token, args):
+    port = free_port()
+    env = {**env, "GUNICORN_MODE": mode, "PORT": str(port)}
+    if workers:
+        env["WEB_CONCURRENCY"] = workers
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "benchmarks.bench_serving:make_server_app()"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(port)
+        time.sleep(1)
+        queue = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=client_worker,
+                                    args=(port, token, args.seconds, args.threads, queue))
+            for _ in range(args.clients)
+        ]
+        for c in clients:
+            c.start()
+        results = [queue.get() for _ in clients]
+        for c in clients:
+            c.join()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+    latencies = sorted(l for result in results for l in result[0])
+    errors = sum(result[1] for result in results)
+    return {
+        "requests_per_s": round(len(latencies) / args.seconds, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1) if latencies else None,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=4, help="procesy generujące obciążenie")
+    parser.add_argument("--threads", type=int, default=8, help="połączenia na proces klienta")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = {
+            **os.environ,
+            "BENCH_DB": os.path.join(tmp_dir, "bench.db"),
+            "BENCH_IMAGES": os.path.join(tmp_dir, "images"),
+            "GUNICORN_ACCESSLOG": "",
+        }
+        os.environ.update(env)
+        token = populate(args.products, args.orders)
+
+        results = []
+        for name, mode, workers in CASES:
+            try:
+                result = run_case(mode, workers, env, token, args)
+            except (RuntimeError, subprocess.TimeoutExpired) as e:
+                result = {"error": str(e)}
+            results.append({"case": name, **result})
+
+    print(f"CPU: {multiprocessing.cpu_count()}, klienci: {args.clients} x {args.threads} połączeń, "
+          f"{args.seconds} s na tryb")
+    print(f"{'tryb':<18} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'błędy':>6}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['case']:<18} {r['error']}")
+            continue
+        print(f"{r['case']:<18} {r['requests_per_s']:>8} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['errors']:>6}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# bench_startup.py
+"""
+Czas startu workera: import modułu aplikacji, create_app i pierwsze żądanie,
+w porównaniu z pracą, którą dawniej fabryka wykonywała w każdym workerze
+(create_all, indeks wyszukiwania, wyszukanie/utworzenie konta admina) -
+dziś robią to raz komendy `flask init-db` i `flask bootstrap-admin`.
+
+Każdy pomiar odbywa się w świeżym procesie (jak nowy worker gunicorna),
+wynik to mediana z --runs uruchomień.
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.bench_startup --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def measure(db_path):
+    timings = {}
+    start = time.perf_counter()
+    import app as app_module
+    timings["import"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app = app_module.create_app(test_config={
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'IMAGE_STORE_PATH': os.path.join(os.path.dirname(db_path), 'images'),
+    })
+    timings["create_app"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assert app.test_client().get('/').status_code == 200
+    timings["first_request"] = time.perf_counter() - start
+
+    # Praca dawnej fabryki na już przygotowanej bazie (admin istnieje)
+    from bootstrap import init_db, bootstrap_admin
+    start = time.perf_counter()
+    with app.app_context():
+        init_db()
+        bootstrap_admin()
+    timings["bootstrap"] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--measure", metavar="DB", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        command = [sys.executable, "-m", "benchmarks.bench_startup", "--measure", db_path]
+        # Pierwsze uruchomienie tworzy bazę i konto admina (haszowanie hasła)
+        first = json.loads(subprocess.check_output(command, cwd=BACKEND_DIR))
+        runs = [json.loads(subprocess.check_output(command, cwd=BACKEND_DIR)) for _ in range(args.runs)]
+
+    median = {key: statistics.median(run[key] for run in runs) * 1000 for key in runs[0]}
+    worker_now = median["import"] + median["create_app"]
+    print(f"{'step':<40} {'ms (median)':>12}")
+    for key in ("import", "create_app", "first_request", "bootstrap"):
+        print(f"{key:<40} {median[key]:>12.1f}")
+    print(f"{'worker start (import + create_app)':<40} {worker_now:>12.1f}")
+    print(f"{'previous worker start (+ bootstrap)':<40} {worker_now + median['bootstrap']:>12.1f}")
+    print(f"{'bootstrap on empty db (first run)':<40} {first['bootstrap'] * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
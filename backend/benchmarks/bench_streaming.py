@@ -0,0 +1,152 @@
+# bench_streaming.py
+"""
+Porównanie szczytowego zużycia pamięci (peak RSS) dla list /products
+i /my_orders: odpowiedź buforowana (jsonify) vs strumieniowa (stream=1).
+
+Każdy pomiar odbywa się w osobnym procesie, bo szczytowe RSS jest
+maksimum z całego życia procesu.
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.bench_streaming --rows 100000
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CASES = [
+    ("/products", "buffered"),
+    ("/products", "stream"),
+    ("/my_orders", "buffered"),
+    ("/my_orders", "stream"),
+]
+
+
+def peak_rss_kb():
+    """
+    Szczytowe RSS procesu w KiB. Na Linuksie czytamy VmHWM, bo ru_maxrss
+    po fork+exec zawiera też pamięć procesu rodzica.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_app(db_path, rows):
+    from app import create_app
+    return create_app(test_config={
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'IMAGE_STORE_PATH': os.path.join(os.path.dirname(db_path), 'images'),
+        # Tryb "przed": cała lista w jednej, buforowanej odpowiedzi
+        'PRODUCTS_PAGE_MAX_LIMIT': rows,
+        'ORDERS_PAGE_MAX_LIMIT': rows,
+    })
+
+
+def populate(db_path, rows):
+    from sqlalchemy import insert
+    from db_models import db, User, Product, Order, Province, TransportType
+
+    from bootstrap import init_db
+
+    app = make_app(db_path, rows)
+    with app.app_context():
+        init_db()
+        user = User(username="bench", email="bench@example.com", password="x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.execute(insert(Product), [
+            {"description": f"Produkt testowy nr {i}", "price": 1.0 + i % 100}
+            for i in range(rows)
+        ])
+        provinces = list(Province)
+        transports = list(TransportType)
+        db.session.execute(insert(Order), [
+            {
+                "user_id": user.id,
+                "product_id": 1 + i % 100,
+                "unit_price": 1.0 + i % 100,
+                "delivery_date": date(2025, 1 + i % 12, 1 + i % 28),
+                "address": f"ul. Testowa {i}",
+                "transport_type": transports[i % len(transports)],
+                "province": provinces[i % len(provinces)],
+            }
+            for i in range(rows)
+        ])
+        db.session.commit()
+        return user.id
+
+
+def measure(db_path, rows, user_id, endpoint, mode):
+    from flask_jwt_extended import create_access_token
+
+    app = make_app(db_path, rows)
+    with app.app_context():
+        token = create_access_token(identity=user_id)
+    client = app.test_client()
+    query = {"stream": 1} if mode == "stream" else {"limit": rows}
+
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+    response = client.get(endpoint, query_string=query,
+                          headers={"Authorization": f"Bearer {token}"})
+    size = sum(len(chunk) for chunk in response.response)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kb()
+    assert response.status_code == 200, response.status_code
+    return {
+        "endpoint": endpoint,
+        "mode": mode,
+        "rows": rows,
+        "bytes": size,
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(peak / 1024, 1),
+        "peak_rss_growth_mb": round((peak - baseline) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--measure", nargs=4, metavar=("DB", "USER_ID", "ENDPOINT", "MODE"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        db_path, user_id, endpoint, mode = args.measure
+        print(json.dumps(measure(db_path, args.rows, int(user_id), endpoint, mode)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        user_id = populate(db_path, args.rows)
+        results = []
+        for endpoint, mode in CASES:
+            output = subprocess.check_output([
+                sys.executable, "-m", "benchmarks.bench_streaming", "--rows", str(args.rows),
+                "--measure", db_path, str(user_id), endpoint, mode
+            ], cwd=BACKEND_DIR)
+            results.append(json.loads(output))
+
+    print(f"{'endpoint':<12} {'mode':<9} {'rows':>8} {'MB sent':>8} {'s':>7} {'peak RSS MB':>12} {'growth MB':>10}")
+    for r in results:
+        print(f"{r['endpoint']:<12} {r['mode']:<9} {r['rows']:>8} {r['bytes'] / 2**20:>8.1f} "
+              f"{r['seconds']:>7.2f} {r['peak_rss_mb']:>12.1f} {r['peak_rss_growth_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
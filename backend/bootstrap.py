@@ -0,0 +1,37 @@
+# bootstrap.py
+
+import os
+
+from db_models import db, User
+from passwords import get_password_hasher
+from search import ensure_search_index
+
+
+def init_db():
+    """
+    Tworzy brakujące tabele i indeks wyszukiwania. Bezpieczne do wielokrotnego
+    uruchomienia (istniejące tabele nie są zmieniane - do tego upgrade-db).
+    """
+    db.create_all()
+    ensure_search_index()
+
+
+def bootstrap_admin(username=None, password=None, email="admin@example.com"):
+    """
+    Tworzy konto admina, jeśli jeszcze nie istnieje. Domyślne dane
+    z ADMIN_USERNAME i ADMIN_PASSWORD (.env).
+    Zwraca True, jeśli konto zostało utworzone.
+    """
+    username = username or os.getenv('ADMIN_USERNAME', 'admin')
+    password = password or os.getenv('ADMIN_PASSWORD', 'secret')
+
+    if User.query.filter_by(username=username).first():
+        return False
+    db.session.add(User(
+        username=username,
+        email=email,
+        password=get_password_hasher().hash(password),
+        is_admin=True
+    ))
+    db.session.commit()
+    return True
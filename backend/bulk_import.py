@@ -0,0 +1,135 @@
+# bulk_import.py
+
+import csv
+import io
+import json
+import math
+import re
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import insert_returning_ids
+from db_models import db, Product
+
+CSV_TYPES = ('text/csv',)
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def iter_records(stream, mimetype):
+    """
+    Czyta rekordy z CSV lub NDJSON strumieniowo, linia po linii.
+    Zwraca krotki (numer_wiersza, rekord, błąd) - dokładnie jedno z
+    rekord/błąd jest ustawione. Wiersze liczone są od 1 (bez nagłówka CSV).
+    """
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if mimetype in CSV_TYPES:
+        reader = csv.DictReader(text_stream)
+        for row_number, record in enumerate(reader, start=1):
+            yield row_number, record, None
+    else:
+        row_number = 0
+        for line in text_stream:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield row_number, None, "Niepoprawny JSON"
+                continue
+            if not isinstance(record, dict):
+                yield row_number, None, "Wiersz musi być obiektem JSON"
+                continue
+            yield row_number, record, None
+
+
+def validate_record(record, store_image, image_exists):
+    """
+    Sprawdza rekord i zwraca słownik kolumn do wstawienia.
+    Obraz można podać inline (image, base64) albo jako referencję do obrazu
+    już obecnego w magazynie (image_hash). Rzuca ValueError z opisem błędu.
+    """
+    description = record.get('description')
+    if not isinstance(description, str) or not description.strip():
+        raise ValueError("Opis jest wymagany")
+    if len(description) > 200:
+        raise ValueError("Opis może mieć najwyżej 200 znaków")
+
+    price = record.get('price')
+    if isinstance(price, str) and price.strip():
+        try:
+            price = float(price)
+        except ValueError:
+            raise ValueError("Cena musi być liczbą")
+    # float('nan') z CSV i NaN/Infinity z NDJSON (json.loads je przepuszcza)
+    if isinstance(price, bool) or not isinstance(price, (int, float)) or not math.isfinite(price):
+        raise ValueError("Cena musi być liczbą")
+    if price < 0:
+        raise ValueError("Cena nie może być ujemna")
+
+    image_hash = record.get('image_hash') or None
+    image_base64 = record.get('image') or None
+    if image_base64:
+        if not isinstance(image_base64, str):
+            raise ValueError("Niepoprawny format obrazu")
+        image_hash = store_image(image_base64)
+    elif image_hash:
+        if not isinstance(image_hash, str) or not _HASH_RE.match(image_hash) or not image_exists(image_hash):
+            raise ValueError("Obraz o podanym image_hash nie istnieje")
+
+    return {"description": description, "price": float(price), "image_hash": image_hash}
+
+
+def import_products(records, store_image, image_exists, commit_batch, batch_size=500):
+    """
+    Importuje produkty z iteratora iter_records. Poprawne wiersze są wstawiane
+    jednym INSERT-em na partię batch_size wierszy, każda partia we własnej
+    transakcji (commit_batch). Błędne wiersze trafiają do raportu.
+    Plik, którego nie da się dalej czytać (zła kodyfikacja, błąd CSV),
+    przerywa import: wcześniejsze poprawne wiersze zostają zapisane,
+    a raport dostaje błąd z numerem wiersza i "aborted": True.
+
+    Zwraca słownik: {"created": int, "product_ids": [...], "errors": [{"row", "msg"}],
+                     "aborted": bool}
+    """
+    report = {"created": 0, "product_ids": [], "errors": [], "aborted": False}
+    batch, batch_rows = [], []
+
+    def flush():
+        if not batch:
+            return
+        try:
+            ids = insert_returning_ids(Product, batch)
+            commit_batch()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            report["errors"].extend(
+                {"row": row, "msg": f"Błąd zapisu partii: {e.__class__.__name__}"}
+                for row in batch_rows
+            )
+        else:
+            report["created"] += len(ids)
+            report["product_ids"].extend(ids)
+        batch.clear()
+        batch_rows.clear()
+
+    row_number = 0
+    try:
+        for row_number, record, error in records:
+            if error is None:
+                try:
+                    batch.append(validate_record(record, store_image, image_exists))
+                    batch_rows.append(row_number)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                report["errors"].append({"row": row_number, "msg": error})
+            if len(batch) >= batch_size:
+                flush()
+    except (UnicodeDecodeError, csv.Error):
+        report["errors"].append({"row": row_number + 1, "msg": "Niepoprawny plik - import przerwany"})
+        report["aborted"] = True
+    flush()
+    return report
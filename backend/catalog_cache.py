@@ -0,0 +1,151 @@
+# catalog_cache.py
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import current_app, request, Response
+
+from db_models import db, CatalogVersion
+
+# Zserializowana odpowiedź katalogu: treść, ETag i dodatkowe nagłówki
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'headers'])
+
+# Nagłówki odpowiedzi, które zapamiętujemy razem z treścią
+_CACHED_HEADERS = ('X-Next-Cursor', 'X-Total-Count', 'X-Next-Offset')
+
+
+def read_catalog_version():
+    version = db.session.query(CatalogVersion.version).filter_by(id=1).scalar()
+    return version or 0
+
+
+def bump_catalog_version():
+    """
+    Podbija wersję katalogu w bieżącej transakcji. Dzięki temu wszystkie
+    procesy (workery gunicorna) widzą nową wersję razem z samą zmianą.
+    """
+    updated = CatalogVersion.query.filter_by(id=1).update(
+        {CatalogVersion.version: CatalogVersion.version + 1}
+    )
+    if not updated:
+        db.session.add(CatalogVersion(id=1, version=1))
+
+
+def commit_catalog_change():
+    """
+    Commit zmiany produktów razem z podbiciem wersji katalogu
+    i natychmiastowym unieważnieniem cache w tym procesie.
+    """
+    bump_catalog_version()
+    db.session.commit()
+    get_catalog_cache().invalidate()
+
+
+class CatalogCache:
+    """
+    Ograniczony cache LRU zserializowanych odpowiedzi katalogu.
+
+    Klucze zawierają wersję katalogu, więc po każdej zmianie produktów stare
+    wpisy przestają być trafiane i same wypadają z LRU. Wersja jest czytana
+    z bazy najwyżej raz na version_ttl sekund - zmiany z innych procesów
+    są widoczne z takim opóźnieniem, a zmiany z tego procesu od razu.
+    """
+
+    def __init__(self, max_entries=512, version_ttl=1.0):
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0.0
+
+    def current_version(self):
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked_at >= self.version_ttl:
+            self._version = read_catalog_version()
+            self._version_checked_at = now
+        return self._version
+
+    def invalidate(self):
+        """Wymusza ponowny odczyt wersji katalogu przy następnym żądaniu."""
+        self._version = None
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, response):
+        body = response.get_data()
+        entry = CachedResponse(
+            body=body,
+            etag=hashlib.sha1(body).hexdigest(),
+            headers={name: response.headers[name] for name in _CACHED_HEADERS
+                     if name in response.headers},
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def make_cached_response(entry):
+    response = Response(entry.body, mimetype='application/json', headers=entry.headers)
+    response.set_etag(entry.etag)
+    # Klient może trzymać odpowiedź, ale musi ją rewalidować (If-None-Match -> 304)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def catalog_cached(view):
+    """
+    Dekorator endpointów odczytu katalogu: odpowiedzi 200 są zapamiętywane
+    w CatalogCache pod kluczem (endpoint, argumenty, query string, wersja katalogu)
+    i serwowane z pamięci, z obsługą ETag / If-None-Match.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = get_catalog_cache()
+        key = (
+            request.endpoint,
+            tuple(sorted(kwargs.items())),
+            tuple(sorted(request.args.items(multi=True))),
+            cache.current_version(),
+        )
+        entry = cache.get(key)
+        if entry is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            # Odpowiedzi strumieniowych nie buforujemy - to zniweczyłoby ich sens
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            entry = cache.put(key, response)
+        return make_cached_response(entry)
+    return wrapper
+
+
+def init_catalog_cache(app):
+    cache = CatalogCache(
+        max_entries=app.config.get('CATALOG_CACHE_SIZE', 512),
+        version_ttl=app.config.get('CATALOG_VERSION_TTL', 1.0),
+    )
+    app.extensions['catalog_cache'] = cache
+    return cache
+
+
+def get_catalog_cache():
+    return current_app.extensions['catalog_cache']
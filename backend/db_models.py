@@ -1,6 +1,7 @@
 # db_models.py
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.ext.hybrid import hybrid_property
 from enum import Enum
 
 db = SQLAlchemy()
@@ -20,6 +21,11 @@ class User(db.Model):
     # Nowa kolumna – domyślnie False
     is_admin = db.Column(db.Boolean, default=False)
 
+    # Zamówienia użytkownika jako zapytanie (lazy='dynamic'), żeby nie ładować
+    # ich wszystkich przy dostępie; passive_deletes - usunięcie użytkownika
+    # nie modyfikuje jego zamówień
+    orders = db.relationship('Order', back_populates='user', lazy='dynamic', passive_deletes='all')
+
     def __init__(self, username, email, password, is_admin=False):
         self.username = username
         self.email = email
@@ -31,7 +37,20 @@ class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(200), nullable=False)
     price = db.Column(db.Float, nullable=False)
-    image = db.Column(db.LargeBinary, nullable=True)
+    # Skrót SHA-256 obrazu w magazynie obrazów (image_store.py);
+    # same bajty obrazu nie są trzymane w bazie
+    image_hash = db.Column(db.String(64), nullable=True, index=True)
+
+    orders = db.relationship('Order', back_populates='product', lazy='dynamic', passive_deletes='all')
+
+class CatalogVersion(db.Model):
+    """
+    Jednowierszowa tabela z wersją katalogu produktów.
+    Podbijana przy każdej zmianie produktów (catalog_cache.py).
+    """
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
 
 class Province(Enum):
     DOLNOSLASKIE = "dolnośląskie"
@@ -53,19 +72,120 @@ class Province(Enum):
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Raporty i eksport: zakres dat (+ województwo bez sięgania do tabeli)
+        db.Index('ix_orders_delivery_date_province', 'delivery_date', 'province'),
+        # /my_orders: zamówienia użytkownika stronicowane po id
+        db.Index('ix_orders_user_id_id', 'user_id', 'id'),
+        db.Index('ix_orders_product_id', 'product_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
-    delivery_date = db.Column(db.String(50), nullable=False)  # Możesz użyć db.Date lub db.DateTime
+    delivery_date = db.Column(db.Date, nullable=False)
     address = db.Column(db.String(200), nullable=False)
     transport_type = db.Column(db.Enum(TransportType), nullable=False)
     province = db.Column(db.Enum(Province), nullable=False)  # Nowe pole
+    # Wielkość ładunku w jednostkach ładowności pojazdów (palety)
+    quantity = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Cena produktu z chwili złożenia zamówienia - wartość zamówienia
+    # w raportach i eksporcie nie zmienia się po zmianie ceny produktu
+    unit_price = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
 
-    def __init__(self, user_id, product_id, delivery_date, address, transport_type, province):
+    user = db.relationship('User', back_populates='orders')
+    product = db.relationship('Product', back_populates='orders')
+
+    def __init__(self, user_id, product_id, delivery_date, address, transport_type, province, quantity=1,
+                 unit_price=0.0):
         self.user_id = user_id
         self.product_id = product_id
         self.delivery_date = delivery_date
         self.address = address
         self.transport_type = transport_type
-        self.province = province
\ No newline at end of file
+        self.province = province
+        self.quantity = quantity
+        self.unit_price = unit_price
+
+    @hybrid_property
+    def value(self):
+        """Wartość zamówienia: cena z chwili złożenia razy ilość (także jako wyrażenie SQL)."""
+        return self.unit_price * self.quantity
+
+class OrderDailyRollup(db.Model):
+    """
+    Dzienne agregaty zamówień (dzień x województwo x transport) używane
+    przez raporty admina. Aktualizowane w tej samej transakcji co tworzone
+    zamówienia (rollups.py), więc raport nie musi skanować tabeli orders.
+    """
+    __tablename__ = 'order_daily_rollups'
+    day = db.Column(db.Date, primary_key=True)
+    province = db.Column(db.Enum(Province), primary_key=True)
+    transport_type = db.Column(db.Enum(TransportType), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    order_value = db.Column(db.Float, nullable=False, default=0.0)
+
+class ReportJob(db.Model):
+    """
+    Zadanie raportu wykonywane w tle (report_jobs.py). Stan trzymany
+    w bazie, więc status sprawdzi każdy worker, nie tylko ten, który
+    przyjął zlecenie. Zakończone zadania dla zakresów z przeszłości
+    (cacheable) służą jako cache wyników.
+    """
+    __tablename__ = 'report_jobs'
+    id = db.Column(db.String(32), primary_key=True)
+    cache_key = db.Column(db.String(255), nullable=False, index=True)
+    params = db.Column(db.Text, nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.String(200), nullable=True)
+    cacheable = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class Vehicle(db.Model):
+    """
+    Pojazd floty. transport_type określa, jakie zamówienia wozi (TRUCK albo
+    COURIER), capacity - ładowność w tych samych jednostkach co
+    Order.quantity. Pojazdy startują z bazy w województwie depot_province.
+    Nieaktywne pojazdy (active=False) nie są planowane.
+    """
+    __tablename__ = 'vehicles'
+    id = db.Column(db.Integer, primary_key=True)
+    registration = db.Column(db.String(20), unique=True, nullable=False)
+    transport_type = db.Column(db.Enum(TransportType), nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    depot_province = db.Column(db.Enum(Province), nullable=False)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+
+    unavailability = db.relationship('VehicleUnavailability', back_populates='vehicle',
+                                     lazy='dynamic', cascade='all, delete-orphan')
+
+class VehicleUnavailability(db.Model):
+    """Kalendarz pojazdu: okres (włącznie z obiema datami), w którym pojazd nie jeździ."""
+    __tablename__ = 'vehicle_unavailability'
+    __table_args__ = (
+        db.Index('ix_vehicle_unavailability_vehicle_id_dates', 'vehicle_id', 'start_date', 'end_date'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    reason = db.Column(db.String(200), nullable=True)
+
+    vehicle = db.relationship('Vehicle', back_populates='unavailability')
+
+class TransportAssignment(db.Model):
+    """
+    Przydział zamówienia do pojazdu w planie transportów na dzień dostawy
+    (fleet.py). Plan dnia jest za każdym razem zapisywany od nowa.
+    """
+    __tablename__ = 'transport_assignments'
+    __table_args__ = (
+        db.Index('ix_transport_assignments_date_vehicle', 'delivery_date', 'vehicle_id'),
+    )
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    delivery_date = db.Column(db.Date, nullable=False)
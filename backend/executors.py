@@ -0,0 +1,42 @@
+# executors.py
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _gevent_patched():
+    # gunicorn.conf.py w trybie gevent patchuje moduły przed importem aplikacji
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("threading")
+
+
+def native_thread_pool(max_workers, thread_name_prefix):
+    """
+    Pula wątków do pracy obciążającej CPU (haszowanie haseł, miniatury).
+    Po monkey.patch_all() zwykły ThreadPoolExecutor uruchamia zadania jako
+    greenlety w jedynym wątku workera, więc każde z nich wstrzymuje wszystkie
+    żądania - wtedy używamy puli gevent, która zawsze korzysta z prawdziwych
+    wątków systemowych.
+
+    Zadania w takiej puli nie mogą czekać na blokady spatchowane przez gevent
+    (threading, logging, pula połączeń SQLAlchemy) - wątek zawiesiłby się
+    we własnej pętli zdarzeń. Wyniki i błędy obsługujemy w add_done_callback.
+    """
+    if _gevent_patched():
+        from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+        return GeventThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+
+def add_done_callback(future, callback):
+    """
+    future.add_done_callback, które pod gevent uruchamia callback w osobnym
+    greenlecie. Pula gevent wywołuje callbacki wprost w pętli zdarzeń,
+    gdzie czekanie na blokadę (np. zajętą przez schedule) kończy się
+    BlockingSwitchOutError.
+    """
+    if _gevent_patched():
+        import gevent
+        future.add_done_callback(lambda done: gevent.spawn(callback, done))
+    else:
+        future.add_done_callback(callback)
@@ -0,0 +1,237 @@
+# fleet.py
+
+from bisect import bisect_left, insort
+from collections import defaultdict, deque
+
+from sqlalchemy import delete, exists, insert, select
+
+from db_models import db, Order, TransportAssignment, TransportType, Vehicle, VehicleUnavailability
+
+# Zamówienia z odbiorem własnym nie potrzebują pojazdu
+PLANNED_TRANSPORTS = (TransportType.TRUCK, TransportType.COURIER)
+
+
+def load_orders(day):
+    """Zamówienia do rozwiezienia w dniu day: [(order_id, quantity, province, transport_type)]."""
+    return db.session.execute(
+        select(Order.id, Order.quantity, Order.province, Order.transport_type).where(
+            Order.delivery_date == day,
+            Order.transport_type.in_(PLANNED_TRANSPORTS)
+        )
+    ).all()
+
+
+def available_vehicles(day):
+    """
+    Aktywne pojazdy bez wpisu w kalendarzu niedostępności obejmującego day:
+    [(vehicle_id, capacity, depot_province, transport_type)].
+    """
+    unavailable = exists().where(
+        VehicleUnavailability.vehicle_id == Vehicle.id,
+        VehicleUnavailability.start_date <= day,
+        VehicleUnavailability.end_date >= day
+    )
+    return db.session.execute(
+        select(Vehicle.id, Vehicle.capacity, Vehicle.depot_province, Vehicle.transport_type).where(
+            Vehicle.active.is_(True), ~unavailable
+        )
+    ).all()
+
+
+def _best_fit(items, free):
+    """
+    Pakuje items [(quantity, order_id)] posortowane malejąco do pojazdów.
+    Zamówienie trafia do już używanego pojazdu z najmniejszym wolnym
+    miejscem, w którym się zmieści (best fit); gdy takiego nie ma, ładowany
+    jest kolejny pojazd z free - deque [(capacity, vehicle_id)] posortowanej
+    malejąco, zużywanej od początku.
+
+    Zwraca (trips, leftover): trips - {vehicle_id: [capacity, load, [order_id, ...]]},
+    leftover - zamówienia, dla których zabrakło pojazdu.
+    """
+    trips = {}
+    # Używane pojazdy z wolnym miejscem: wolne miejsce -> stos vehicle_id,
+    # plus posortowana lista kluczy do wyszukiwania bisect
+    by_room = {}
+    rooms = []
+    leftover = []
+    for quantity, order_id in items:
+        i = bisect_left(rooms, quantity)
+        if i < len(rooms):
+            room = rooms[i]
+            stack = by_room[room]
+            vehicle_id = stack.pop()
+            if not stack:
+                del by_room[room]
+                rooms.pop(i)
+        elif free and free[0][0] >= quantity:
+            room, vehicle_id = free.popleft()
+            trips[vehicle_id] = [room, 0, []]
+        else:
+            leftover.append((quantity, order_id))
+            continue
+
+        trip = trips[vehicle_id]
+        trip[1] += quantity
+        trip[2].append(order_id)
+        room -= quantity
+        if room:
+            stack = by_room.get(room)
+            if stack is None:
+                stack = by_room[room] = []
+                insort(rooms, room)
+            stack.append(vehicle_id)
+    return trips, leftover
+
+
+def _downsize(trips, free):
+    """
+    Zamienia pojazdy niepełnych kursów na najmniejsze wolne pojazdy, które
+    pomieszczą ładunek (duża ciężarówka nie jedzie z jedną paletą, gdy
+    w bazie stoi mniejsza). Zwalniane pojazdy wracają do free.
+    """
+    spare = sorted(free)
+    result = {}
+    for vehicle_id, (capacity, load, order_ids) in sorted(trips.items(), key=lambda t: t[1][1]):
+        i = bisect_left(spare, (load,))
+        if i < len(spare) and spare[i][0] < capacity:
+            smaller_capacity, smaller_id = spare.pop(i)
+            insort(spare, (capacity, vehicle_id))
+            vehicle_id, capacity = smaller_id, smaller_capacity
+        result[vehicle_id] = [capacity, load, order_ids]
+    free.clear()
+    free.extend(sorted(spare, reverse=True))
+    return result
+
+
+def pack_orders(orders, vehicles):
+    """
+    Heurystyka bin packing (best fit decreasing) rozdzielająca zamówienia dnia
+    na pojazdy. Kurs pojazdu obejmuje zamówienia jednego województwa i jednego
+    rodzaju transportu. Najpierw używane są pojazdy z bazy w województwie
+    dostawy, a zamówienia, dla których ich zabrakło, rozwożą wolne pojazdy
+    z innych baz.
+
+    orders - [(order_id, quantity, province, transport_type)],
+    vehicles - [(vehicle_id, capacity, depot_province, transport_type)].
+    Zwraca (trips, unassigned): trips - lista słowników {"vehicle_id",
+    "province", "transport_type", "capacity", "load", "order_ids"},
+    unassigned - id zamówień bez pojazdu (zbyt duże albo brak wolnych pojazdów).
+    Wynik zależy tylko od danych wejściowych.
+    """
+    groups = defaultdict(list)
+    for order_id, quantity, province, transport_type in orders:
+        groups[(transport_type, province)].append((quantity, order_id))
+    home = defaultdict(list)
+    for vehicle_id, capacity, depot_province, transport_type in vehicles:
+        home[(transport_type, depot_province)].append((capacity, vehicle_id))
+
+    # Kolejność deterministyczna: największe zamówienia i pojazdy najpierw,
+    # remisy rozstrzyga id
+    def descending(pairs):
+        return sorted(pairs, key=lambda p: (-p[0], p[1]))
+
+    trips = []
+    overflow = defaultdict(list)
+    pools = defaultdict(list)
+    keys = sorted(set(groups) | set(home), key=lambda k: (k[0].name, k[1].name))
+
+    def add_trips(group_trips, key):
+        for vehicle_id, (capacity, load, order_ids) in group_trips.items():
+            trips.append({
+                "vehicle_id": vehicle_id, "province": key[1], "transport_type": key[0],
+                "capacity": capacity, "load": load, "order_ids": order_ids,
+            })
+
+    for key in keys:
+        free = deque(descending(home.get(key, ())))
+        group_trips, leftover = _best_fit(descending(groups.get(key, ())), free)
+        add_trips(_downsize(group_trips, free), key)
+        if leftover:
+            overflow[key] = leftover
+        # Niewykorzystane pojazdy mogą obsłużyć inne województwa
+        pools[key[0]].extend(free)
+
+    unassigned = []
+    for transport_type in sorted(pools.keys() | {k[0] for k in overflow}, key=lambda t: t.name):
+        free = deque(descending(pools[transport_type]))
+        for key in sorted((k for k in overflow if k[0] == transport_type), key=lambda k: k[1].name):
+            group_trips, leftover = _best_fit(overflow[key], free)
+            add_trips(_downsize(group_trips, free), key)
+            unassigned.extend(order_id for _, order_id in leftover)
+
+    return trips, sorted(unassigned)
+
+
+def save_assignments(day, trips):
+    """Zastępuje zapisany plan dnia day kursami trips (bez commitu)."""
+    db.session.execute(delete(TransportAssignment).where(TransportAssignment.delivery_date == day))
+    rows = [
+        {"order_id": order_id, "vehicle_id": trip["vehicle_id"], "delivery_date": day}
+        for trip in trips for order_id in trip["order_ids"]
+    ]
+    if rows:
+        db.session.execute(insert(TransportAssignment), rows)
+
+
+def plan_transports(day):
+    """
+    Planuje transporty na dzień day: przydziela zamówienia TRUCK i COURIER
+    do dostępnych tego dnia pojazdów (pack_orders) i zapisuje plan,
+    zastępując poprzedni. Zamówienia złożone po planowaniu czekają na
+    ponowne uruchomienie.
+    Zwraca podsumowanie planu.
+    """
+    orders = load_orders(day)
+    trips, unassigned = pack_orders(orders, available_vehicles(day))
+    save_assignments(day, trips)
+    db.session.commit()
+    return {
+        "date": day.isoformat(),
+        "orders": len(orders),
+        "assigned": len(orders) - len(unassigned),
+        "vehicles_used": len(trips),
+        "unassigned_order_ids": unassigned,
+    }
+
+
+def transport_plan(day):
+    """
+    Zapisany plan dnia day: kursy (pojazd, województwo, ładunek i zamówienia)
+    posortowane po id pojazdu.
+    """
+    rows = db.session.execute(
+        select(Vehicle.id, Vehicle.registration, Vehicle.transport_type, Vehicle.capacity,
+               Vehicle.depot_province, Order.province, Order.id, Order.quantity)
+        .join(TransportAssignment, TransportAssignment.vehicle_id == Vehicle.id)
+        .join(Order, Order.id == TransportAssignment.order_id)
+        .where(TransportAssignment.delivery_date == day)
+        .order_by(Vehicle.id, Order.id)
+    ).all()
+    trips = []
+    for row in rows:
+        if not trips or trips[-1]["vehicle_id"] != row[0]:
+            trips.append({
+                "vehicle_id": row[0],
+                "registration": row[1],
+                "transport_type": row[2].value,
+                "capacity": row[3],
+                "depot_province": row[4].value,
+                "province": row[5].value,
+                "load": 0,
+                "order_ids": [],
+            })
+        trips[-1]["load"] += row[7]
+        trips[-1]["order_ids"].append(row[6])
+    return trips
+
+
+def vehicle_to_dict(vehicle):
+    return {
+        "vehicle_id": vehicle.id,
+        "registration": vehicle.registration,
+        "transport_type": vehicle.transport_type.value,
+        "capacity": vehicle.capacity,
+        "depot_province": vehicle.depot_province.value,
+        "active": vehicle.active,
+    }
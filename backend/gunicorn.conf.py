@@ -0,0 +1,128 @@
+# gunicorn.conf.py
+"""
+Produkcyjna konfiguracja gunicorna (wczytywana automatycznie z katalogu
+roboczego albo przez `gunicorn -c gunicorn.conf.py main:app`).
+
+Tryb pracy wybiera GUNICORN_MODE:
+    gthread (domyślny) - procesy z pulą wątków; dobry dla mieszanego ruchu,
+                         wątki czekające na bazę/dysk nie blokują procesu
+    gevent             - procesy z greenletami; dla endpointów I/O-bound
+                         (obrazy, eksporty i listy strumieniowe, długie
+                         połączenia keep-alive); wymaga pakietu gevent.
+                         Haszowanie haseł i miniatury działają wtedy na
+                         wątkach systemowych z puli gevent
+                         (executors.native_thread_pool), ale raporty w tle
+                         (/admin/report/jobs) liczą się w pętli zdarzeń
+                         i wstrzymują inne żądania - przy dużych raportach
+                         wybierz gthread
+    sync               - jeden wątek na proces (zachowanie sprzed zmiany)
+
+Zmienne środowiskowe (wszystkie opcjonalne):
+    PORT                         port (5000)
+    WEB_CONCURRENCY              liczba procesów (domyślnie z liczby CPU, patrz _default_workers)
+    GUNICORN_THREADS             wątki na proces w trybie gthread (4)
+    GUNICORN_WORKER_CONNECTIONS  równoległe połączenia na proces w trybie gevent (1000)
+    GUNICORN_KEEPALIVE           sekundy utrzymania połączenia keep-alive (5)
+    GUNICORN_MAX_REQUESTS        restart procesu po tylu żądaniach (1000, 0 = wyłączone)
+    GUNICORN_MAX_REQUESTS_JITTER losowy rozrzut progu restartu (100)
+    GUNICORN_TIMEOUT             limit czasu obsługi żądania w sekundach (30)
+    GUNICORN_PRELOAD             "0" wyłącza --preload
+    PROMETHEUS_MULTIPROC_DIR     katalog plików metryk workerów (domyślnie tymczasowy
+                                 w /dev/shm, usuwany przy zamknięciu)
+"""
+
+import glob
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+mode = os.getenv("GUNICORN_MODE", "gthread")
+if mode not in ("gthread", "gevent", "sync"):
+    raise RuntimeError(f"Nieznany GUNICORN_MODE: {mode!r} (gthread, gevent albo sync)")
+
+if mode == "gevent":
+    # Patchowanie przed importem aplikacji (także przy --preload),
+    # żeby sockety, wątki i time.sleep w całym kodzie były kooperacyjne
+    from gevent import monkey
+    monkey.patch_all()
+
+cpu_count = multiprocessing.cpu_count()
+
+
+def _default_workers():
+    # sync: klasyczne 2 x CPU + 1; gthread/gevent obsługują współbieżność
+    # wewnątrz procesu, więc wystarczy proces na rdzeń (+1 na czas restartów)
+    if mode == "sync":
+        return 2 * cpu_count + 1
+    return cpu_count + 1
+
+
+bind = f"0.0.0.0:{_env_int('PORT', 5000)}"
+workers = _env_int("WEB_CONCURRENCY", _default_workers())
+worker_class = mode
+threads = _env_int("GUNICORN_THREADS", 4) if mode == "gthread" else 1
+worker_connections = _env_int("GUNICORN_WORKER_CONNECTIONS", 1000)
+
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+timeout = _env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = timeout
+# Okresowy restart workerów ogranicza skutki wycieków pamięci; rozrzut
+# sprawia, że procesy nie restartują się wszystkie naraz
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+# Aplikacja nie wykonuje pracy na bazie przy tworzeniu (create_app),
+# więc można ją zaimportować raz w procesie głównym
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+# Plik heartbeat workerów w pamięci - w kontenerach /tmp bywa na wolnym overlayfs
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG") or None
+errorlog = "-"
+
+# Metryki /metrics (metrics.py) zbierane ze wszystkich workerów: każdy proces
+# zapisuje je do plików w tym katalogu. Katalog musi istnieć i być pusty
+# przed importem aplikacji (--preload importuje ją jeszcze przed on_starting),
+# dlatego jest przygotowywany tutaj.
+metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+own_metrics_dir = not metrics_dir
+if own_metrics_dir:
+    # Własny katalog tymczasowy - usuwany w on_exit
+    metrics_dir = tempfile.mkdtemp(prefix="agrox-metrics-",
+                                   dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+else:
+    # Katalog podany przez operatora (np. /tmp) może zawierać inne pliki -
+    # usuwamy tylko pliki metryk poprzedniego uruchomienia, które zawyżałyby liczniki
+    os.makedirs(metrics_dir, exist_ok=True)
+    for stale_file in glob.glob(os.path.join(metrics_dir, "*.db")):
+        os.remove(stale_file)
+
+
+def on_exit(server):
+    if own_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    if mode == "gevent":
+        try:
+            # Sterownik PostgreSQL blokuje pętlę gevent bez tego patcha
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            return
+        patch_psycopg()
@@ -0,0 +1,191 @@
+# image_store.py
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from flask import current_app
+
+
+# Sygnatury (magic bytes) obsługiwanych formatów obrazów
+_IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def sniff_mimetype(header):
+    """
+    Rozpoznaje typ obrazu na podstawie pierwszych bajtów pliku.
+    Dla nieznanych formatów zwraca 'application/octet-stream'.
+    """
+    for signature, mimetype in _IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return mimetype
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+class ImageStore:
+    """
+    Magazyn obrazów adresowany treścią (content-addressed).
+    Każdy obraz zapisywany jest na dysku pod nazwą równą skrótowi SHA-256
+    jego zawartości, np. <root>/ab/abcdef....
+    Identyczne obrazy są więc przechowywane tylko raz, a skrót może
+    służyć bezpośrednio jako ETag.
+
+    Czas modyfikacji oryginału oznacza ostatnie użycie: put i touch go
+    odświeżają, a remove_unused nie usuwa obrazu użytego po wskazanej chwili.
+    Dzięki temu usuwanie nieużywanego obrazu nie gubi pliku, który równoległe
+    żądanie właśnie dołącza do produktu.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, digest):
+        """Ścieżka do pliku obrazu o podanym skrócie."""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def variant_path(self, digest, variant):
+        """Ścieżka do wariantu obrazu (np. miniatury), zapisanego obok oryginału."""
+        return f"{self.path(digest)}.{variant}"
+
+    def exists(self, digest, variant=None):
+        path = self.variant_path(digest, variant) if variant else self.path(digest)
+        return os.path.isfile(path)
+
+    def put(self, data):
+        """
+        Zapisuje obraz i zwraca jego skrót (hex SHA-256).
+        Zapis jest atomowy (plik tymczasowy + os.link), więc
+        równoległe żądania nigdy nie zobaczą niekompletnego pliku.
+        """
+        return self.add(data)[0]
+
+    def add(self, data):
+        """
+        Jak put, ale zwraca (skrót, created_ns): created_ns to czas modyfikacji
+        pliku zapisanego właśnie przez to wywołanie albo None, gdy obraz już
+        był w magazynie (wtedy tylko odświeżamy jego czas użycia).
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        while not self.touch(digest):
+            if self._write(path, data, replace=False):
+                return digest, os.stat(path).st_mtime_ns
+        return digest, None
+
+    def touch(self, digest):
+        """
+        Oznacza obraz jako właśnie użyty. Zwraca False, jeśli go nie ma.
+        Nowy czas jest zawsze późniejszy od poprzedniego - zegar plików
+        bywa mniej dokładny niż odstęp między dwoma żądaniami.
+        """
+        path = self.path(digest)
+        try:
+            now = max(time.time_ns(), os.stat(path).st_mtime_ns + 1)
+            os.utime(path, ns=(now, now))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put_variant(self, digest, variant, data):
+        self._write(self.variant_path(digest, variant), data)
+
+    def _write(self, target, data, replace=True):
+        """
+        Zapisuje plik atomowo. Z replace=False istniejący plik nie jest
+        nadpisywany - zwraca wtedy False.
+        """
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            if replace:
+                os.replace(tmp_path, target)
+                return True
+            try:
+                os.link(tmp_path, target)
+            except FileExistsError:
+                return False
+            return True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def delete(self, digest, variants=()):
+        """Usuwa obraz i jego warianty z magazynu (brak pliku nie jest błędem)."""
+        paths = [self.path(digest)] + [self.variant_path(digest, v) for v in variants]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def remove_unused(self, digest, unused_since_ns, variants=()):
+        """
+        Usuwa obraz, jeśli nie był użyty (put/touch) po chwili unused_since_ns.
+        Plik jest najpierw przenoszony pod nazwę tymczasową: równoległy put
+        albo zdążył go odświeżyć (wtedy plik wraca na miejsce), albo nie
+        znajdzie pliku i zapisze obraz od nowa.
+        Zwraca True, jeśli obraz został usunięty.
+        """
+        path = self.path(digest)
+        if not os.path.isfile(path):
+            return False
+        fd, trash_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.del-')
+        os.close(fd)
+        try:
+            os.replace(path, trash_path)
+        except FileNotFoundError:
+            os.remove(trash_path)
+            return False
+        if os.stat(trash_path).st_mtime_ns > unused_since_ns:
+            # Ta sama treść, więc przywrócenie nie psuje ewentualnego nowego zapisu
+            os.replace(trash_path, path)
+            return False
+        os.remove(trash_path)
+        # Oryginał mógł już zostać zapisany od nowa - usuwamy tylko warianty
+        for variant in variants:
+            try:
+                os.remove(self.variant_path(digest, variant))
+            except FileNotFoundError:
+                pass
+        return True
+
+    def digests(self):
+        """Skróty wszystkich oryginałów w magazynie (bez wariantów i plików tymczasowych)."""
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if _DIGEST_RE.match(name):
+                    yield name
+
+    def mimetype(self, path):
+        with open(path, 'rb') as image_file:
+            return sniff_mimetype(image_file.read(16))
+
+
+def init_image_store(app):
+    """
+    Tworzy magazyn obrazów dla aplikacji. Katalog można ustawić
+    przez IMAGE_STORE_PATH (domyślnie <instance>/images).
+    """
+    root = app.config.get('IMAGE_STORE_PATH') or os.path.join(app.instance_path, 'images')
+    store = ImageStore(root)
+    app.extensions['image_store'] = store
+    return store
+
+
+def get_image_store():
+    return current_app.extensions['image_store']
@@ -4,4 +4,10 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
+    # Uruchomienie deweloperskie: przygotowanie bazy jak `flask init-db`
+    # i `flask bootstrap-admin` (na produkcji te komendy uruchamia wdrożenie)
+    from bootstrap import init_db, bootstrap_admin
+    with app.app_context():
+        init_db()
+        bootstrap_admin()
     app.run(debug=True,host='0.0.0.0')
@@ -0,0 +1,130 @@
+# metrics.py
+
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+from db_models import db
+from query_log import add_query_observer, route_label
+
+# Metryki są globalne dla procesu (rejestr prometheus_client). Przy kilku
+# workerach gunicorna każdy proces zapisuje wartości do plików w katalogu
+# PROMETHEUS_MULTIPROC_DIR, a /metrics sumuje je ze wszystkich procesów
+# (gunicorn.conf.py ustawia katalog i sprząta po zakończonych workerach).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+REQUESTS = Counter(
+    "http_requests_total", "Liczba obsłużonych żądań HTTP", ["method", "route", "status"])
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Czas obsługi żądania (do wysłania nagłówków odpowiedzi)",
+    ["method", "route"], buckets=LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Rozmiar treści odpowiedzi (bez odpowiedzi strumieniowych)",
+    ["method", "route"], buckets=SIZE_BUCKETS)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Żądania w trakcie obsługi",
+    ["method", "route"], multiprocess_mode="livesum")
+
+DB_QUERIES = Counter(
+    "db_queries_total", "Liczba zapytań SQL", ["route"])
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Czas wykonania zapytania SQL",
+    ["route"], buckets=LATENCY_BUCKETS)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_connections_in_use", "Połączenia z bazą pobrane z puli",
+    multiprocess_mode="livesum")
+DB_POOL_OPEN = Gauge(
+    "db_pool_connections_open", "Otwarte połączenia z bazą (w puli i w użyciu)",
+    multiprocess_mode="livesum")
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    # Etykieta trasy to wzorzec reguły URL - liczba serii nie rośnie z liczbą produktów
+    g.metrics_labels = (request.method, route_label())
+    IN_PROGRESS.labels(*g.metrics_labels).inc()
+
+
+def _after_request(response):
+    labels = getattr(g, "metrics_labels", None)
+    if labels is None:
+        return response
+    REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - g.metrics_start)
+    REQUESTS.labels(*labels, str(response.status_code)).inc()
+    if not response.is_streamed and response.content_length is not None:
+        RESPONSE_SIZE.labels(*labels).observe(response.content_length)
+    return response
+
+
+def _teardown_request(exc):
+    labels = g.pop("metrics_labels", None)
+    if labels is not None:
+        IN_PROGRESS.labels(*labels).dec()
+
+
+def _observe_query(statement, elapsed):
+    # Czas zapytania mierzy query_log.py (jeden pomiar dla logu i metryk)
+    route = route_label()
+    DB_QUERIES.labels(route).inc()
+    DB_QUERY_LATENCY.labels(route).observe(elapsed)
+
+
+def _pool_connect(*args):
+    DB_POOL_OPEN.inc()
+
+
+def _pool_close(*args):
+    DB_POOL_OPEN.dec()
+
+
+def _pool_checkout(*args):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+def _pool_checkin(*args):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+def _register_engine_listeners(engine):
+    add_query_observer(engine, _observe_query)
+    if event.contains(engine.pool, "connect", _pool_connect):
+        return
+    event.listen(engine.pool, "connect", _pool_connect)
+    event.listen(engine.pool, "close", _pool_close)
+    event.listen(engine.pool, "checkout", _pool_checkout)
+    event.listen(engine.pool, "checkin", _pool_checkin)
+
+
+def render_metrics():
+    """Treść /metrics - przy PROMETHEUS_MULTIPROC_DIR zsumowana ze wszystkich procesów."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """
+    Rejestruje pomiary żądań (hooki Flaska), zapytań SQL (czas mierzony
+    przez query_log.py) i puli połączeń oraz endpoint /metrics w formacie
+    tekstowym Prometheusa.
+    METRICS_ENABLED=False wyłącza całość.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    with app.app_context():
+        _register_engine_listeners(db.engine)
+    app.add_url_rule('/metrics', 'metrics', render_metrics)
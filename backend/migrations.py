@@ -0,0 +1,179 @@
+# migrations.py
+
+import sqlite3
+from datetime import datetime
+
+from sqlalchemy import inspect, text, Date
+from sqlalchemy.schema import CreateTable
+
+from db_models import db, Order, OrderDailyRollup, Product
+from image_store import get_image_store
+from rollups import rebuild_rollups
+
+
+def upgrade_products_schema(batch_size=100, log=print):
+    """
+    Migracja obrazów produktów z kolumny products.image (BLOB) do magazynu
+    obrazów (image_store.py): dodaje kolumnę image_hash, zapisuje każdy obraz
+    w magazynie i czyści BLOB, a na końcu usuwa kolumnę image. Obrazy
+    przenoszone są partiami po batch_size, każda partia w osobnej transakcji,
+    więc przerwaną migrację wystarczy uruchomić ponownie.
+    """
+    inspector = inspect(db.session.connection())
+    if not inspector.has_table('products'):
+        return
+    columns = {column['name'] for column in inspector.get_columns('products')}
+    if 'image_hash' not in columns:
+        db.session.execute(text("ALTER TABLE products ADD COLUMN image_hash VARCHAR(64)"))
+        db.session.commit()
+        log("Dodano kolumnę products.image_hash")
+    for index in Product.__table__.indexes:
+        index.create(db.session.connection(), checkfirst=True)
+    db.session.commit()
+    if 'image' not in columns:
+        return
+
+    store = get_image_store()
+    select_batch = text(
+        "SELECT id, image FROM products WHERE image IS NOT NULL ORDER BY id LIMIT :limit"
+    )
+    moved = 0
+    while True:
+        rows = db.session.execute(select_batch, {"limit": batch_size}).all()
+        if not rows:
+            break
+        db.session.execute(
+            text("UPDATE products SET image_hash = :image_hash, image = NULL WHERE id = :id"),
+            [{"id": product_id, "image_hash": store.put(bytes(image))} for product_id, image in rows]
+        )
+        db.session.commit()
+        moved += len(rows)
+        log(f"Przeniesiono obrazy produktów: {moved}")
+
+    # DROP COLUMN obsługuje SQLite od wersji 3.35 - w starszej zostaje pusta kolumna
+    if db.session.get_bind().dialect.name != 'sqlite' or sqlite3.sqlite_version_info >= (3, 35):
+        db.session.execute(text("ALTER TABLE products DROP COLUMN image"))
+        db.session.commit()
+        log("Usunięto kolumnę products.image")
+
+
+def _parse_legacy_date(value):
+    """
+    Daty z kolumny tekstowej: 'YYYY-MM-DD' (także bez zer wiodących,
+    np. '2025-5-1', które przepuszczała stara walidacja raportu).
+    """
+    return datetime.strptime(value.strip(), '%Y-%m-%d').date()
+
+
+def _delivery_date_is_date(inspector):
+    for column in inspector.get_columns('orders'):
+        if column['name'] == 'delivery_date':
+            return isinstance(column['type'], Date)
+    return False
+
+
+def _rewrite_orders_sqlite(batch_size, log):
+    """
+    SQLite nie pozwala zmienić typu kolumny, więc tabela orders jest
+    przebudowywana: nowa powstaje jako orders_new ze schematu modelu,
+    wiersze kopiowane są partiami po batch_size z normalizacją dat, po czym
+    stara tabela jest usuwana, a nowa dostaje nazwę orders. Zmienia się nazwa
+    nowej tabeli, nie starej - inaczej SQLite przepisałby klucze obce innych
+    tabel (np. transport_assignments) na orders_old. Przed migracją warto
+    zrobić kopię pliku bazy.
+    """
+    connection = db.session.connection()
+    create_orders = str(CreateTable(Order.__table__).compile(dialect=connection.dialect))
+    connection.execute(text(create_orders.replace("CREATE TABLE orders ", "CREATE TABLE orders_new ", 1)))
+
+    columns = ['id', 'user_id', 'product_id', 'delivery_date', 'address', 'transport_type', 'province',
+               'quantity', 'unit_price']
+    select_batch = text(
+        f"SELECT {', '.join(columns)} FROM orders WHERE id > :last_id ORDER BY id LIMIT :limit"
+    )
+    insert_batch = text(
+        f"INSERT INTO orders_new ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})"
+    )
+    last_id, copied = 0, 0
+    while True:
+        rows = connection.execute(select_batch, {"last_id": last_id, "limit": batch_size}).all()
+        if not rows:
+            break
+        batch = []
+        for row in rows:
+            values = dict(zip(columns, row))
+            try:
+                values['delivery_date'] = _parse_legacy_date(values['delivery_date']).isoformat()
+            except (AttributeError, ValueError):
+                raise ValueError(
+                    f"Zamówienie {values['id']}: nieprawidłowa data dostawy {values['delivery_date']!r}"
+                )
+            batch.append(values)
+        # Enumy w starej tabeli są zapisane jako nazwy - kopiujemy je bez konwersji
+        connection.execute(insert_batch, batch)
+        last_id = rows[-1][0]
+        copied += len(rows)
+        log(f"Skopiowano {copied} zamówień")
+
+    connection.execute(text("DROP TABLE orders"))
+    connection.execute(text("ALTER TABLE orders_new RENAME TO orders"))
+
+
+def _rewrite_orders_postgresql(log):
+    db.session.execute(text(
+        "ALTER TABLE orders ALTER COLUMN delivery_date TYPE DATE USING delivery_date::date"
+    ))
+    log("Zmieniono typ kolumny orders.delivery_date na DATE")
+
+
+def _add_order_columns(log):
+    """
+    Dodaje kolumny zamówień nowsze niż pierwotny schemat. Cena z chwili
+    zamówienia (unit_price) nie była wcześniej zapisywana - dla istniejących
+    zamówień przyjmujemy bieżącą cenę produktu (0 dla usuniętych produktów).
+    """
+    columns = {column['name'] for column in inspect(db.session.connection()).get_columns('orders')}
+    if 'quantity' not in columns:
+        db.session.execute(text("ALTER TABLE orders ADD COLUMN quantity INTEGER NOT NULL DEFAULT 1"))
+        log("Dodano kolumnę orders.quantity")
+    if 'unit_price' not in columns:
+        db.session.execute(text("ALTER TABLE orders ADD COLUMN unit_price FLOAT NOT NULL DEFAULT 0"))
+        db.session.execute(text(
+            "UPDATE orders SET unit_price = COALESCE("
+            "(SELECT products.price FROM products WHERE products.id = orders.product_id), 0)"
+        ))
+        log("Dodano kolumnę orders.unit_price (wypełnioną bieżącymi cenami produktów)")
+    db.session.commit()
+
+
+def upgrade_orders_schema(batch_size=5000, log=print):
+    """
+    Migracja istniejącej bazy do schematu z kolumną orders.delivery_date
+    typu DATE, kolumnami orders.quantity i orders.unit_price oraz indeksami
+    zamówień. Idempotentna - na aktualnej bazie tylko dotwarza brakujące
+    indeksy. Po zmianie typu daty agregaty raportów są przeliczane od nowa,
+    bo ich klucz dnia również zmienia typ.
+    """
+    inspector = inspect(db.session.connection())
+    if not inspector.has_table('orders'):
+        log("Brak tabeli orders - nic do migracji")
+        return
+
+    _add_order_columns(log)
+
+    if not _delivery_date_is_date(inspect(db.session.connection())):
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            _rewrite_orders_sqlite(batch_size, log)
+        else:
+            _rewrite_orders_postgresql(log)
+        OrderDailyRollup.__table__.drop(db.session.connection(), checkfirst=True)
+        OrderDailyRollup.__table__.create(db.session.connection())
+        db.session.commit()
+        log(f"Przeliczono agregaty raportów: {rebuild_rollups()} wierszy")
+
+    connection = db.session.connection()
+    for index in Order.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    db.session.commit()
+    log("Indeksy tabeli orders są aktualne")
@@ -0,0 +1,82 @@
+# passwords.py
+
+import threading
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from executors import native_thread_pool
+
+
+class PasswordHasherBusy(Exception):
+    """Wszystkie miejsca w puli haszowania są zajęte dłużej niż queue_timeout."""
+
+
+class PasswordHasher:
+    """
+    Haszowanie i weryfikacja haseł w ograniczonej puli wątków.
+
+    Haszowanie jest celowo kosztowne, więc seria logowań mogłaby zająć
+    wszystkie workery. Pula wykonuje najwyżej max_workers operacji naraz,
+    a żądanie czeka na wolne miejsce najwyżej queue_timeout sekund - potem
+    dostaje PasswordHasherBusy (503) zamiast blokować resztę aplikacji.
+    Pula tworzona jest leniwie (bezpieczne przy gunicorn --preload).
+
+    method i salt_length są przekazywane do werkzeug.security; hasła
+    zapisane z innymi parametrami wskazuje needs_rehash.
+    """
+
+    def __init__(self, method="scrypt", salt_length=16, max_workers=2, queue_timeout=5.0):
+        self.method = method
+        self.salt_length = salt_length
+        self.max_workers = max_workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._method_prefix = None
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHasherBusy()
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = native_thread_pool(self.max_workers, "passwords")
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """
+        Czy hash powstał z innymi parametrami niż obecnie skonfigurowane
+        (np. starsza metoda albo mniejszy koszt). Pełne parametry metody
+        (z domyślnym kosztem werkzeug) ustalane są raz, z pierwszego hasha.
+        """
+        if self._method_prefix is None:
+            sample = generate_password_hash("", self.method, self.salt_length)
+            self._method_prefix = sample.split("$", 1)[0]
+        method, _, rest = password_hash.partition("$")
+        salt = rest.partition("$")[0]
+        return method != self._method_prefix or len(salt) != self.salt_length
+
+
+def init_password_hasher(app):
+    hasher = PasswordHasher(
+        method=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        salt_length=app.config.get('PASSWORD_SALT_LENGTH', 16),
+        max_workers=app.config.get('PASSWORD_HASH_WORKERS', 2),
+        queue_timeout=app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0),
+    )
+    app.extensions['password_hasher'] = hasher
+    return hasher
+
+
+def get_password_hasher():
+    return current_app.extensions['password_hasher']
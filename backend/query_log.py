@@ -0,0 +1,168 @@
+# query_log.py
+
+import logging
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+from db_models import db
+
+logger = logging.getLogger(__name__)
+
+# Próg wolnego zapytania (ms), gdy aplikacja nie ustawia SQL_SLOW_QUERY_MS
+DEFAULT_SLOW_QUERY_MS = 200
+# Parametry zapytania w logu są przycinane (executemany bywa bardzo długie)
+MAX_LOGGED_PARAMS = 500
+
+# Aktywne record_queries() - osobno dla każdego wątku, żeby zapytania
+# wątków w tle (raporty, miniatury) nie trafiały do cudzego licznika
+_local = threading.local()
+
+# Dodatkowi odbiorcy pomiarów zapytań per silnik (np. metryki Prometheusa) -
+# każde zapytanie jest mierzone raz, tutaj, a wynik trafia do wszystkich
+_observers = weakref.WeakKeyDictionary()
+
+
+def route_label():
+    """
+    Wzorzec trasy bieżącego żądania (np. /product/<int:product_id>), a nie
+    sama ścieżka - w logu i metrykach nie pojawiają się identyfikatory.
+    """
+    if not has_request_context():
+        return "<no request>"
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+
+def _request_label():
+    if not has_request_context():
+        return "<no request>"
+    return f"{request.method} {route_label()}"
+
+
+def _format_params(parameters):
+    text = repr(parameters)
+    if len(text) > MAX_LOGGED_PARAMS:
+        text = text[:MAX_LOGGED_PARAMS] + "..."
+    return text
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_log_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_log_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    elapsed_ms = elapsed * 1000
+
+    for observer in _observers.get(conn.engine, ()):
+        observer(statement, elapsed)
+
+    for statements in getattr(_local, "recorders", ()):
+        statements.append(statement)
+
+    if has_request_context():
+        stats = g.get("query_stats")
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed_ms
+
+    threshold = (current_app.config.get('SQL_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS)
+                 if has_app_context() else DEFAULT_SLOW_QUERY_MS)
+    if threshold is not None and elapsed_ms >= threshold:
+        logger.warning("Wolne zapytanie SQL (%.1f ms, %s): %s | parametry: %s",
+                       elapsed_ms, _request_label(), statement, _format_params(parameters))
+
+
+def _handle_error(context):
+    starts = context.connection.info.get("query_log_start") if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def _register_engine_listeners(engine):
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def add_query_observer(engine, observer):
+    """
+    Rejestruje observer(statement, elapsed_seconds) wywoływany po każdym
+    zapytaniu SQL silnika engine, z czasem zmierzonym przez ten moduł.
+    """
+    _register_engine_listeners(engine)
+    observers = _observers.setdefault(engine, [])
+    if observer not in observers:
+        observers.append(observer)
+
+
+def _before_request():
+    # [liczba zapytań, łączny czas w ms]
+    g.query_stats = [0, 0.0]
+
+
+def _after_request(response):
+    stats = g.get("query_stats")
+    if stats is not None and (current_app.debug or current_app.config.get('SQL_QUERY_HEADERS')):
+        # Odpowiedź strumieniowa czyta bazę dalej - nagłówek obejmuje
+        # tylko zapytania wykonane przed jej wysłaniem
+        response.headers['X-Query-Count'] = str(stats[0])
+        response.headers['X-Query-Time-Ms'] = f"{stats[1]:.1f}"
+    return response
+
+
+@contextmanager
+def record_queries():
+    """
+    Zbiera treść zapytań SQL wykonanych w bieżącym wątku w obrębie bloku
+    with (wymaga init_query_log). Zwraca listę uzupełnianą na bieżąco.
+    """
+    statements = []
+    recorders = getattr(_local, "recorders", None)
+    if recorders is None:
+        recorders = _local.recorders = []
+    recorders.append(statements)
+    try:
+        yield statements
+    finally:
+        recorders.remove(statements)
+
+
+@contextmanager
+def assert_max_queries(max_queries):
+    """
+    Kończy się AssertionError (z listą zapytań), jeśli blok with wykonał
+    więcej niż max_queries zapytań SQL - w testach wyłapuje zapytania
+    wykonywane w pętli (N+1).
+    """
+    with record_queries() as statements:
+        yield statements
+    if len(statements) > max_queries:
+        raise AssertionError(
+            f"Wykonano {len(statements)} zapytań SQL, dozwolone {max_queries}:\n"
+            + "\n".join(f"  {s}" for s in statements)
+        )
+
+
+def init_query_log(app):
+    """
+    Rejestruje liczenie zapytań SQL per żądanie i log wolnych zapytań
+    (logger query_log, poziom WARNING; próg SQL_SLOW_QUERY_MS, None wyłącza).
+    W trybie debug albo przy SQL_QUERY_HEADERS=True odpowiedź dostaje
+    nagłówki X-Query-Count i X-Query-Time-Ms.
+    """
+    app.config.setdefault('SQL_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS)
+    app.config.setdefault('SQL_QUERY_HEADERS', False)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    with app.app_context():
+        _register_engine_listeners(db.engine)
@@ -0,0 +1,113 @@
+# rate_limit.py
+
+import math
+import threading
+import time
+
+from flask import current_app, jsonify
+
+# Domyślne limity: nazwa -> (liczba żądań, okno w sekundach)
+DEFAULT_RATE_LIMITS = {
+    "login_ip": (20, 60),
+    "login_email": (5, 60),
+    "register_ip": (5, 60),
+    # Rejestracje na jeden adres email z wielu IP (sprawdzanie, czy konto istnieje)
+    "register_email": (5, 3600),
+}
+
+
+class SlidingWindowLimiter:
+    """
+    Limiter z przesuwanym oknem (przybliżenie dwoma oknami stałymi):
+    liczba żądań z poprzedniego okna jest ważona częścią, która wciąż
+    mieści się w oknie przesuwanym. Każdy klucz to stały rozmiar stanu
+    i aktualizacja O(1). Klucze nieaktywne dłużej niż dwa okna są
+    usuwane co evict_interval sekund, więc pamięć nie rośnie z liczbą
+    odwiedzających. Odrzucone żądania nie są liczone.
+    """
+
+    def __init__(self, limit, window, evict_interval=None):
+        self.limit = limit
+        self.window = float(window)
+        self.evict_interval = evict_interval or self.window
+        # klucz -> [początek bieżącego okna, licznik bieżący, licznik poprzedni]
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._next_eviction = 0.0
+
+    def hit(self, key, now=None):
+        """
+        Rejestruje żądanie. Zwraca 0, jeśli jest dozwolone, a w przeciwnym
+        razie liczbę sekund, po której warto spróbować ponownie.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now >= self._next_eviction:
+                self._evict(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [now - now % self.window, 0, 0]
+            elapsed_windows = int((now - entry[0]) // self.window)
+            if elapsed_windows:
+                entry[2] = entry[1] if elapsed_windows == 1 else 0
+                entry[1] = 0
+                entry[0] += elapsed_windows * self.window
+
+            elapsed = now - entry[0]
+            current, previous = entry[1], entry[2]
+            estimate = previous * (1 - elapsed / self.window) + current
+            if estimate + 1 <= self.limit:
+                entry[1] += 1
+                return 0
+            return self._retry_after(elapsed, current, previous, estimate)
+
+    def _retry_after(self, elapsed, current, previous, estimate):
+        if current + 1 <= self.limit:
+            # Wystarczy, że wygaśnie część żądań z poprzedniego okna
+            wait = (estimate + 1 - self.limit) * self.window / previous
+        else:
+            # Czekamy na następne okno, w którym bieżący licznik stanie się poprzednim
+            wait = self.window - elapsed + (current + 1 - self.limit) * self.window / max(current, 1)
+        return max(1, math.ceil(wait))
+
+    def _evict(self, now):
+        cutoff = now - 2 * self.window
+        for key in [k for k, entry in self._entries.items() if entry[0] < cutoff]:
+            del self._entries[key]
+        self._next_eviction = now + self.evict_interval
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def init_rate_limits(app):
+    """
+    Tworzy limitery z konfiguracji RATE_LIMITS (słownik nazwa -> (limit, okno)),
+    uzupełnionej wartościami domyślnymi. RATE_LIMIT_ENABLED=False wyłącza limity.
+    """
+    config = {**DEFAULT_RATE_LIMITS, **app.config.get('RATE_LIMITS', {})}
+    limiters = {name: SlidingWindowLimiter(limit, window) for name, (limit, window) in config.items()}
+    app.extensions['rate_limits'] = limiters
+    return limiters
+
+
+def rate_limited(*checks):
+    """
+    Sprawdza limity (pary nazwa limitera, klucz; klucz None jest pomijany).
+    Zwraca odpowiedź 429 z nagłówkiem Retry-After albo None, jeśli żądanie
+    mieści się we wszystkich limitach. Limity sprawdzane są po kolei,
+    więc żądanie odrzucone przez pierwszy nie zużywa kolejnych.
+    """
+    if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+        return None
+    limiters = current_app.extensions['rate_limits']
+    for name, key in checks:
+        if key is None:
+            continue
+        retry_after = limiters[name].hit(key)
+        if retry_after:
+            response = jsonify({"msg": "Zbyt wiele prób, spróbuj ponownie później"})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+    return None
@@ -0,0 +1,198 @@
+# report_jobs.py
+
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_
+
+from catalog_cache import read_catalog_version
+from db_models import db, ReportJob
+from reports import build_report
+
+logger = logging.getLogger(__name__)
+
+# Zadania w toku - dla nich nie zlecamy drugiego, identycznego liczenia
+_ACTIVE_STATUSES = ('queued', 'running')
+
+
+def _cache_key(start_date, end_date, group_by):
+    key = f"{start_date.isoformat()}:{end_date.isoformat()}:{','.join(group_by or ['-'])}"
+    if group_by and 'product' in group_by:
+        # Kostka z wymiarem product zawiera bieżące opisy produktów,
+        # więc wynik jest ważny tylko dla danej wersji katalogu
+        key += f":catalog={read_catalog_version()}"
+    return key
+
+
+def invalidate_cached_reports(dates):
+    """
+    Unieważnia zapamiętane raporty, których zakres obejmuje którąś z dat
+    (zamówienia "wstecz"). Wywoływać w transakcji zapisującej zamówienia.
+    Zamówienia z datą od dziś nie dotyczą żadnego zapamiętanego raportu,
+    więc w typowym przypadku nie ma tu żadnego zapytania.
+    """
+    past = [d for d in dates if d < date.today()]
+    if not past:
+        return
+    ReportJob.query.filter(
+        ReportJob.cacheable.is_(True),
+        ReportJob.start_date <= max(past),
+        ReportJob.end_date >= min(past)
+    ).update({ReportJob.cacheable: False}, synchronize_session=False)
+
+
+def job_to_dict(job):
+    data = {
+        "job_id": job.id,
+        "status": job.status,
+        "params": json.loads(job.params),
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == 'done':
+        data["result"] = json.loads(job.result)
+    elif job.status == 'failed':
+        data["error"] = job.error
+    return data
+
+
+class ReportJobs:
+    """
+    Wykonuje raporty w tle, żeby długie zakresy dat nie blokowały workerów
+    obsługujących sklep. Pula wątków tworzona jest leniwie przy pierwszym
+    zleceniu (bezpieczne przy gunicorn --preload). W trybie gevent zadania
+    działają jako greenlety (zwykły ThreadPoolExecutor): praca na bazie
+    i logowanie w wątku systemowym czekałyby na blokady gevent, których
+    pętla zdarzeń tego wątku nigdy nie zwolni.
+
+    Raporty zakresów leżących w całości w przeszłości nie mogą się zmienić
+    (poza zamówieniami "wstecz" - invalidate_cached_reports), więc ponowne
+    zlecenie takiego raportu zwraca istniejące zadanie zamiast liczyć od nowa.
+    Zadania, których wynik nie nadaje się do cache, i zadania zakończone
+    błędem są usuwane po job_ttl.
+
+    Zadanie oczekujące lub liczone dłużej niż stale_after sekund (np. po
+    restarcie workera, który je wykonywał) uznawane jest za nieudane - nie
+    jest ponownie wykorzystywane, a kolejne zlecenie liczy raport od nowa.
+    """
+
+    def __init__(self, app, max_workers=1, job_ttl=3600, stale_after=1800):
+        self.app = app
+        self.max_workers = max_workers
+        self.job_ttl = job_ttl
+        self.stale_after = stale_after
+        self._executor = None
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def submit(self, start_date, end_date, group_by=None):
+        """
+        Zleca raport (argumenty jak build_report). Zwraca (job, cached) -
+        cached=True, jeśli użyto istniejącego zadania dla tych parametrów.
+        """
+        cacheable = end_date < date.today()
+        cache_key = _cache_key(start_date, end_date, group_by)
+        self._fail_stale()
+        if cacheable:
+            existing = ReportJob.query.filter(
+                ReportJob.cache_key == cache_key,
+                ReportJob.cacheable.is_(True),
+                ReportJob.status.in_(('done',) + _ACTIVE_STATUSES)
+            ).order_by(ReportJob.created_at.desc()).first()
+            if existing is not None:
+                return existing, True
+
+        self._purge_expired()
+        job = ReportJob(
+            id=uuid.uuid4().hex,
+            cache_key=cache_key,
+            params=json.dumps({
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "group_by": group_by,
+            }),
+            start_date=start_date,
+            end_date=end_date,
+            status='queued',
+            cacheable=cacheable,
+            created_at=datetime.utcnow(),
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="reports")
+            future = self._executor.submit(self._run, job.id, start_date, end_date, group_by)
+            self._futures.add(future)
+        future.add_done_callback(self._done)
+        return job, False
+
+    def wait(self, timeout=None):
+        """Czeka na zakończenie wszystkich zleconych zadań (np. w testach)."""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures, timeout=timeout)
+
+    def _done(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _fail_stale(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        ReportJob.query.filter(
+            ReportJob.status.in_(_ACTIVE_STATUSES),
+            ReportJob.created_at < cutoff
+        ).update({
+            ReportJob.status: 'failed',
+            ReportJob.error: 'Timeout',
+            ReportJob.finished_at: datetime.utcnow(),
+        }, synchronize_session=False)
+
+    def _purge_expired(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.job_ttl)
+        ReportJob.query.filter(
+            or_(ReportJob.cacheable.is_(False), ReportJob.status == 'failed'),
+            ReportJob.status.notin_(_ACTIVE_STATUSES),
+            ReportJob.created_at < cutoff
+        ).delete(synchronize_session=False)
+
+    def _run(self, job_id, start_date, end_date, group_by):
+        with self.app.app_context():
+            started = ReportJob.query.filter_by(id=job_id, status='queued').update({ReportJob.status: 'running'})
+            db.session.commit()
+            if not started:
+                # Zadanie czekało w kolejce dłużej niż stale_after i zostało już oznaczone jako nieudane
+                return
+            try:
+                result = build_report(start_date, end_date, group_by)
+            except Exception as e:
+                db.session.rollback()
+                logger.exception("Raport %s zakończony błędem", job_id)
+                values = {ReportJob.status: 'failed', ReportJob.error: e.__class__.__name__}
+            else:
+                values = {ReportJob.status: 'done', ReportJob.result: json.dumps(result)}
+            values[ReportJob.finished_at] = datetime.utcnow()
+            ReportJob.query.filter_by(id=job_id).update(values)
+            db.session.commit()
+
+
+def init_report_jobs(app):
+    jobs = ReportJobs(
+        app,
+        max_workers=app.config.get('REPORT_JOB_WORKERS', 1),
+        job_ttl=app.config.get('REPORT_JOB_TTL', 3600),
+        stale_after=app.config.get('REPORT_JOB_STALE_AFTER', 1800),
+    )
+    app.extensions['report_jobs'] = jobs
+    return jobs
+
+
+def get_report_jobs():
+    return current_app.extensions['report_jobs']
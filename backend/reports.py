@@ -0,0 +1,120 @@
+# reports.py
+
+from sqlalchemy import func
+
+from db_models import db, Order, OrderDailyRollup, Product
+from rollups import report_from_rollups
+
+# Wymiary kostki raportowej w kolejności, w jakiej pojawiają się w wynikach
+CUBE_DIMENSIONS = ('province', 'transport_type', 'product', 'month')
+
+
+def parse_group_by(group_by_str):
+    """
+    Parsuje ?group_by=a,b - zwraca listę wymiarów w kanonicznej kolejności
+    (CUBE_DIMENSIONS), bez duplikatów. Rzuca ValueError przy nieznanym wymiarze.
+    """
+    requested = [d.strip() for d in (group_by_str or '').split(',') if d.strip()]
+    unknown = [d for d in requested if d not in CUBE_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Nieznane wymiary: {unknown}. Dozwolone: {list(CUBE_DIMENSIONS)}")
+    return [d for d in CUBE_DIMENSIONS if d in requested]
+
+
+def _month(column):
+    """Wyrażenie 'YYYY-MM' dla kolumny daty, zależne od bazy."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
+
+
+def report_cube(start_date, end_date, group_by):
+    """
+    Liczba i wartość zamówień z zakresu dat pogrupowane po dowolnej
+    kombinacji wymiarów z CUBE_DIMENSIONS - zawsze jednym zapytaniem.
+
+    Bez wymiaru product zapytanie idzie do dziennych agregatów
+    (rollups.py), więc jego koszt zależy od liczby dni, a nie zamówień.
+    Z wymiarem product liczymy z tabeli orders (indeks po dacie) - agregaty
+    nie przechowują produktu. Wartość zamówienia w obu przypadkach to cena
+    z chwili jego złożenia razy ilość (Order.value).
+
+    Sumy całkowite wyliczane są z pogrupowanych wierszy, bez ponownego
+    zapytania. Zwraca (rows, totals).
+    """
+    if 'product' in group_by:
+        columns = {
+            'province': Order.province,
+            'transport_type': Order.transport_type,
+            'month': _month(Order.delivery_date),
+        }
+        count, value = func.count(Order.id), func.coalesce(func.sum(Order.value), 0.0)
+        date_column = Order.delivery_date
+    else:
+        columns = {
+            'province': OrderDailyRollup.province,
+            'transport_type': OrderDailyRollup.transport_type,
+            'month': _month(OrderDailyRollup.day),
+        }
+        count, value = func.sum(OrderDailyRollup.order_count), func.sum(OrderDailyRollup.order_value)
+        date_column = OrderDailyRollup.day
+
+    group_columns = []
+    for dimension in group_by:
+        if dimension == 'product':
+            group_columns += [Product.id, Product.description]
+        else:
+            group_columns.append(columns[dimension].label(dimension))
+
+    query = db.session.query(*group_columns, count.label('order_count'), value.label('order_value'))
+    if 'product' in group_by:
+        query = query.select_from(Order).outerjoin(Order.product)
+    query = query.filter(date_column >= start_date, date_column <= end_date)
+    if group_columns:
+        query = query.group_by(*group_columns).order_by(*group_columns)
+
+    rows = []
+    for row in query.all():
+        if not row.order_count:
+            continue
+        item = {}
+        for dimension in group_by:
+            if dimension == 'product':
+                item['product_id'] = row.id
+                item['product_description'] = row.description
+            elif dimension in ('province', 'transport_type'):
+                item[dimension] = getattr(row, dimension).value
+            else:
+                item[dimension] = getattr(row, dimension)
+        item['order_count'] = row.order_count
+        item['order_value'] = row.order_value or 0
+        rows.append(item)
+
+    totals = {
+        'order_count': sum(r['order_count'] for r in rows),
+        'order_value': sum(r['order_value'] for r in rows),
+    }
+    return rows, totals
+
+
+def build_report(start_date, end_date, group_by=None):
+    """
+    Treść odpowiedzi raportu: podstawowego (group_by=None, jak /admin/report)
+    albo kostki (lista wymiarów, jak /admin/report/cube). Wspólna dla
+    endpointów synchronicznych i zadań w tle (report_jobs.py).
+    """
+    if group_by is None:
+        total_orders, total_sum, orders_per_province = report_from_rollups(start_date, end_date)
+        return {
+            "total_orders": total_orders,
+            "total_sum": total_sum,
+            "orders_per_province": orders_per_province
+        }
+    rows, totals = report_cube(start_date, end_date, group_by)
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "group_by": group_by,
+        "rows": rows,
+        "totals": totals
+    }
@@ -0,0 +1,107 @@
+# rollups.py
+
+from collections import defaultdict
+
+from sqlalchemy import func, insert, delete
+
+from db_models import db, Order, OrderDailyRollup
+
+
+def _upsert(rows):
+    """
+    INSERT ... ON CONFLICT DO UPDATE dodający liczniki do istniejących wierszy.
+    Aktualizacja jest atomowa po stronie bazy, więc równoległe transakcje
+    (np. z kilku workerów) nie gubią zamówień.
+    """
+    # Moduły dialektów importowane dopiero tutaj - dialekt PostgreSQL
+    # wydłużałby import aplikacji także w instalacjach na SQLite
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_fn
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_fn
+    stmt = insert_fn(OrderDailyRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['day', 'province', 'transport_type'],
+        set_={
+            'order_count': OrderDailyRollup.order_count + stmt.excluded.order_count,
+            'order_value': OrderDailyRollup.order_value + stmt.excluded.order_value,
+        }
+    )
+    db.session.execute(stmt, rows)
+
+
+def add_orders_to_rollups(orders):
+    """
+    Dolicza zamówienia do dziennych agregatów w bieżącej transakcji.
+    Wywoływać przed commitem każdej operacji tworzącej zamówienia,
+    żeby agregaty zawsze zgadzały się z tabelą orders.
+
+    :param orders: iterowalne krotki (delivery_date, province, transport_type, value)
+    """
+    totals = defaultdict(lambda: [0, 0.0])
+    for delivery_date, province, transport_type, value in orders:
+        entry = totals[(delivery_date, province, transport_type)]
+        entry[0] += 1
+        entry[1] += value or 0.0
+    if not totals:
+        return
+    _upsert([
+        {
+            'day': day,
+            'province': province,
+            'transport_type': transport_type,
+            'order_count': count,
+            'order_value': value,
+        }
+        for (day, province, transport_type), (count, value) in totals.items()
+    ])
+
+
+def rebuild_rollups():
+    """
+    Przelicza wszystkie agregaty od zera na podstawie tabeli orders
+    (np. po wdrożeniu na istniejącej bazie). Wartość zamówienia to cena
+    z chwili jego złożenia razy ilość (Order.value), więc przeliczenie nie
+    zmienia raportów za przeszłe okresy.
+    Zwraca liczbę utworzonych wierszy agregatów.
+    """
+    db.session.execute(delete(OrderDailyRollup))
+    source = db.session.query(
+        Order.delivery_date,
+        Order.province,
+        Order.transport_type,
+        func.count(Order.id),
+        func.coalesce(func.sum(Order.value), 0.0),
+    ).group_by(
+        Order.delivery_date, Order.province, Order.transport_type
+    )
+    result = db.session.execute(
+        insert(OrderDailyRollup).from_select(
+            ['day', 'province', 'transport_type', 'order_count', 'order_value'],
+            source.statement
+        )
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def report_from_rollups(start_day, end_day):
+    """
+    Raport za zakres dni (włącznie) wyłącznie z agregatów - koszt zależy
+    od liczby dni, a nie od liczby zamówień.
+    Zwraca (total_orders, total_sum, orders_per_province).
+    """
+    rows = db.session.query(
+        OrderDailyRollup.province,
+        func.sum(OrderDailyRollup.order_count),
+        func.sum(OrderDailyRollup.order_value),
+    ).filter(
+        OrderDailyRollup.day >= start_day,
+        OrderDailyRollup.day <= end_day
+    ).group_by(OrderDailyRollup.province).all()
+
+    total_orders = sum(count for _, count, _ in rows)
+    total_sum = sum(value for _, _, value in rows) or 0
+    orders_per_province = {province.value: count for province, count, _ in rows if count > 0}
+    return total_orders, total_sum, orders_per_province
@@ -0,0 +1,147 @@
+# search.py
+
+import re
+
+from sqlalchemy import text
+
+from db_models import db
+
+# Indeks pełnotekstowy (SQLite FTS5) nad products.description.
+# Tabela jest typu "external content" - trzyma tylko indeks, a treść czyta
+# z tabeli products. Synchronizację zapewniają triggery, więc każdy zapis
+# produktu (także masowy, z pominięciem ORM) od razu trafia do indeksu.
+_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        description,
+        content='products',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO products_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+]
+
+# Na PostgreSQL zamiast FTS5: indeks GIN na wyrażeniu tsvector opisu,
+# utrzymywany przez samą bazę (bez triggerów). Konfiguracja 'simple' nie
+# stemmuje słów - zachowanie jak w SQLite, ale bez usuwania znaków
+# diakrytycznych (wymagałoby rozszerzenia unaccent).
+_PG_TSVECTOR = "to_tsvector('simple', {column})"
+_PG_SEARCH_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_products_description_fts ON products USING gin ("
+    + _PG_TSVECTOR.format(column="description") + ")"
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _is_postgresql():
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+
+def ensure_search_index():
+    """
+    Tworzy indeks FTS5 i triggery, jeśli jeszcze nie istnieją.
+    Dla istniejącej bazy z produktami indeks jest budowany od zera.
+    Na PostgreSQL tworzy indeks GIN opisów produktów.
+    """
+    if _is_postgresql():
+        db.session.execute(text(_PG_SEARCH_DDL))
+        db.session.commit()
+        return
+    exists = db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    )).first()
+    for statement in _SEARCH_DDL:
+        db.session.execute(text(statement))
+    if not exists:
+        db.session.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+    db.session.commit()
+
+
+def build_match_query(phrase):
+    """
+    Zamienia frazę użytkownika na bezpieczne zapytanie FTS5: każde słowo
+    jako prefiks w cudzysłowie, wszystkie słowa muszą wystąpić (AND).
+    Zwraca None, jeśli fraza nie zawiera żadnego słowa.
+    """
+    tokens = _TOKEN_RE.findall(phrase or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_products(phrase, min_price=None, max_price=None, limit=20, offset=0):
+    """
+    Wyszukuje produkty po opisie, posortowane wg trafności (bm25).
+    Zwraca listę wierszy z kolumnami id, description, price, image_hash.
+    """
+    if _is_postgresql():
+        return _search_products_postgresql(phrase, min_price, max_price, limit, offset)
+    match = build_match_query(phrase)
+    if match is None:
+        return []
+
+    sql = """
+        SELECT p.id, p.description, p.price, p.image_hash
+        FROM products_fts
+        JOIN products p ON p.id = products_fts.rowid
+        WHERE products_fts MATCH :match
+    """
+    params = {"match": match, "limit": limit, "offset": offset}
+    if min_price is not None:
+        sql += " AND p.price >= :min_price"
+        params["min_price"] = min_price
+    if max_price is not None:
+        sql += " AND p.price <= :max_price"
+        params["max_price"] = max_price
+    sql += " ORDER BY bm25(products_fts), p.id LIMIT :limit OFFSET :offset"
+
+    return db.session.execute(text(sql), params).all()
+
+
+def _search_products_postgresql(phrase, min_price, max_price, limit, offset):
+    """Odpowiednik search_products dla PostgreSQL (tsquery z prefiksami, ts_rank)."""
+    tokens = _TOKEN_RE.findall(phrase or "")
+    if not tokens:
+        return []
+
+    document = _PG_TSVECTOR.format(column="p.description")
+    sql = f"""
+        SELECT p.id, p.description, p.price, p.image_hash
+        FROM products p, to_tsquery('simple', :query) query
+        WHERE {document} @@ query
+    """
+    params = {
+        # Słowa z \w+ nie zawierają operatorów tsquery, więc można je złożyć wprost
+        "query": " & ".join(f"{token.lower()}:*" for token in tokens),
+        "limit": limit,
+        "offset": offset,
+    }
+    if min_price is not None:
+        sql += " AND p.price >= :min_price"
+        params["min_price"] = min_price
+    if max_price is not None:
+        sql += " AND p.price <= :max_price"
+        params["max_price"] = max_price
+    sql += f" ORDER BY ts_rank({document}, query) DESC, p.id"
+    sql += " LIMIT :limit OFFSET :offset"
+
+    return db.session.execute(text(sql), params).all()
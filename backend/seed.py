@@ -0,0 +1,219 @@
+# seed.py
+
+import bisect
+import itertools
+import random
+import re
+import struct
+import zlib
+from datetime import date, timedelta
+
+from sqlalchemy import insert, or_
+
+from catalog_cache import commit_catalog_change
+from database import insert_returning_ids
+from db_models import db, User, Product, Order, Province, TransportType, Vehicle
+from image_store import get_image_store
+from passwords import get_password_hasher
+from report_jobs import invalidate_cached_reports
+from rollups import add_orders_to_rollups
+
+# Hasło wszystkich wygenerowanych użytkowników (user<N>@example.com)
+SEED_PASSWORD = "haslo123"
+
+# Udział województw w zamówieniach - w przybliżeniu liczba ludności (mln)
+PROVINCE_WEIGHTS = {
+    Province.DOLNOSLASKIE: 2.9, Province.KUJAWSKOPOMORSKIE: 2.0, Province.LUBELSKIE: 2.0,
+    Province.LUBUSKIE: 1.0, Province.LODZKIE: 2.4, Province.MAŁOPOLSKIE: 3.4,
+    Province.MAZOWIECKIE: 5.5, Province.OPOLE: 0.95, Province.PODKARPACKIE: 2.1,
+    Province.PODLASKIE: 1.15, Province.POMORSKIE: 2.35, Province.SLASKIE: 4.4,
+    Province.SWIETOKRZYSKIE: 1.2, Province.WARMINSKOMAZURSKIE: 1.4, Province.WIELKOPOLSKIE: 3.5,
+    Province.ZACHODNIOPOMORSKIE: 1.65,
+}
+TRANSPORT_WEIGHTS = {TransportType.TRUCK: 0.5, TransportType.COURIER: 0.35, TransportType.PICKUP: 0.15}
+# Sezonowość: więcej dostaw w sezonie prac polowych i zbiorów
+MONTH_WEIGHTS = [0.5, 0.6, 1.0, 1.3, 1.4, 1.2, 1.3, 1.5, 1.4, 1.1, 0.7, 0.5]
+# Dni tygodnia (pon.-niedz.): w weekend dostaw jest niewiele
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 1.0, 0.4, 0.1]
+# Ładunek zamówienia (palety): średnio ok. 5 dla ciężarówek, 1-2 dla kuriera
+MAX_QUANTITY = {TransportType.TRUCK: 24, TransportType.COURIER: 4, TransportType.PICKUP: 10}
+QUANTITY_RATE = {TransportType.TRUCK: 0.25, TransportType.COURIER: 1.0, TransportType.PICKUP: 0.5}
+# Flota: udział rodzajów pojazdów i ich ładowność (palety)
+VEHICLE_WEIGHTS = {TransportType.TRUCK: 0.6, TransportType.COURIER: 0.4}
+VEHICLE_CAPACITIES = {TransportType.TRUCK: [8, 12, 18, 24, 33], TransportType.COURIER: [2, 4, 6]}
+
+_PRODUCT_NAMES = ["Pszenica", "Żyto", "Owies", "Jęczmień", "Kukurydza", "Rzepak", "Ziemniaki",
+                  "Buraki", "Siano", "Słoma", "Nawóz", "Pasza", "Jabłka", "Marchew", "Kapusta"]
+_SEED_NAME_RE = re.compile(r'^user(\d+)(@example\.com)?$')
+_PRODUCT_VARIANTS = ["ozima", "jara", "ekologiczna", "paszowa", "konsumpcyjna", "luzem",
+                     "w workach 25 kg", "w big-bagach", "klasa I", "klasa II"]
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def _weighted_choice(rng, values, cumulative):
+    return values[bisect.bisect(cumulative, rng.random() * cumulative[-1])]
+
+
+def _next_user_number():
+    """
+    Pierwszy numer kont user<N> większy od numerów wszystkich istniejących
+    nazw user<N> i adresów user<N>@example.com - także kont zarejestrowanych
+    zwykłą ścieżką, więc liczba użytkowników nie wystarcza.
+    """
+    taken = db.session.query(User.username, User.email).filter(
+        or_(User.username.like('user%'), User.email.like('user%@example.com'))
+    )
+    numbers = [
+        int(match.group(1))
+        for row in taken for value in row
+        if (match := _SEED_NAME_RE.match(value))
+    ]
+    return max(numbers, default=0) + 1
+
+
+def _insert_returning_ids(model, rows):
+    """Jeden INSERT partii z RETURNING id (w kolejności rows) i commit."""
+    ids = insert_returning_ids(model, rows)
+    db.session.commit()
+    return ids
+
+
+def random_png(rng, size):
+    """Obraz PNG size x size z losowym szumem (RGB) - bez Pillow, tylko zlib."""
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    rows = b"".join(b"\x00" + rng.randbytes(size * 3) for _ in range(size))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows, 1))
+            + chunk(b"IEND", b""))
+
+
+def _quantity(rng, transport_type):
+    return min(1 + int(rng.expovariate(QUANTITY_RATE[transport_type])), MAX_QUANTITY[transport_type])
+
+
+def generate_data(users=100, products=1000, orders=10000, start_date=None, days=365,
+                  images=100, image_size=0, vehicles=0, seed=0, batch_size=50000, log=print):
+    """
+    Wypełnia bazę danymi testowymi o realistycznych rozkładach:
+    - województwa wg liczby ludności, transport z przewagą ciężarówek,
+    - daty dostaw z sezonowością miesięczną i mało licznymi weekendami,
+    - popularność produktów i aktywność klientów wg rozkładu Zipfa
+      (kilka produktów i klientów ma większość zamówień),
+    - ceny z rozkładu log-normalnego,
+    - ładunek zamówień z rozkładu wykładniczego (większy dla ciężarówek),
+    - flota vehicles pojazdów z bazami rozłożonymi jak zamówienia.
+
+    Dane zapisywane są INSERT-ami po batch_size wierszy, każda partia
+    w jednej transakcji - tak jak przy zwykłych zapisach: produkty podbijają
+    wersję katalogu, a zamówienia uzupełniają agregaty raportów
+    i unieważniają zapamiętane raporty obejmujące ich daty.
+    Wynik zależy tylko od parametrów i seed. Obrazy (images różnych,
+    image_size x image_size px) powstają tylko przy image_size > 0.
+    Zwraca słownik z liczbą utworzonych wierszy.
+    """
+    if orders and (not products or not users):
+        raise ValueError("Zamówienia wymagają co najmniej jednego produktu i użytkownika")
+    rng = random.Random(seed)
+    start_date = start_date or date.today() - timedelta(days=days)
+
+    # Numeracja kont kontynuuje istniejące, więc generator można uruchomić ponownie
+    first_number = _next_user_number()
+    password_hash = get_password_hasher().hash(SEED_PASSWORD)
+    user_ids = []
+    for offset in range(0, users, batch_size):
+        user_ids += _insert_returning_ids(User, [
+            {"username": f"user{first_number + i}", "email": f"user{first_number + i}@example.com",
+             "password": password_hash, "is_admin": False}
+            for i in range(offset, min(offset + batch_size, users))
+        ])
+    log(f"Użytkownicy: {users}")
+
+    image_hashes = []
+    if image_size > 0:
+        store = get_image_store()
+        image_hashes = [store.put(random_png(rng, image_size)) for _ in range(min(images, products))]
+        log(f"Obrazy: {len(image_hashes)} ({image_size}x{image_size} px)")
+
+    product_ids = []
+    product_prices = {}
+    for offset in range(0, products, batch_size):
+        rows = [
+            {
+                "description": f"{rng.choice(_PRODUCT_NAMES)} {rng.choice(_PRODUCT_VARIANTS)} #{i + 1}",
+                "price": round(min(rng.lognormvariate(3.5, 1.0), 10000.0), 2),
+                "image_hash": image_hashes[i % len(image_hashes)] if image_hashes else None,
+            }
+            for i in range(offset, min(offset + batch_size, products))
+        ]
+        ids = insert_returning_ids(Product, rows)
+        commit_catalog_change()
+        product_ids += ids
+        product_prices.update(zip(ids, (row["price"] for row in rows)))
+    log(f"Produkty: {products}")
+
+    provinces = list(PROVINCE_WEIGHTS)
+    province_cum = _cumulative(PROVINCE_WEIGHTS.values())
+    transports = list(TRANSPORT_WEIGHTS)
+    transport_cum = _cumulative(TRANSPORT_WEIGHTS.values())
+    dates = [start_date + timedelta(days=d) for d in range(days)]
+    date_cum = _cumulative(MONTH_WEIGHTS[d.month - 1] * WEEKDAY_WEIGHTS[d.weekday()] for d in dates)
+    # Zipf (s=1): k-ty element wybierany z wagą 1/k; numery losowo przestawione,
+    # żeby popularne produkty nie były zawsze tymi o najniższych id
+    rng.shuffle(product_ids)
+    product_cum = _cumulative(1 / k for k in range(1, products + 1))
+    rng.shuffle(user_ids)
+    user_cum = _cumulative(1 / k for k in range(1, users + 1))
+
+    def order_row():
+        transport_type = _weighted_choice(rng, transports, transport_cum)
+        product_id = _weighted_choice(rng, product_ids, product_cum)
+        return {
+            "user_id": _weighted_choice(rng, user_ids, user_cum),
+            "product_id": product_id,
+            "unit_price": product_prices[product_id],
+            "delivery_date": _weighted_choice(rng, dates, date_cum),
+            "address": f"ul. Polna {rng.randint(1, 200)}, {rng.randint(10, 99)}-{rng.randint(100, 999)}",
+            "transport_type": transport_type,
+            "province": _weighted_choice(rng, provinces, province_cum),
+            "quantity": _quantity(rng, transport_type),
+        }
+
+    for offset in range(0, orders, batch_size):
+        rows = [order_row() for _ in range(offset, min(offset + batch_size, orders))]
+        db.session.execute(insert(Order), rows)
+        add_orders_to_rollups(
+            (row["delivery_date"], row["province"], row["transport_type"], row["unit_price"] * row["quantity"])
+            for row in rows
+        )
+        invalidate_cached_reports({row["delivery_date"] for row in rows})
+        db.session.commit()
+        log(f"Zamówienia: {min(offset + batch_size, orders)}/{orders}")
+
+    vehicle_types = list(VEHICLE_WEIGHTS)
+    vehicle_cum = _cumulative(VEHICLE_WEIGHTS.values())
+    first_vehicle = db.session.query(db.func.count(Vehicle.id)).scalar() + 1
+    for offset in range(0, vehicles, batch_size):
+        rows = []
+        for i in range(offset, min(offset + batch_size, vehicles)):
+            transport_type = _weighted_choice(rng, vehicle_types, vehicle_cum)
+            rows.append({
+                "registration": f"SEED{first_vehicle + i:06d}",
+                "transport_type": transport_type,
+                "capacity": rng.choice(VEHICLE_CAPACITIES[transport_type]),
+                "depot_province": _weighted_choice(rng, provinces, province_cum),
+                "active": True,
+            })
+        db.session.execute(insert(Vehicle), rows)
+        db.session.commit()
+    if vehicles:
+        log(f"Pojazdy: {vehicles}")
+
+    return {"users": users, "products": products, "orders": orders, "images": len(image_hashes),
+            "vehicles": vehicles}
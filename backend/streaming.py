@@ -0,0 +1,80 @@
+# streaming.py
+
+import csv
+import io
+
+from flask import current_app, Response, stream_with_context
+
+
+def stream_json_array(query, serialize, batch_size=None):
+    """
+    Zwraca odpowiedź strumieniową z tablicą JSON budowaną w locie.
+
+    Wiersze pobierane są z bazy partiami (yield_per), a do klienta trafiają
+    fragmenty po batch_size elementów, więc zużycie pamięci nie zależy
+    od liczby wierszy w wyniku.
+
+    :param query: zapytanie ORM (Query)
+    :param serialize: funkcja zamieniająca wiersz na słownik
+    """
+    batch_size = batch_size or current_app.config.get('STREAM_BATCH_SIZE', 1000)
+    json_provider = current_app.json
+
+    def generate():
+        yield '['
+        separator = ''
+        chunk = []
+        for row in query.yield_per(batch_size):
+            chunk.append(json_provider.dumps(serialize(row), separators=(',', ':')))
+            if len(chunk) >= batch_size:
+                yield separator + ','.join(chunk)
+                separator = ','
+                chunk = []
+        if chunk:
+            yield separator + ','.join(chunk)
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def stream_ndjson(query, serialize, batch_size=None):
+    """
+    Jak stream_json_array, ale w formacie NDJSON - jeden obiekt JSON na linię.
+    """
+    batch_size = batch_size or current_app.config.get('STREAM_BATCH_SIZE', 1000)
+    json_provider = current_app.json
+
+    def generate():
+        chunk = []
+        for row in query.yield_per(batch_size):
+            chunk.append(json_provider.dumps(serialize(row), separators=(',', ':')) + '\n')
+            if len(chunk) >= batch_size:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def stream_csv(query, columns, serialize, batch_size=None):
+    """
+    Odpowiedź strumieniowa CSV: nagłówek z nazwami columns, potem wiersze
+    zwrócone przez serialize (lista wartości w kolejności columns).
+    Wiersze czytane są z bazy partiami, tak jak w stream_json_array.
+    """
+    batch_size = batch_size or current_app.config.get('STREAM_BATCH_SIZE', 1000)
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for index, row in enumerate(query.yield_per(batch_size), start=1):
+            writer.writerow(serialize(row))
+            if index % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return Response(stream_with_context(generate()), mimetype='text/csv')
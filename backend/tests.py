@@ -2,25 +2,54 @@
 
 import pytest
 import os
+import csv
+import hashlib
+import io
+import json
+import sqlite3
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from base64 import b64encode
+import app as app_module
 from app import create_app
-from db_models import db, User
+from rate_limit import SlidingWindowLimiter
+from executors import native_thread_pool
+from thumbnails import ThumbnailPipeline
+from flask_jwt_extended import decode_token
+from werkzeug.security import generate_password_hash
+from db_models import (
+    db, User, Product, Order, OrderDailyRollup, Province, TransportType, TransportAssignment,
+    VehicleUnavailability, ReportJob,
+)
+from rollups import report_from_rollups
+from query_log import assert_max_queries, record_queries
+from fleet import pack_orders
+from bootstrap import init_db, bootstrap_admin
+from seed import generate_data
+from sqlalchemy import event, func, inspect, text, Date
+from sqlalchemy.exc import SQLAlchemyError
 
 @pytest.fixture
-def test_app():
+def test_app(tmp_path):
     """
-    Fixture tworząca instancję aplikacji Flask z in-memory SQLite
-    i tworząca tabele w bazie przed testami.
+    Fixture tworząca instancję aplikacji Flask z in-memory SQLite,
+    tabelami w bazie i kontem admina (jak `flask init-db` i `flask bootstrap-admin`).
     """
-    # Wskazujemy bazę w pamięci
+    # Wskazujemy bazę w pamięci, a obrazy w katalogu tymczasowym
     test_config = {
         'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
         'TESTING': True,
+        'IMAGE_STORE_PATH': str(tmp_path / 'images'),
     }
 
     # Tworzymy aplikację w trybie testowym i w kontekście
     app = create_app(test_config=test_config)
     with app.app_context():
-        db.create_all()
+        init_db()
+        bootstrap_admin()
         yield app
         # Po zakończeniu testów: usuwamy tabele (opcjonalnie)
         db.drop_all()
@@ -34,6 +63,54 @@ def client(test_app):
     return test_app.test_client()
 
 
+def test_sqlite_pragmas_and_database_url(tmp_path, monkeypatch):
+    """
+    Adres bazy z DATABASE_URL, a każde połączenie SQLite dostaje pragmy
+    WAL, synchronous=NORMAL i busy_timeout.
+    """
+    db_path = tmp_path / "shop.db"
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{db_path}")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "1800")
+    app = create_app(test_config={'TESTING': True, 'IMAGE_STORE_PATH': str(tmp_path / 'images')})
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_recycle'] == 1800
+    with app.app_context():
+        assert db.engine.url.database == str(db_path)
+        assert db.session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert db.session.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert db.session.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_app_factory_has_no_db_side_effects(tmp_path):
+    """
+    Fabryka aplikacji nie łączy się z bazą; tabele i konto admina
+    tworzą komendy init-db i bootstrap-admin.
+    """
+    db_path = tmp_path / "shop.db"
+    app = create_app(test_config={
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'IMAGE_STORE_PATH': str(tmp_path / 'images'),
+    })
+    assert not db_path.exists()
+
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=["init-db"]).exit_code == 0
+    result = runner.invoke(args=["bootstrap-admin", "--username", "szef", "--password", "tajne"])
+    assert result.exit_code == 0
+    assert "Utworzono" in result.output
+    assert "już istnieje" in runner.invoke(args=["bootstrap-admin", "--username", "szef"]).output
+
+    with app.app_context():
+        admin = User.query.filter_by(username="szef").one()
+        assert admin.is_admin
+        assert db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"
+        )).scalar() == 1
+        db.session.remove()
+        db.engine.dispose()
+
+
 def test_home(client):
     response = client.get('/')
     assert response.status_code == 200
@@ -123,6 +200,159 @@ def test_login_invalid_data(client):
     })
     assert response.status_code == 400
 
+def test_login_rehashes_outdated_password(client, test_app):
+    """
+    Hasło zapisane ze starszymi parametrami jest haszowane ponownie przy logowaniu.
+    """
+    user_login(client, "rolnik")
+    user = User.query.filter_by(username="rolnik").first()
+    user.password = generate_password_hash("password123", "pbkdf2:sha256:1000")
+    db.session.commit()
+
+    resp = client.post('/login', json={"email": "rolnik@example.com", "password": "password123"})
+    assert resp.status_code == 200
+    db.session.refresh(user)
+    assert user.password.startswith("scrypt:")
+    assert not test_app.extensions['password_hasher'].needs_rehash(user.password)
+    resp = client.post('/login', json={"email": "rolnik@example.com", "password": "password123"})
+    assert resp.status_code == 200
+
+
+def test_login_password_hasher_busy(client, test_app):
+    """
+    Przy zajętej puli haszowania logowanie dostaje 503 po queue_timeout
+    zamiast czekać bez końca.
+    """
+    user_login(client, "rolnik")
+    hasher = test_app.extensions['password_hasher']
+    hasher.queue_timeout = 0.01
+    for _ in range(hasher.max_workers):
+        hasher._slots.acquire()
+    try:
+        resp = client.post('/login', json={"email": "rolnik@example.com", "password": "password123"})
+    finally:
+        for _ in range(hasher.max_workers):
+            hasher._slots.release()
+    assert resp.status_code == 503
+    assert resp.headers['Retry-After'] == '1'
+
+
+def test_native_thread_pool_under_gevent():
+    """
+    Po monkey.patch_all() (GUNICORN_MODE=gevent) pule do pracy CPU używają
+    wątków systemowych gevent - haszowanie nie wstrzymuje innych greenletów.
+    """
+    pytest.importorskip("gevent")
+    script = (
+        "from gevent import monkey; monkey.patch_all()\n"
+        "import time, gevent\n"
+        "from werkzeug.security import generate_password_hash\n"
+        "from executors import native_thread_pool\n"
+        "pool = native_thread_pool(1, 'test')\n"
+        "print(type(pool).__module__)\n"
+        "ticks = []\n"
+        "def ticker():\n"
+        "    for _ in range(5):\n"
+        "        ticks.append(time.perf_counter()); gevent.sleep(0.005)\n"
+        "g = gevent.spawn(ticker); gevent.sleep(0)\n"
+        "pool.submit(generate_password_hash, 'x' * 8).result()\n"
+        "done = time.perf_counter()\n"
+        "g.join()\n"
+        "print(sum(t < done for t in ticks))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=60)
+    assert result.returncode == 0, result.stderr
+    module, ticks = result.stdout.split()
+    assert module == "gevent.threadpool"
+    # Greenlet licznika działał w trakcie haszowania
+    assert int(ticks) > 1
+
+    # Bez gevent zwykła pula wątków
+    pool = native_thread_pool(1, "test")
+    assert isinstance(pool, ThreadPoolExecutor)
+    pool.shutdown()
+
+
+def test_thumbnail_failures_under_gevent(tmp_path):
+    """
+    Pod gevent nieudane miniatury (logowane z ostrzeżeniem) nie zawieszają
+    wątków puli ani callbacków - każde zlecenie się kończy.
+    """
+    pytest.importorskip("gevent")
+    pytest.importorskip("PIL")
+    script = (
+        "from gevent import monkey; monkey.patch_all()\n"
+        "import logging, sys, gevent\n"
+        "from image_store import ImageStore\n"
+        "from thumbnails import ThumbnailPipeline\n"
+        "logging.basicConfig(stream=open(sys.argv[2], 'w'))\n"
+        "store = ImageStore(sys.argv[1])\n"
+        "pipeline = ThumbnailPipeline(store)\n"
+        "for i in range(50):\n"
+        "    pipeline.schedule(store.put(b'\\x89PNG\\r\\n\\x1a\\n' + bytes([i])))\n"
+        "with gevent.Timeout(20):\n"
+        "    while pipeline._pending:\n"
+        "        gevent.sleep(0.01)\n"
+        "print(len(pipeline._failed))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script, str(tmp_path / "images"), str(tmp_path / "log")],
+                            capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "50"
+    assert (tmp_path / "log").read_text().count("Nie udało się wygenerować miniatur") == 50
+
+
+def test_sliding_window_limiter():
+    """
+    Limiter przesuwanego okna: limit w oknie, wygasanie poprzedniego okna
+    i usuwanie nieaktywnych kluczy.
+    """
+    limiter = SlidingWindowLimiter(limit=3, window=10)
+    assert [limiter.hit("a", now=100.0) for _ in range(3)] == [0, 0, 0]
+    assert limiter.hit("a", now=101.0) == 13
+    assert limiter.hit("b", now=101.0) == 0
+    # Połowa poprzedniego okna wygasła: 3 * 0.5 = 1.5 -> jest miejsce na jedno żądanie
+    assert limiter.hit("a", now=115.0) == 0
+    assert limiter.hit("a", now=115.0) == 2
+    assert limiter.hit("a", now=117.0) == 0
+    assert len(limiter) == 2
+    limiter.hit("c", now=200.0)
+    assert len(limiter) == 1
+
+
+def test_login_rate_limited(client, test_app):
+    """
+    Zbyt wiele prób logowania na jedno konto kończy się 429 z Retry-After.
+    """
+    test_app.extensions['rate_limits']['login_email'] = SlidingWindowLimiter(limit=2, window=60)
+    user_login(client, "rolnik")
+    assert client.post('/login', json={"email": "rolnik@example.com", "password": "złe"}).status_code == 401
+    resp = client.post('/login', json={"email": "Rolnik@example.com", "password": "password123"})
+    assert resp.status_code == 429
+    assert int(resp.headers['Retry-After']) > 0
+    resp = client.post('/login', json={"email": "inny@example.com", "password": "password123"})
+    assert resp.status_code == 401
+
+
+def test_register_rate_limited_per_email(client, test_app):
+    """
+    Limit rejestracji na jeden adres email obowiązuje niezależnie od IP.
+    """
+    test_app.extensions['rate_limits']['register_email'] = SlidingWindowLimiter(limit=2, window=60)
+    user = {"username": "sadownik", "email": "sad@example.com", "password": "p"}
+    assert client.post('/register', json=user, environ_base={"REMOTE_ADDR": "10.0.0.1"}).status_code == 201
+    assert client.post('/register', json={**user, "username": "sadownik2"},
+                       environ_base={"REMOTE_ADDR": "10.0.0.2"}).status_code == 400
+    resp = client.post('/register', json={**user, "username": "sadownik3", "email": "SAD@example.com"},
+                       environ_base={"REMOTE_ADDR": "10.0.0.3"})
+    assert resp.status_code == 429
+    assert int(resp.headers['Retry-After']) > 0
+    assert client.post('/register', json={**user, "username": "inny", "email": "inny@example.com"},
+                       environ_base={"REMOTE_ADDR": "10.0.0.4"}).status_code == 201
+
+
 def test_admin_login_success(client):
     """
     Poprawne logowanie jako admin z danymi z .env:
@@ -150,6 +380,40 @@ def test_admin_login_invalid_data(client):
     assert response.status_code == 401
 
 
+def test_role_claims_and_user_cache(client, test_app):
+    """
+    Rola jest w claims tokenu, a użytkownik w cache - autoryzacja admina
+    nie pyta bazy przy każdym żądaniu. Odebranie roli działa od razu.
+    """
+    admin_token = admin_login(client)
+    user_token = user_login(client, "klient")
+    assert decode_token(admin_token)["is_admin"] is True
+    assert decode_token(user_token)["is_admin"] is False
+
+    statements = []
+    def count_user_queries(conn, cursor, statement, *args):
+        if "FROM users" in statement:
+            statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", count_user_queries)
+    try:
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        for _ in range(3):
+            assert client.get('/user', headers=headers).get_json()["is_admin"] is True
+        assert len(statements) == 1
+        resp = client.post('/product', json={"description": "Test", "price": 1.0},
+                           headers={"Authorization": f"Bearer {user_token}"})
+        assert resp.status_code == 403
+        assert len(statements) == 1
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count_user_queries)
+
+    admin = User.query.filter_by(is_admin=True).first()
+    admin.is_admin = False
+    db.session.commit()
+    resp = client.post('/product', json={"description": "Test", "price": 1.0}, headers=headers)
+    assert resp.status_code == 403
+
+
 def test_add_product_no_auth(client):
     """
     Próba dodania produktu bez tokena JWT.
@@ -248,8 +512,9 @@ def test_get_product(client):
     assert data["id"] == product_id
     assert data["description"] == "Ziemniaki jadalne"
     assert data["price"] == 5.5
-    # image może być None lub string base64
-    assert "image" in data
+    # Produkt bez obrazu -> brak URL i skrótu obrazu
+    assert data["image_url"] is None
+    assert data["image_hash"] is None
 
 
 def test_get_nonexistent_product(client):
@@ -261,6 +526,238 @@ def test_get_nonexistent_product(client):
     assert response.status_code == 404
 
 
+def admin_login(client):
+    admin_resp = client.post('/login', json={
+        "email": "admin@example.com",
+        "password": os.getenv('ADMIN_PASSWORD', 'secret')
+    })
+    assert admin_resp.status_code == 200
+    return admin_resp.get_json()["access_token"]
+
+
+def user_login(client, username):
+    client.post('/register', json={
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": "password123"
+    })
+    login_resp = client.post('/login', json={
+        "email": f"{username}@example.com",
+        "password": "password123"
+    })
+    assert login_resp.status_code == 200
+    return login_resp.get_json()["access_token"]
+
+
+# Minimalny nagłówek PNG wystarcza do rozpoznania typu obrazu
+PNG_BYTES = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 4
+
+
+def test_product_image_endpoint(client):
+    """
+    Obraz produktu trafia do magazynu obrazów, JSON zawiera tylko URL i skrót,
+    a /product/<id>/image zwraca surowe bajty z ETag, obsługą 304 i Range.
+    """
+    admin_token = admin_login(client)
+    add_resp = client.post('/product',
+                           json={
+                               "description": "Buraki",
+                               "price": 3.0,
+                               "image": b64encode(PNG_BYTES).decode('utf-8')
+                           },
+                           headers={"Authorization": f"Bearer {admin_token}"})
+    assert add_resp.status_code == 201
+    product_id = add_resp.get_json()["product_id"]
+
+    data = client.get(f'/product/{product_id}').get_json()
+    image_hash = hashlib.sha256(PNG_BYTES).hexdigest()
+    assert data["image_hash"] == image_hash
+    assert data["image_url"] == f"/product/{product_id}/image?v={image_hash}"
+
+    image_resp = client.get(data["image_url"])
+    assert image_resp.status_code == 200
+    assert image_resp.data == PNG_BYTES
+    assert image_resp.mimetype == 'image/png'
+    assert image_resp.headers["ETag"] == f'"{image_hash}"'
+    assert "immutable" in image_resp.headers["Cache-Control"]
+
+    not_modified = client.get(f'/product/{product_id}/image',
+                              headers={"If-None-Match": f'"{image_hash}"'})
+    assert not_modified.status_code == 304
+
+    partial = client.get(f'/product/{product_id}/image', headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.data == PNG_BYTES[:8]
+
+
+def test_product_image_removed_with_product(client, test_app):
+    """
+    Po usunięciu produktu nieużywany już obraz znika z magazynu.
+    """
+    admin_token = admin_login(client)
+    add_resp = client.post('/product',
+                           json={
+                               "description": "Kapusta",
+                               "price": 4.0,
+                               "image": b64encode(PNG_BYTES).decode('utf-8')
+                           },
+                           headers={"Authorization": f"Bearer {admin_token}"})
+    product_id = add_resp.get_json()["product_id"]
+    store = test_app.extensions['image_store']
+    image_hash = hashlib.sha256(PNG_BYTES).hexdigest()
+    assert store.exists(image_hash)
+    # Obraz użyty dawniej niż IMAGE_GC_GRACE temu
+    os.utime(store.path(image_hash), (0, 0))
+
+    client.delete(f'/product/{product_id}', headers={"Authorization": f"Bearer {admin_token}"})
+    assert not store.exists(image_hash)
+    assert client.get(f'/product/{product_id}/image').status_code == 404
+
+
+def test_delete_product_keeps_image_used_by_concurrent_upload(client, test_app):
+    """
+    Obraz zapisany przez równoległe żądanie (put przed jego commitem) nie jest
+    usuwany razem z ostatnim produktem, który go używał; nieużywane obrazy
+    sprząta potem `flask gc-images`.
+    """
+    admin_token = admin_login(client)
+    add_resp = client.post('/product',
+                           json={"description": "Kapusta", "price": 4.0,
+                                 "image": b64encode(PNG_BYTES).decode('utf-8')},
+                           headers={"Authorization": f"Bearer {admin_token}"})
+    product_id = add_resp.get_json()["product_id"]
+    store = test_app.extensions['image_store']
+    image_hash = hashlib.sha256(PNG_BYTES).hexdigest()
+    os.utime(store.path(image_hash), (0, 0))
+    # Inne żądanie zapisuje ten sam obraz, ale jeszcze nie zrobiło commita
+    assert store.put(PNG_BYTES) == image_hash
+
+    client.delete(f'/product/{product_id}', headers={"Authorization": f"Bearer {admin_token}"})
+    assert store.exists(image_hash)
+
+    result = test_app.test_cli_runner().invoke(args=['gc-images', '--grace', '0'])
+    assert result.exit_code == 0, result.output
+    assert "Usunięto nieużywane obrazy: 1" in result.output
+    assert not store.exists(image_hash)
+
+
+def test_add_product_rollback_removes_new_image(client, test_app, monkeypatch):
+    """
+    Gdy commit produktu się nie uda, obraz zapisany przez to żądanie znika
+    z magazynu; obraz, który już wcześniej tam był, zostaje.
+    """
+    admin_token = admin_login(client)
+    store = test_app.extensions['image_store']
+    old_bytes = PNG_BYTES + b'old'
+    old_hash = store.put(old_bytes)
+
+    def failing_commit():
+        db.session.flush()
+        raise SQLAlchemyError("commit nieudany")
+
+    monkeypatch.setattr(app_module, 'commit_catalog_change', failing_commit)
+    for image in (PNG_BYTES, old_bytes):
+        with pytest.raises(SQLAlchemyError):
+            client.post('/product',
+                        json={"description": "Kapusta", "price": 4.0,
+                              "image": b64encode(image).decode('utf-8')},
+                        headers={"Authorization": f"Bearer {admin_token}"})
+        # Koniec żądania (fixture trzyma jeden kontekst aplikacji na cały test)
+        db.session.remove()
+    assert not store.exists(hashlib.sha256(PNG_BYTES).hexdigest())
+    assert store.exists(old_hash)
+    assert Product.query.count() == 0
+
+
+def test_product_image_thumbnail(client, test_app):
+    """
+    Po dodaniu produktu miniatury generowane są w tle; ?size=thumb zwraca
+    pomniejszony wariant, a do tego czasu (lub gdy się nie da) - oryginał.
+    """
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (1024, 768), (200, 120, 40)).save(buffer, format="PNG")
+    original = buffer.getvalue()
+
+    admin_token = admin_login(client)
+    add_resp = client.post('/product',
+                           json={
+                               "description": "Dynia",
+                               "price": 7.0,
+                               "image": b64encode(original).decode('utf-8')
+                           },
+                           headers={"Authorization": f"Bearer {admin_token}"})
+    product_id = add_resp.get_json()["product_id"]
+    test_app.extensions['thumbnails'].wait(timeout=10)
+
+    thumb_resp = client.get(f'/product/{product_id}/image', query_string={"size": "thumb"})
+    assert thumb_resp.status_code == 200
+    assert thumb_resp.data != original
+    with Image.open(io.BytesIO(thumb_resp.data)) as thumb:
+        assert max(thumb.size) == 128
+
+    assert client.get(f'/product/{product_id}/image',
+                      query_string={"size": "huge"}).status_code == 400
+
+
+def test_product_image_thumbnail_fallback(client, test_app):
+    """
+    Obrazu, którego nie da się zdekodować, nie pomniejszamy - serwujemy oryginał.
+    """
+    admin_token = admin_login(client)
+    add_resp = client.post('/product',
+                           json={
+                               "description": "Rzepa",
+                               "price": 1.0,
+                               "image": b64encode(PNG_BYTES).decode('utf-8')
+                           },
+                           headers={"Authorization": f"Bearer {admin_token}"})
+    product_id = add_resp.get_json()["product_id"]
+    test_app.extensions['thumbnails'].wait(timeout=10)
+
+    image_hash = hashlib.sha256(PNG_BYTES).hexdigest()
+    resp = client.get(f'/product/{product_id}/image',
+                      query_string={"size": "thumb", "v": image_hash})
+    assert resp.status_code == 200
+    assert resp.data == PNG_BYTES
+    assert "immutable" not in resp.headers["Cache-Control"]
+
+
+def test_thumbnail_failures_are_bounded(test_app):
+    """
+    Nieudane obrazy nie są zlecane ponownie, ale pamiętamy ich najwyżej
+    max_failed (najdawniej użyty wypada jako pierwszy).
+    """
+    pytest.importorskip("PIL")
+    store = test_app.extensions['image_store']
+    pipeline = ThumbnailPipeline(store, max_failed=2)
+    digests = [store.put(PNG_BYTES + bytes([i])) for i in range(3)]
+
+    def generate(digest):
+        pipeline.schedule(digest)
+        # Nieudane obrazy zapisuje callback, który może działać jeszcze po wait()
+        for _ in range(1000):
+            if not pipeline._pending:
+                break
+            time.sleep(0.01)
+
+    for digest in digests[:2]:
+        generate(digest)
+    assert pipeline.schedule(digests[0]) is None
+
+    generate(digests[2])
+    assert list(pipeline._failed) == [digests[0], digests[2]]
+    # Wypadł z pamięci nieudanych - można spróbować ponownie
+    assert pipeline.schedule(digests[1]) is not None
+    pipeline.wait(timeout=10)
+
+
+def test_add_product_invalid_image(client):
+    admin_token = admin_login(client)
+    response = client.post('/product',
+                           json={"description": "Seler", "price": 2.0, "image": "nie-base64!"},
+                           headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 400
 
 
 def test_get_all_products(client):
@@ -309,6 +806,286 @@ def test_get_all_products(client):
     assert 9.99 in prices
 
 
+def test_get_products_keyset_pagination(client):
+    """
+    Stronicowanie kluczem: limit/after, X-Next-Cursor i X-Total-Count.
+    """
+    admin_token = admin_login(client)
+    for i in range(5):
+        resp = client.post('/product',
+                           json={"description": f"Produkt {i}", "price": float(i)},
+                           headers={"Authorization": f"Bearer {admin_token}"})
+        assert resp.status_code == 201
+
+    first_page = client.get('/products', query_string={"limit": 2})
+    assert first_page.status_code == 200
+    assert first_page.headers["X-Total-Count"] == "5"
+    assert [p["description"] for p in first_page.get_json()] == ["Produkt 0", "Produkt 1"]
+
+    seen = [p["id"] for p in first_page.get_json()]
+    cursor = first_page.headers["X-Next-Cursor"]
+    while cursor:
+        page = client.get('/products', query_string={"limit": 2, "after": cursor})
+        assert "X-Total-Count" not in page.headers
+        seen.extend(p["id"] for p in page.get_json())
+        cursor = page.headers.get("X-Next-Cursor")
+    assert len(seen) == 5
+    assert seen == sorted(seen)
+
+
+def test_get_lists_without_page_params_are_complete(client, test_app):
+    """
+    Bez limit i after /products i /my_orders zwracają całą listę (klienci
+    web i mobile nie stronicują), z after - stronę domyślnego rozmiaru.
+    """
+    test_app.config['PRODUCTS_PAGE_LIMIT'] = 2
+    test_app.config['ORDERS_PAGE_LIMIT'] = 2
+    admin_headers = {"Authorization": f"Bearer {admin_login(client)}"}
+    product_ids = [
+        client.post('/product', json={"description": f"Produkt {i}", "price": 1.0},
+                    headers=admin_headers).get_json()["product_id"]
+        for i in range(5)
+    ]
+    resp = client.get('/products')
+    assert [p["id"] for p in resp.get_json()] == product_ids
+    assert "X-Next-Cursor" not in resp.headers
+    assert resp.headers["X-Total-Count"] == "5"
+    page = client.get('/products', query_string={"after": product_ids[0]})
+    assert [p["id"] for p in page.get_json()] == product_ids[1:3]
+    assert page.headers["X-Next-Cursor"] == str(product_ids[2])
+
+    user_headers = {"Authorization": f"Bearer {user_login(client, 'rolnik')}"}
+    order_ids = client.post('/orders/bulk', headers=user_headers, json={"orders": [{
+        "product_id": product_id, "delivery_date": "2025-05-15", "address": "ul. Polna 1",
+        "transport_type": "PICKUP", "province": "opolskie"
+    } for product_id in product_ids]}).get_json()["order_ids"]
+    resp = client.get('/my_orders', headers=user_headers)
+    assert [o["order_id"] for o in resp.get_json()] == order_ids
+    assert "X-Next-Cursor" not in resp.headers
+    page = client.get('/my_orders', headers=user_headers, query_string={"after": order_ids[0]})
+    assert [o["order_id"] for o in page.get_json()] == order_ids[1:3]
+
+
+def test_get_products_fields_projection(client):
+    admin_token = admin_login(client)
+    client.post('/product',
+                json={"description": "Cebula", "price": 2.5},
+                headers={"Authorization": f"Bearer {admin_token}"})
+
+    resp = client.get('/products', query_string={"fields": "id,price"})
+    assert resp.status_code == 200
+    assert resp.get_json() == [{"id": 1, "price": 2.5}]
+
+
+def test_get_products_invalid_params(client):
+    assert client.get('/products', query_string={"fields": "id,password"}).status_code == 400
+    assert client.get('/products', query_string={"limit": 0}).status_code == 400
+    assert client.get('/products', query_string={"after": "abc"}).status_code == 400
+
+
+def test_get_products_stream(client):
+    """
+    Tryb strumieniowy zwraca cały katalog jako jedną tablicę JSON,
+    niezależnie od domyślnego rozmiaru strony.
+    """
+    admin_token = admin_login(client)
+    for i in range(3):
+        client.post('/product',
+                    json={"description": f"Produkt {i}", "price": 1.0 + i},
+                    headers={"Authorization": f"Bearer {admin_token}"})
+
+    resp = client.get('/products', query_string={"stream": 1, "fields": "id,description"})
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.get_json() == [
+        {"id": 1, "description": "Produkt 0"},
+        {"id": 2, "description": "Produkt 1"},
+        {"id": 3, "description": "Produkt 2"},
+    ]
+
+    resp = client.get('/products', query_string={"stream": 1, "after": 1, "limit": 1})
+    assert [p["id"] for p in resp.get_json()] == [2]
+
+
+def test_search_products(client):
+    """
+    Wyszukiwanie pełnotekstowe: prefiksy słów, brak znaczenia wielkości liter
+    i znaków diakrytycznych, filtr ceny oraz synchronizacja z edycją/usunięciem.
+    """
+    admin_token = admin_login(client)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    products = [
+        {"description": "Ziemniaki jadalne", "price": 5.5},
+        {"description": "Ziemniaki sadzeniaki", "price": 12.0},
+        {"description": "Marchew jadalna", "price": 9.99},
+        {"description": "Nawóz azotowy", "price": 80.0},
+    ]
+    ids = [client.post('/product', json=p, headers=headers).get_json()["product_id"] for p in products]
+
+    resp = client.get('/products/search', query_string={"q": "ziem"})
+    assert resp.status_code == 200
+    assert sorted(p["id"] for p in resp.get_json()) == ids[:2]
+
+    resp = client.get('/products/search', query_string={"q": "JADAL"})
+    assert sorted(p["description"] for p in resp.get_json()) == ["Marchew jadalna", "Ziemniaki jadalne"]
+
+    resp = client.get('/products/search', query_string={"q": "nawoz"})
+    assert [p["id"] for p in resp.get_json()] == [ids[3]]
+
+    resp = client.get('/products/search', query_string={"q": "ziemniaki", "max_price": 10})
+    assert [p["id"] for p in resp.get_json()] == [ids[0]]
+
+    resp = client.get('/products/search', query_string={"q": "ziemniaki", "limit": 1})
+    assert len(resp.get_json()) == 1
+    assert resp.headers["X-Next-Offset"] == "1"
+
+    client.put(f'/product/{ids[3]}', json={"description": "Nawóz fosforowy"}, headers=headers)
+    client.delete(f'/product/{ids[0]}', headers=headers)
+    assert client.get('/products/search', query_string={"q": "azot"}).get_json() == []
+    assert [p["id"] for p in client.get('/products/search',
+                                        query_string={"q": "fosfor"}).get_json()] == [ids[3]]
+    assert [p["id"] for p in client.get('/products/search',
+                                        query_string={"q": "ziemniaki"}).get_json()] == [ids[1]]
+
+
+def test_search_products_invalid_params(client):
+    assert client.get('/products/search').status_code == 400
+    assert client.get('/products/search', query_string={"q": "a", "min_price": "x"}).status_code == 400
+    for value in ("nan", "inf", "-Infinity"):
+        assert client.get('/products/search', query_string={"q": "a", "min_price": value}).status_code == 400
+        assert client.get('/products/search', query_string={"q": "a", "max_price": value}).status_code == 400
+    assert client.get('/products/search', query_string={"q": "a", "limit": 0}).status_code == 400
+    # Znaki specjalne składni FTS5 nie powodują błędu
+    assert client.get('/products/search', query_string={"q": 'a" OR *'}).status_code == 200
+
+
+def test_bulk_import_csv(client, test_app):
+    """
+    Import CSV: poprawne wiersze są dodawane partiami, błędne trafiają do raportu.
+    """
+    test_app.config['BULK_IMPORT_BATCH_SIZE'] = 2
+    admin_token = admin_login(client)
+    body = (
+        "description,price\n"
+        "Ziemniaki,5.5\n"
+        ",3.0\n"
+        "Marchew,abc\n"
+        "Cebula,2.25\n"
+        "Buraki,4\n"
+        "Rzepa,nan\n"
+    )
+    resp = client.post('/products/bulk', data=body.encode('utf-8'),
+                       content_type='text/csv',
+                       headers={"Authorization": f"Bearer {admin_token}"})
+    assert resp.status_code == 201
+    report = resp.get_json()
+    assert report["created"] == 3
+    assert [e["row"] for e in report["errors"]] == [2, 3, 6]
+
+    products = client.get('/products').get_json()
+    assert [p["description"] for p in products] == ["Ziemniaki", "Cebula", "Buraki"]
+    assert [p["id"] for p in products] == report["product_ids"]
+    # Indeks wyszukiwania obejmuje też produkty z importu
+    assert len(client.get('/products/search', query_string={"q": "cebula"}).get_json()) == 1
+
+
+def test_bulk_import_ndjson_images(client):
+    """
+    Import NDJSON z obrazem inline (base64) i referencją do istniejącego obrazu.
+    """
+    admin_token = admin_login(client)
+    image_hash = hashlib.sha256(PNG_BYTES).hexdigest()
+    lines = [
+        {"description": "Jabłka", "price": 3.0, "image": b64encode(PNG_BYTES).decode('utf-8')},
+        {"description": "Gruszki", "price": 4.0, "image_hash": image_hash},
+        {"description": "Śliwki", "price": 5.0, "image_hash": "0" * 64},
+        {"description": "Wiśnie", "price": 5.0, "image_hash": 123},
+        {"description": "Morele", "price": 5.0, "image": 123},
+    ]
+    # json.loads przepuszcza NaN i Infinity, których nie ma w standardzie JSON
+    body = "\n".join(json.dumps(line) for line in lines) + "\nnie-json\n" + \
+        '{"description": "Brzoskwinie", "price": NaN}\n{"description": "Czereśnie", "price": Infinity}\n'
+
+    resp = client.post('/products/bulk', data=body.encode('utf-8'),
+                       content_type='application/x-ndjson',
+                       headers={"Authorization": f"Bearer {admin_token}"})
+    assert resp.status_code == 201
+    report = resp.get_json()
+    assert report["created"] == 2
+    assert [e["row"] for e in report["errors"]] == [3, 4, 5, 6, 7, 8]
+
+    products = client.get('/products').get_json()
+    assert [p["image_hash"] for p in products] == [image_hash, image_hash]
+
+
+def test_bulk_import_unreadable_file_keeps_committed_batches(client, test_app):
+    """
+    Plik, którego nie da się dalej dekodować, przerywa import, ale odpowiedź
+    zawiera raport z produktami zapisanymi we wcześniejszych partiach.
+    """
+    test_app.config['BULK_IMPORT_BATCH_SIZE'] = 100
+    admin_token = admin_login(client)
+    # Dłuższy plik, żeby błąd kodowania pojawił się dopiero w kolejnym bloku odczytu
+    body = "description,price\n" + "".join(f"Produkt {i:05d},1.0\n" for i in range(1000))
+    resp = client.post('/products/bulk', data=body.encode('utf-8') + b"Zepsuty \xff\xfe,2.0\n",
+                       content_type='text/csv',
+                       headers={"Authorization": f"Bearer {admin_token}"})
+    assert resp.status_code == 400
+    report = resp.get_json()
+    assert report["aborted"] is True
+    assert report["created"] > 0
+    assert report["errors"][-1]["msg"] == "Niepoprawny plik - import przerwany"
+    products = client.get('/products', query_string={"limit": 1000}).get_json()
+    assert [p["id"] for p in products] == report["product_ids"]
+
+
+def test_bulk_import_not_allowed(client):
+    admin_token = admin_login(client)
+    resp = client.post('/products/bulk', data=b'{}', content_type='application/json',
+                       headers={"Authorization": f"Bearer {admin_token}"})
+    assert resp.status_code == 415
+
+    client.post('/register', json={"username": "u", "email": "u@example.com", "password": "p"})
+    user_token = client.post('/login', json={"email": "u@example.com", "password": "p"}).get_json()["access_token"]
+    resp = client.post('/products/bulk', data=b'description,price\n', content_type='text/csv',
+                       headers={"Authorization": f"Bearer {user_token}"})
+    assert resp.status_code == 403
+
+
+def test_catalog_cache_conditional_get(client, test_app):
+    """
+    Odczyty katalogu są serwowane z cache (bez zapytań do bazy), obsługują
+    If-None-Match -> 304, a zmiana produktu unieważnia cache.
+    """
+    admin_token = admin_login(client)
+    add_resp = client.post('/product',
+                           json={"description": "Groch", "price": 3.5},
+                           headers={"Authorization": f"Bearer {admin_token}"})
+    product_id = add_resp.get_json()["product_id"]
+    test_app.extensions['catalog_cache'].version_ttl = 60
+
+    first = client.get(f'/product/{product_id}')
+    etag = first.headers["ETag"]
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        second = client.get(f'/product/{product_id}')
+        not_modified = client.get(f'/product/{product_id}', headers={"If-None-Match": etag})
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    assert statements == []
+    assert second.get_json() == first.get_json()
+    assert not_modified.status_code == 304
+
+    client.put(f'/product/{product_id}',
+               json={"price": 4.0},
+               headers={"Authorization": f"Bearer {admin_token}"})
+    updated = client.get(f'/product/{product_id}', headers={"If-None-Match": etag})
+    assert updated.status_code == 200
+    assert updated.get_json()["price"] == 4.0
+    assert updated.headers["ETag"] != etag
 
 
 def test_create_order_success(client):
@@ -366,6 +1143,27 @@ def test_create_order_success(client):
     assert "order_id" in order_data
 
 
+def test_create_order_product_id_as_string(client):
+    """
+    Klient Android wysyła pola zamówienia jako napisy - "product_id": "<id>"
+    jest akceptowane w /order i /orders/bulk.
+    """
+    admin_headers = {"Authorization": f"Bearer {admin_login(client)}"}
+    product_id = client.post('/product', json={"description": "Gryka", "price": 8.0},
+                             headers=admin_headers).get_json()["product_id"]
+    headers = {"Authorization": f"Bearer {user_login(client, 'android')}"}
+    order = {"product_id": str(product_id), "delivery_date": "2025-05-15", "address": "ul. Polna 1",
+             "transport_type": "PICKUP", "province": "opolskie"}
+
+    resp = client.post('/order', json=order, headers=headers)
+    assert resp.status_code == 201
+    order_data = client.get(f'/order/{resp.get_json()["order_id"]}', headers=headers).get_json()
+    assert order_data["product_id"] == product_id
+    resp = client.post('/orders/bulk', json={"orders": [order]}, headers=headers)
+    assert resp.status_code == 201
+    assert client.post('/order', json={**order, "product_id": "abc"}, headers=headers).status_code == 404
+
+
 def test_create_order_no_jwt(client):
     """
     Próba tworzenia zamówienia bez tokena JWT -> 401 (Unauthorized),
@@ -455,6 +1253,49 @@ def test_create_order_invalid_transport(client):
     data = order_resp.get_json()
     assert "Niekompletne dane zamówienia" in data.get("msg", "")
 
+def test_create_orders_bulk(client):
+    """
+    Masowe tworzenie zamówień: wszystkie pozycje w jednej transakcji,
+    a przy błędnych pozycjach nic nie jest zapisywane.
+    """
+    admin_token = admin_login(client)
+    product_ids = [
+        client.post('/product', json={"description": d, "price": 10.0},
+                    headers={"Authorization": f"Bearer {admin_token}"}).get_json()["product_id"]
+        for d in ("Ziemniaki", "Marchew")
+    ]
+    user_token = user_login(client, "hurtownik")
+    headers = {"Authorization": f"Bearer {user_token}"}
+    order = {
+        "delivery_date": "2025-05-20",
+        "address": "ul. Rolna 10",
+        "transport_type": "TRUCK",
+        "province": "mazowieckie"
+    }
+
+    bad_resp = client.post('/orders/bulk', json={"orders": [
+        {**order, "product_id": product_ids[0]},
+        {**order, "product_id": 999999},
+        {**order, "product_id": product_ids[1], "province": "bawaria"},
+        {"product_id": product_ids[1]},
+    ]}, headers=headers)
+    assert bad_resp.status_code == 400
+    assert [e["index"] for e in bad_resp.get_json()["errors"]] == [1, 2, 3]
+    assert client.get('/my_orders', headers=headers).get_json() == []
+
+    items = [{**order, "product_id": product_ids[i % 2]} for i in range(50)]
+    resp = client.post('/orders/bulk', json={"orders": items}, headers=headers)
+    assert resp.status_code == 201
+    order_ids = resp.get_json()["order_ids"]
+    assert len(order_ids) == 50
+
+    my_orders = client.get('/my_orders', headers=headers).get_json()
+    assert [o["order_id"] for o in my_orders] == order_ids
+    assert [o["product_id"] for o in my_orders] == [item["product_id"] for item in items]
+
+    assert client.post('/orders/bulk', json={"orders": []}, headers=headers).status_code == 400
+
+
 def test_edit_product_success(client):
     """
     Scenariusz:
@@ -498,7 +1339,7 @@ def test_edit_product_success(client):
     product_data = get_resp.get_json()
     assert product_data["description"] == "Ziemniaki ekologiczne"
     assert product_data["price"] == 12.5
-    assert product_data["image"] is None  # Obraz został usunięty
+    assert product_data["image_url"] is None  # Obraz został usunięty
 
 def test_edit_product_no_auth(client):
     """
@@ -623,6 +1464,462 @@ def test_generate_report_success(client):
     }
     assert report_data["orders_per_province"] == expected_provinces
 
+def test_generate_report_rollups(client, test_app):
+    """
+    Raport czyta dzienne agregaty aktualizowane przy tworzeniu zamówień
+    (pojedynczych i masowych); komenda rebuild-rollups odtwarza je z tabeli orders.
+    """
+    admin_token = admin_login(client)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    product_id = client.post('/product', json={"description": "Siano", "price": 20.0},
+                             headers=headers).get_json()["product_id"]
+    user_token = user_login(client, "hodowca")
+    order = {
+        "product_id": product_id,
+        "delivery_date": "2025-03-10",
+        "address": "ul. Łąkowa 3",
+        "transport_type": "TRUCK",
+        "province": "podkarpackie"
+    }
+    client.post('/order', json=order, headers={"Authorization": f"Bearer {user_token}"})
+    client.post('/orders/bulk', json={"orders": [order, {**order, "transport_type": "PICKUP"}]},
+                headers={"Authorization": f"Bearer {user_token}"})
+
+    def report():
+        return client.get('/admin/report', headers=headers, query_string={
+            "start_date": "2025-03-01", "end_date": "2025-03-31"
+        }).get_json()
+
+    expected = {"total_orders": 3, "total_sum": 60.0, "orders_per_province": {"podkarpackie": 3}}
+    assert report() == expected
+    assert db.session.query(OrderDailyRollup).count() == 2
+
+    db.session.query(OrderDailyRollup).delete()
+    db.session.commit()
+    assert report()["total_orders"] == 0
+
+    result = test_app.test_cli_runner().invoke(args=["rebuild-rollups"])
+    assert result.exit_code == 0
+    assert report() == expected
+
+
+def test_generate_report_cube(client):
+    """
+    Raport wielowymiarowy: dowolna kombinacja wymiarów, sumy zgodne
+    z wierszami i z raportem podstawowym.
+    """
+    admin_token = admin_login(client)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    product_ids = [
+        client.post('/product', json={"description": d, "price": p},
+                    headers=headers).get_json()["product_id"]
+        for d, p in (("Jabłka", 10.0), ("Gruszki", 25.0))
+    ]
+    user_token = user_login(client, "sadownik")
+    order = {"address": "ul. Sadowa 1", "transport_type": "TRUCK", "province": "lubelskie"}
+    client.post('/orders/bulk', json={"orders": [
+        {**order, "product_id": product_ids[0], "delivery_date": "2025-04-10"},
+        {**order, "product_id": product_ids[0], "delivery_date": "2025-05-02"},
+        {**order, "product_id": product_ids[1], "delivery_date": "2025-05-03", "province": "opolskie"},
+        {**order, "product_id": product_ids[1], "delivery_date": "2025-05-04", "transport_type": "PICKUP"},
+        {**order, "product_id": product_ids[1], "delivery_date": "2025-07-01"},
+    ]}, headers={"Authorization": f"Bearer {user_token}"})
+
+    def cube(group_by):
+        resp = client.get('/admin/report/cube', headers=headers, query_string={
+            "start_date": "2025-04-01", "end_date": "2025-06-30", "group_by": group_by
+        })
+        assert resp.status_code == 200
+        return resp.get_json()
+
+    data = cube("month,province")
+    assert data["group_by"] == ["province", "month"]
+    assert data["rows"] == [
+        {"province": "lubelskie", "month": "2025-04", "order_count": 1, "order_value": 10.0},
+        {"province": "lubelskie", "month": "2025-05", "order_count": 2, "order_value": 35.0},
+        {"province": "opolskie", "month": "2025-05", "order_count": 1, "order_value": 25.0},
+    ]
+    assert data["totals"] == {"order_count": 4, "order_value": 70.0}
+
+    data = cube("product,transport_type")
+    assert [(r["product_description"], r["transport_type"], r["order_count"]) for r in data["rows"]] == [
+        ("Gruszki", "PICKUP", 1), ("Jabłka", "TRUCK", 2), ("Gruszki", "TRUCK", 1)
+    ]
+    assert data["totals"] == {"order_count": 4, "order_value": 70.0}
+
+    assert cube("")["rows"] == [{"order_count": 4, "order_value": 70.0}]
+
+    resp = client.get('/admin/report/cube', headers=headers, query_string={
+        "start_date": "2025-04-01", "end_date": "2025-06-30", "group_by": "province,customer"
+    })
+    assert resp.status_code == 400
+    resp = client.get('/admin/report/cube', headers=headers, query_string={"start_date": "2025-04-01"})
+    assert resp.status_code == 400
+
+
+def test_report_jobs(client, test_app):
+    """
+    Raporty w tle: wynik jak z endpointu synchronicznego, zakresy z przeszłości
+    zapamiętywane, a zamówienie "wstecz" unieważnia zapamiętany wynik.
+    """
+    admin_token = admin_login(client)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    product_id = client.post('/product', json={"description": "Owies", "price": 15.0},
+                             headers=headers).get_json()["product_id"]
+    user_headers = {"Authorization": f"Bearer {user_login(client, 'stajnia')}"}
+    order = {
+        "product_id": product_id,
+        "delivery_date": "2024-02-10",
+        "address": "ul. Końska 2",
+        "transport_type": "TRUCK",
+        "province": "pomorskie"
+    }
+    client.post('/order', json=order, headers=user_headers)
+    params = {"start_date": "2024-01-01", "end_date": "2024-12-31"}
+
+    def run_job(body):
+        resp = client.post('/admin/report/jobs', json=body, headers=headers)
+        assert resp.status_code == 202
+        test_app.extensions['report_jobs'].wait()
+        db.session.expire_all()
+        status = client.get(resp.headers['Location'], headers=headers)
+        assert status.status_code == 200
+        return resp.get_json(), status.get_json()
+
+    submitted, job = run_job(params)
+    assert submitted["cached"] is False
+    assert job["status"] == "done"
+    assert job["result"] == client.get('/admin/report', query_string=params, headers=headers).get_json()
+    assert job["result"]["total_orders"] == 1
+
+    submitted_again, _ = run_job(params)
+    assert submitted_again == {"job_id": submitted["job_id"], "status": "done", "cached": True}
+
+    client.post('/order', json={**order, "delivery_date": "2024-06-01"}, headers=user_headers)
+    submitted, job = run_job(params)
+    assert submitted["cached"] is False
+    assert job["result"]["total_orders"] == 2
+
+    _, cube = run_job({**params, "group_by": ["province"]})
+    assert cube["result"]["rows"] == [{"province": "pomorskie", "order_count": 2, "order_value": 30.0}]
+
+    resp = client.post('/admin/report/jobs', json={"start_date": "2024-01-01"}, headers=headers)
+    assert resp.status_code == 400
+    assert client.get('/admin/report/jobs/nieistnieje', headers=headers).status_code == 404
+    assert client.get('/admin/report/jobs/nieistnieje', headers=user_headers).status_code == 403
+
+
+def test_report_jobs_stale_job_not_reused(client, test_app):
+    """
+    Zadanie "w toku" starsze niż REPORT_JOB_STALE_AFTER (np. po restarcie
+    workera) jest oznaczane jako nieudane i nie blokuje ponownego liczenia.
+    """
+    headers = {"Authorization": f"Bearer {admin_login(client)}"}
+    params = {"start_date": "2024-01-01", "end_date": "2024-12-31"}
+    jobs = test_app.extensions['report_jobs']
+
+    submitted = client.post('/admin/report/jobs', json=params, headers=headers).get_json()
+    jobs.wait()
+    # Symulujemy zadanie porzucone w trakcie liczenia 10 minut temu
+    job = db.session.get(ReportJob, submitted["job_id"])
+    job.status, job.created_at = 'running', job.created_at - timedelta(minutes=10)
+    db.session.commit()
+    resubmitted = client.post('/admin/report/jobs', json=params, headers=headers).get_json()
+    assert resubmitted == {**submitted, "status": "running", "cached": True}
+
+    jobs.stale_after = 5 * 60
+    resubmitted = client.post('/admin/report/jobs', json=params, headers=headers).get_json()
+    jobs.wait()
+    assert resubmitted["cached"] is False
+    db.session.expire_all()
+    stale = client.get(f'/admin/report/jobs/{submitted["job_id"]}', headers=headers).get_json()
+    assert (stale["status"], stale["error"]) == ("failed", "Timeout")
+    fresh = client.get(f'/admin/report/jobs/{resubmitted["job_id"]}', headers=headers).get_json()
+    assert fresh["status"] == "done"
+
+
+def test_export_orders(client, test_app):
+    """
+    Eksport zamówień z okresu w CSV i NDJSON, strumieniowo i w partiach.
+    """
+    test_app.config['STREAM_BATCH_SIZE'] = 2
+    admin_token = admin_login(client)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    product_id = client.post('/product', json={"description": "Miód, lipowy", "price": 30.0},
+                             headers=headers).get_json()["product_id"]
+    user_headers = {"Authorization": f"Bearer {user_login(client, 'pszczelarz')}"}
+    order = {"product_id": product_id, "address": "ul. Ulowa 7",
+             "transport_type": "PICKUP", "province": "warmińsko-mazurskie"}
+    dates = ["2025-02-03", "2025-01-15", "2025-01-20", "2025-03-01", "2024-12-31"]
+    client.post('/orders/bulk', json={"orders": [{**order, "delivery_date": d} for d in dates]},
+                headers=user_headers)
+    params = {"start_date": "2025-01-01", "end_date": "2025-02-28"}
+
+    resp = client.get('/admin/orders/export', query_string=params, headers=headers)
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.mimetype == 'text/csv'
+    assert 'orders_2025-01-01_2025-02-28.csv' in resp.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [r["delivery_date"] for r in rows] == ["2025-01-15", "2025-01-20", "2025-02-03"]
+    assert rows[0]["product_description"] == "Miód, lipowy"
+    assert rows[0]["product_price"] == "30.0"
+    assert rows[0]["province"] == "warmińsko-mazurskie"
+
+    resp = client.get('/admin/orders/export', query_string={**params, "format": "ndjson"}, headers=headers)
+    assert resp.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [line["order_id"] for line in lines] == [int(r["order_id"]) for r in rows]
+    assert lines[0]["product_price"] == 30.0
+
+    assert client.get('/admin/orders/export', query_string={**params, "format": "xml"},
+                      headers=headers).status_code == 400
+    assert client.get('/admin/orders/export', query_string=params,
+                      headers=user_headers).status_code == 403
+
+
+def test_seed_data_is_deterministic(tmp_path):
+    """
+    Generator danych: zadane liczności, obrazy, przeliczone agregaty
+    i te same dane dla tego samego ziarna.
+    """
+    def seeded_orders(name):
+        app = create_app(test_config={
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / name}.db',
+            'IMAGE_STORE_PATH': str(tmp_path / name / 'images'),
+        })
+        result = app.test_cli_runner().invoke(args=[
+            "seed-data", "--users", "5", "--products", "20", "--orders", "500",
+            "--start-date", "2024-03-01", "--days", "60", "--images", "3", "--image-size", "8",
+            "--seed", "7", "--batch-size", "128"
+        ])
+        assert result.exit_code == 0, result.output
+        with app.app_context():
+            assert db.session.query(func.sum(OrderDailyRollup.order_count)).scalar() == 500
+            assert db.session.query(Product.image_hash).distinct().count() == 3
+            orders = db.session.query(
+                Order.user_id, Order.product_id, Order.delivery_date, Order.province, Order.transport_type
+            ).order_by(Order.id).all()
+            db.session.remove()
+            db.engine.dispose()
+        return orders
+
+    orders = seeded_orders("a")
+    assert len(orders) == 500
+    assert min(o.delivery_date for o in orders) >= date(2024, 3, 1)
+    assert max(o.delivery_date for o in orders) < date(2024, 4, 30)
+    assert seeded_orders("b") == orders
+
+
+def test_seed_data_keeps_caches_consistent(client, test_app):
+    """
+    Generator zapisuje dane jak zwykłe endpointy: nowe produkty są widoczne
+    mimo cache katalogu, agregaty są uzupełniane tylko o nowe zamówienia,
+    a zapamiętane raporty obejmujące ich daty są unieważniane.
+    """
+    headers = {"Authorization": f"Bearer {admin_login(client)}"}
+    assert client.get('/products').get_json() == []
+    params = {"start_date": "2024-03-01", "end_date": "2024-03-31"}
+    submitted = client.post('/admin/report/jobs', json=params, headers=headers).get_json()
+    test_app.extensions['report_jobs'].wait()
+    assert submitted["cached"] is False
+
+    # Konto zarejestrowane ręcznie pod nazwą, którą generator nadałby jako pierwszą
+    user_login(client, "user3")
+    generate_data(users=3, products=4, orders=50, start_date=date(2024, 3, 1), days=31,
+                  seed=1, log=lambda message: None)
+    assert User.query.filter(User.username.like('user%')).count() == 4
+    assert User.query.filter_by(username="user6").one().email == "user6@example.com"
+
+    assert len(client.get('/products').get_json()) == 4
+    resubmitted = client.post('/admin/report/jobs', json=params, headers=headers).get_json()
+    test_app.extensions['report_jobs'].wait()
+    assert resubmitted["cached"] is False
+    db.session.expire_all()
+    report = client.get(f'/admin/report/jobs/{resubmitted["job_id"]}', headers=headers).get_json()["result"]
+    assert report["total_orders"] == 50
+    assert report["total_sum"] == pytest.approx(
+        db.session.query(func.sum(Order.value)).scalar())
+
+
+def test_order_queries_use_indexes(test_app):
+    """
+    EXPLAIN QUERY PLAN: zakres dat i lista zamówień użytkownika korzystają
+    z indeksów zamiast pełnego skanu tabeli orders.
+    """
+    def plan(query):
+        sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+        return " ".join(row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+    date_range = db.session.query(Order.province, func.count(Order.id)).filter(
+        Order.delivery_date.between(date(2025, 1, 1), date(2025, 3, 31))
+    ).group_by(Order.province)
+    assert "USING COVERING INDEX ix_orders_delivery_date_province" in plan(date_range)
+
+    user_orders = db.session.query(Order).filter(Order.user_id == 1, Order.id > 100).order_by(Order.id)
+    assert "USING INDEX ix_orders_user_id_id" in plan(user_orders)
+
+
+def test_order_value_uses_price_at_order_time(client, test_app):
+    """
+    Wartość zamówienia w raporcie, kostce i eksporcie to cena z chwili
+    złożenia zamówienia - zmiana ceny ani rebuild-rollups jej nie zmieniają.
+    """
+    headers = {"Authorization": f"Bearer {admin_login(client)}"}
+    product_id = client.post('/product', json={"description": "Len", "price": 10.0},
+                             headers=headers).get_json()["product_id"]
+    user_headers = {"Authorization": f"Bearer {user_login(client, 'tkacz')}"}
+    client.post('/order', headers=user_headers, json={
+        "product_id": product_id, "delivery_date": "2025-04-02", "address": "ul. Lniana 1",
+        "transport_type": "TRUCK", "province": "opolskie"
+    })
+    client.put(f'/product/{product_id}', json={"price": 99.0}, headers=headers)
+    params = {"start_date": "2025-04-01", "end_date": "2025-04-30"}
+
+    def values():
+        report = client.get('/admin/report', query_string=params, headers=headers).get_json()
+        by_province = client.get('/admin/report/cube', headers=headers,
+                                 query_string={**params, "group_by": "province"}).get_json()
+        by_product = client.get('/admin/report/cube', headers=headers,
+                                query_string={**params, "group_by": "product"}).get_json()
+        export = client.get('/admin/orders/export', headers=headers,
+                            query_string={**params, "format": "ndjson"}).get_data(as_text=True)
+        return (report["total_sum"], by_province["totals"]["order_value"],
+                by_product["totals"]["order_value"], json.loads(export)["product_price"])
+
+    assert values() == (10.0, 10.0, 10.0, 10.0)
+    assert test_app.test_cli_runner().invoke(args=["rebuild-rollups"]).exit_code == 0
+    assert values() == (10.0, 10.0, 10.0, 10.0)
+
+
+def test_order_value_includes_quantity(client, test_app):
+    """
+    Wartość zamówienia to cena z chwili złożenia razy ilość - w szczegółach
+    zamówienia, raporcie, kostkach, eksporcie i po rebuild-rollups.
+    """
+    headers = {"Authorization": f"Bearer {admin_login(client)}"}
+    product_id = client.post('/product', json={"description": "Słoma", "price": 10.0},
+                             headers=headers).get_json()["product_id"]
+    user_headers = {"Authorization": f"Bearer {user_login(client, 'stajenny')}"}
+    order = {"product_id": product_id, "delivery_date": "2025-04-02", "address": "ul. Polna 1",
+             "transport_type": "TRUCK", "province": "opolskie"}
+    order_id = client.post('/order', headers=user_headers, json={**order, "quantity": 5}).get_json()["order_id"]
+    client.post('/orders/bulk', headers=user_headers, json={"orders": [{**order, "quantity": 2}]})
+    params = {"start_date": "2025-04-01", "end_date": "2025-04-30"}
+
+    assert client.get(f'/order/{order_id}', headers=user_headers).get_json()["total_sum"] == 50.0
+
+    def values():
+        report = client.get('/admin/report', query_string=params, headers=headers).get_json()
+        by_province = client.get('/admin/report/cube', headers=headers,
+                                 query_string={**params, "group_by": "province"}).get_json()
+        by_product = client.get('/admin/report/cube', headers=headers,
+                                query_string={**params, "group_by": "product"}).get_json()
+        export = client.get('/admin/orders/export', headers=headers,
+                            query_string={**params, "format": "ndjson"}).get_data(as_text=True)
+        return (report["total_sum"], by_province["totals"]["order_value"], by_product["totals"]["order_value"],
+                sum(json.loads(line)["order_value"] for line in export.splitlines()))
+
+    assert values() == (70.0, 70.0, 70.0, 70.0)
+    assert test_app.test_cli_runner().invoke(args=["rebuild-rollups"]).exit_code == 0
+    assert values() == (70.0, 70.0, 70.0, 70.0)
+
+
+def test_upgrade_db_migrates_legacy_orders(tmp_path):
+    """
+    Migracja starej bazy: tekstowa kolumna delivery_date -> DATE,
+    indeksy zamówień i przeliczone agregaty raportów.
+    """
+    db_path = tmp_path / 'legacy.db'
+    legacy = sqlite3.connect(db_path)
+    legacy.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(50) NOT NULL UNIQUE,
+            email VARCHAR(120) NOT NULL UNIQUE, password VARCHAR(200) NOT NULL, is_admin BOOLEAN);
+        CREATE TABLE products (id INTEGER PRIMARY KEY, description VARCHAR(200) NOT NULL,
+            price FLOAT NOT NULL, image_hash VARCHAR(64));
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, product_id INTEGER NOT NULL,
+            delivery_date VARCHAR(50) NOT NULL, address VARCHAR(200) NOT NULL,
+            transport_type VARCHAR(7) NOT NULL, province VARCHAR(18) NOT NULL);
+        INSERT INTO users VALUES (1, 'jan', 'jan@example.com', 'x', 0);
+        INSERT INTO products VALUES (1, 'Owies', 10.0, NULL);
+        INSERT INTO orders VALUES (1, 1, 1, '2025-05-20', 'ul. Polna 1', 'TRUCK', 'MAZOWIECKIE');
+        INSERT INTO orders VALUES (2, 1, 1, '2025-5-3', 'ul. Polna 1', 'PICKUP', 'OPOLE');
+        INSERT INTO orders VALUES (3, 1, 1, '2025-06-01', 'ul. Polna 1', 'COURIER', 'OPOLE');
+    """)
+    legacy.commit()
+    legacy.close()
+
+    app = create_app(test_config={
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'IMAGE_STORE_PATH': str(tmp_path / 'images'),
+    })
+    # init-db dotwarza nowe tabele (np. transport_assignments z kluczem obcym do orders)
+    assert app.test_cli_runner().invoke(args=["init-db"]).exit_code == 0
+    result = app.test_cli_runner().invoke(args=["upgrade-db", "--batch-size", "2"])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        # Przebudowa orders nie może przepiąć kluczy obcych innych tabel na tabelę tymczasową
+        assert {fk['referred_table'] for fk in inspect(db.engine).get_foreign_keys('transport_assignments')} == \
+            {'orders', 'vehicles'}
+        assert db.session.execute(text(
+            "SELECT count(*) FROM sqlite_master WHERE sql LIKE '%orders_old%' OR sql LIKE '%orders_new%'"
+        )).scalar() == 0
+        columns = {c['name']: c['type'] for c in inspect(db.engine).get_columns('orders')}
+        assert isinstance(columns['delivery_date'], Date)
+        index_names = {i['name'] for i in inspect(db.engine).get_indexes('orders')}
+        assert {'ix_orders_delivery_date_province', 'ix_orders_user_id_id',
+                'ix_orders_product_id'} <= index_names
+        orders = Order.query.order_by(Order.id).all()
+        assert [o.delivery_date for o in orders] == [date(2025, 5, 20), date(2025, 5, 3), date(2025, 6, 1)]
+        assert orders[1].province == Province.OPOLE
+        # Cena z chwili zamówienia nie była zapisywana - uzupełniona bieżącą ceną
+        assert [o.unit_price for o in orders] == [10.0, 10.0, 10.0]
+        assert report_from_rollups(date(2025, 5, 1), date(2025, 5, 31)) == \
+            (2, 20.0, {"mazowieckie": 1, "opolskie": 1})
+
+    # Ponowne uruchomienie niczego nie psuje
+    assert app.test_cli_runner().invoke(args=["upgrade-db"]).exit_code == 0
+
+
+def test_upgrade_db_moves_product_images_to_store(tmp_path):
+    """
+    Migracja starej bazy z obrazami w products.image (BLOB): obrazy trafiają
+    do magazynu obrazów, produkty dostają image_hash, a kolumna image znika.
+    """
+    png = b'\x89PNG\r\n\x1a\n' + b'obraz-produktu'
+    db_path = tmp_path / 'legacy.db'
+    legacy = sqlite3.connect(db_path)
+    legacy.executescript("""
+        CREATE TABLE products (id INTEGER PRIMARY KEY, description VARCHAR(200) NOT NULL,
+            price FLOAT NOT NULL, image BLOB);
+        INSERT INTO products VALUES (2, 'Bez obrazu', 3.0, NULL);
+    """)
+    legacy.executemany("INSERT INTO products VALUES (?, ?, ?, ?)",
+                       [(1, 'Owies', 10.0, png), (3, 'Owies drugi', 11.0, png)])
+    legacy.commit()
+    legacy.close()
+
+    app = create_app(test_config={
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'IMAGE_STORE_PATH': str(tmp_path / 'images'),
+    })
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=["init-db"]).exit_code == 0
+    result = runner.invoke(args=["upgrade-db"])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        assert 'image' not in {c['name'] for c in inspect(db.engine).get_columns('products')}
+    client = app.test_client()
+    products = client.get('/products').get_json()
+    digest = hashlib.sha256(png).hexdigest()
+    assert [p["image_hash"] for p in products] == [digest, None, digest]
+    assert client.get(products[0]["image_url"]).data == png
+
+    assert runner.invoke(args=["upgrade-db"]).exit_code == 0
+
+
 def test_generate_report_non_admin(client):
     """
     Sprawdza, czy użytkownik niebędący adminem nie może generować raportów.
@@ -844,6 +2141,85 @@ def test_my_orders_success(client):
         assert "transport_type" in order
         assert "province" in order
 
+    # 5. Tryb strumieniowy zwraca te same dane
+    stream_resp = client.get('/my_orders',
+                             query_string={"stream": 1},
+                             headers={"Authorization": f"Bearer {user_token}"})
+    assert stream_resp.status_code == 200
+    assert stream_resp.get_json() == my_orders
+
+def test_my_orders_pagination_and_filters(client):
+    """
+    /my_orders: stronicowanie kluczem, filtr zakresu dat dostawy oraz stała
+    liczba zapytań SQL niezależnie od liczby zamówień (brak N+1).
+    """
+    admin_token = admin_login(client)
+    product_ids = [
+        client.post('/product', json={"description": f"Produkt {i}", "price": 10.0},
+                    headers={"Authorization": f"Bearer {admin_token}"}).get_json()["product_id"]
+        for i in range(3)
+    ]
+    user_token = user_login(client, "stały_klient")
+    headers = {"Authorization": f"Bearer {user_token}"}
+    items = [{
+        "product_id": product_ids[i % 3],
+        "delivery_date": f"2025-{1 + i % 6:02d}-15",
+        "address": "ul. Polna 1",
+        "transport_type": "COURIER",
+        "province": "lubelskie"
+    } for i in range(30)]
+    order_ids = client.post('/orders/bulk', json={"orders": items}, headers=headers).get_json()["order_ids"]
+
+    with assert_max_queries(1):
+        first_page = client.get('/my_orders', query_string={"limit": 25}, headers=headers)
+    assert [o["order_id"] for o in first_page.get_json()] == order_ids[:25]
+    assert first_page.get_json()[0]["product_description"] == "Produkt 0"
+
+    second_page = client.get('/my_orders', headers=headers, query_string={
+        "limit": 25, "after": first_page.headers["X-Next-Cursor"]
+    })
+    assert [o["order_id"] for o in second_page.get_json()] == order_ids[25:]
+    assert "X-Next-Cursor" not in second_page.headers
+
+    in_range = client.get('/my_orders', headers=headers, query_string={
+        "start_date": "2025-02-01", "end_date": "2025-03-31"
+    }).get_json()
+    assert len(in_range) == 10
+    assert all("2025-02" <= o["delivery_date"] <= "2025-03-31" for o in in_range)
+
+    assert client.get('/my_orders', headers=headers,
+                      query_string={"start_date": "15-02-2025"}).status_code == 400
+
+
+def test_get_order(client):
+    """
+    Szczegóły zamówienia dostępne tylko dla jego autora.
+    """
+    admin_token = admin_login(client)
+    product_id = client.post('/product', json={"description": "Kukurydza", "price": 6.5},
+                             headers={"Authorization": f"Bearer {admin_token}"}).get_json()["product_id"]
+    user_token = user_login(client, "rolnik")
+    order_id = client.post('/order', json={
+        "product_id": product_id,
+        "delivery_date": "2025-05-20",
+        "address": "ul. Rolna 10",
+        "transport_type": "TRUCK",
+        "province": "podlaskie"
+    }, headers={"Authorization": f"Bearer {user_token}"}).get_json()["order_id"]
+
+    resp = client.get(f'/order/{order_id}', headers={"Authorization": f"Bearer {user_token}"})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["product_description"] == "Kukurydza"
+    assert data["total_sum"] == 6.5
+    assert data["province"] == "podlaskie"
+    assert data["image_url"] is None
+
+    other_token = user_login(client, "sąsiad")
+    resp = client.get(f'/order/{order_id}', headers={"Authorization": f"Bearer {other_token}"})
+    assert resp.status_code == 403
+
+
 def test_my_orders_no_auth(client):
     """
     Próba pobrania zamówień bez tokena JWT -> 401 (Unauthorized).
@@ -917,6 +2293,27 @@ def test_delete_product_success(client):
     assert get_resp.status_code == 404
     assert get_resp.get_json()["msg"] == "Produkt nie istnieje"
 
+def test_delete_product_with_orders_conflict(client):
+    """
+    Produktu z zamówieniami nie można usunąć (409) - zamówienie nadal
+    pokazuje opis i cenę produktu.
+    """
+    admin_headers = {"Authorization": f"Bearer {admin_login(client)}"}
+    product_id = client.post('/product', json={"description": "Len", "price": 12.0},
+                             headers=admin_headers).get_json()["product_id"]
+    user_headers = {"Authorization": f"Bearer {user_login(client, 'lniarz')}"}
+    order_id = client.post('/order', headers=user_headers, json={
+        "product_id": product_id, "delivery_date": "2025-05-15", "address": "ul. Polna 1",
+        "transport_type": "PICKUP", "province": "opolskie"
+    }).get_json()["order_id"]
+
+    resp = client.delete(f'/product/{product_id}', headers=admin_headers)
+    assert resp.status_code == 409
+    assert client.get(f'/product/{product_id}').status_code == 200
+    order = client.get(f'/order/{order_id}', headers=user_headers).get_json()
+    assert order["product_description"] == "Len"
+
+
 def test_delete_product_no_auth(client):
     """
     Próba usunięcia produktu bez tokena JWT -> 401 (Unauthorized).
@@ -988,3 +2385,232 @@ def test_delete_product_not_found(client):
                                 headers={"Authorization": f"Bearer {admin_token}"})
     assert delete_resp.status_code == 404
     assert delete_resp.get_json()["msg"] == "Produkt nie istnieje"
+
+
+def test_metrics_endpoint(client):
+    """
+    /metrics w formacie Prometheusa: liczniki i histogramy czasu per wzorzec
+    trasy (a nie konkretny URL) oraz liczba zapytań SQL wykonanych w trasie.
+    """
+    from prometheus_client import REGISTRY
+
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    route = '/product/<int:product_id>'
+    before = sample('http_requests_total', method='GET', route=route, status='404')
+    queries_before = sample('db_queries_total', route=route)
+    client.get('/product/123456')
+    client.get('/product/654321')
+    client.get('/nie-ma-takiej-trasy')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_bucket{' in body
+    assert 'route="/product/<int:product_id>"' in body
+    assert '/product/123456' not in body
+    assert 'route="<unmatched>"' in body
+    assert 'db_pool_connections_in_use' in body
+    assert sample('http_requests_total', method='GET', route=route, status='404') == before + 2
+    assert sample('db_queries_total', route=route) >= queries_before + 2
+
+
+# Maksymalna liczba zapytań SQL na endpoint - nie może zależeć od liczby
+# produktów i zamówień (zapytanie w pętli po wierszach = N+1)
+ENDPOINT_QUERY_BUDGETS = [
+    ('/products', 'anon', 3),
+    ('/product/{product_id}', 'anon', 1),
+    ('/products/search?q=Produkt', 'anon', 1),
+    ('/my_orders', 'user', 1),
+    ('/order/{order_id}', 'user', 1),
+    ('/user', 'user', 1),
+    ('/admin/report?start_date=2025-01-01&end_date=2025-01-31', 'admin', 1),
+    ('/admin/report/cube?start_date=2025-01-01&end_date=2025-01-31&group_by=product,province', 'admin', 1),
+    ('/admin/orders/export?start_date=2025-01-01&end_date=2025-01-31&format=ndjson', 'admin', 1),
+]
+
+
+@pytest.mark.parametrize("rows", [3, 40])
+def test_endpoint_query_budgets(client, rows):
+    """
+    Liczba zapytań SQL endpointów mieści się w ENDPOINT_QUERY_BUDGETS
+    zarówno dla kilku, jak i kilkudziesięciu produktów i zamówień.
+    """
+    headers = {
+        'anon': {},
+        'admin': {"Authorization": f"Bearer {admin_login(client)}"},
+        'user': {"Authorization": f"Bearer {user_login(client, 'klient')}"},
+    }
+    product_ids = [
+        client.post('/product', json={"description": f"Produkt {i}", "price": 1.0 + i},
+                    headers=headers['admin']).get_json()["product_id"]
+        for i in range(rows)
+    ]
+    with assert_max_queries(4):
+        order_ids = client.post('/orders/bulk', headers=headers['user'], json={"orders": [{
+            "product_id": product_ids[i % rows],
+            "delivery_date": f"2025-01-{1 + i % 28:02d}",
+            "address": "ul. Polna 1",
+            "transport_type": "TRUCK",
+            "province": "lubelskie"
+        } for i in range(rows)]}).get_json()["order_ids"]
+
+    for path, role, budget in ENDPOINT_QUERY_BUDGETS:
+        url = path.format(product_id=product_ids[-1], order_id=order_ids[-1])
+        with assert_max_queries(budget):
+            response = client.get(url, headers=headers[role])
+            # Odpowiedzi strumieniowe czytają bazę dopiero przy wysyłaniu treści
+            response.get_data()
+        assert response.status_code == 200, url
+
+
+def test_slow_query_log_and_query_headers(client, test_app, caplog):
+    """
+    Zapytania powyżej SQL_SLOW_QUERY_MS trafiają do logu z parametrami
+    i żądaniem; SQL_QUERY_HEADERS dodaje liczbę zapytań do odpowiedzi.
+    """
+    headers = {"Authorization": f"Bearer {user_login(client, 'klient')}"}
+    test_app.config['SQL_SLOW_QUERY_MS'] = 0
+    test_app.config['SQL_QUERY_HEADERS'] = True
+
+    with caplog.at_level("WARNING", logger="query_log"):
+        response = client.get('/my_orders', query_string={"start_date": "2031-05-06"}, headers=headers)
+    assert response.headers["X-Query-Count"] == "1"
+    assert float(response.headers["X-Query-Time-Ms"]) >= 0
+    [record] = caplog.records
+    assert "GET /my_orders" in record.getMessage()
+    assert "FROM orders" in record.getMessage()
+    assert "2031-05-06" in record.getMessage()
+
+    # Log podaje wzorzec trasy, a nie ścieżkę z identyfikatorem
+    caplog.clear()
+    with caplog.at_level("WARNING", logger="query_log"):
+        client.get('/product/123456')
+    assert "GET /product/<int:product_id>)" in caplog.records[0].getMessage()
+
+    test_app.config['SQL_QUERY_HEADERS'] = False
+    assert "X-Query-Count" not in client.get('/products').headers
+
+    with pytest.raises(AssertionError, match="Wykonano 2 zapytań SQL, dozwolone 1"):
+        with assert_max_queries(1):
+            db.session.execute(text("SELECT 1"))
+            db.session.execute(text("SELECT 2"))
+    with record_queries() as statements:
+        db.session.execute(text("SELECT 3"))
+    assert statements == ["SELECT 3"]
+
+
+def test_pack_orders():
+    """
+    Bin packing zamówień: ładowność nie jest przekraczana, kurs obejmuje
+    jedno województwo, najpierw jadą pojazdy z miejscowej bazy, a do małego
+    ładunku wybierany jest najmniejszy pasujący pojazd.
+    """
+    truck, courier = TransportType.TRUCK, TransportType.COURIER
+    lub, maz = Province.LUBELSKIE, Province.MAZOWIECKIE
+    orders = [
+        (1, 10, lub, truck), (2, 8, lub, truck), (3, 6, lub, truck), (4, 4, lub, truck),
+        (5, 2, maz, truck), (6, 40, maz, truck), (7, 1, lub, courier), (8, 3, maz, truck),
+    ]
+    vehicles = [
+        (101, 18, lub, truck), (102, 12, lub, truck), (103, 33, maz, truck),
+        (104, 8, maz, truck), (105, 2, lub, courier),
+    ]
+    trips, unassigned = pack_orders(orders, vehicles)
+    by_vehicle = {t["vehicle_id"]: t for t in trips}
+
+    # 40 palet nie mieści się w żadnym pojeździe
+    assert unassigned == [6]
+    # Lubelskie: 28 palet w dwóch miejscowych ciężarówkach (18 + 12)
+    assert sorted(by_vehicle[101]["order_ids"] + by_vehicle[102]["order_ids"]) == [1, 2, 3, 4]
+    # Mazowieckie: 5 palet jedzie mniejszą z miejscowych ciężarówek zamiast 33-paletowej
+    assert by_vehicle[104]["order_ids"] == [8, 5]
+    assert 103 not in by_vehicle
+    assert by_vehicle[105]["order_ids"] == [7]
+    for trip in trips:
+        assert trip["load"] <= trip["capacity"]
+        assert {orders[i - 1][2] for i in trip["order_ids"]} == {trip["province"]}
+
+    # Bez miejscowych pojazdów zamówienia rozwożą wolne pojazdy z innych baz
+    trips, unassigned = pack_orders([(1, 5, lub, truck), (2, 5, maz, truck)], [(103, 33, maz, truck)])
+    assert unassigned == [1]
+    trips, unassigned = pack_orders([(1, 5, lub, truck)], [(103, 33, maz, truck)])
+    assert unassigned == [] and trips[0]["vehicle_id"] == 103 and trips[0]["province"] == lub
+
+
+def test_fleet_and_transport_plan(client):
+    """
+    Flota i plan transportów: pojazdy z kalendarzem niedostępności,
+    plan dnia zapisany w bazie i zastępowany przy ponownym planowaniu.
+    """
+    admin = {"Authorization": f"Bearer {admin_login(client)}"}
+    user = {"Authorization": f"Bearer {user_login(client, 'rolnik')}"}
+
+    def add_vehicle(registration, transport_type, capacity, province="lubelskie"):
+        resp = client.post('/admin/vehicles', headers=admin, json={
+            "registration": registration, "transport_type": transport_type,
+            "capacity": capacity, "depot_province": province
+        })
+        assert resp.status_code == 201, resp.get_json()
+        return resp.get_json()["vehicle_id"]
+
+    big = add_vehicle("lu 12345", "TRUCK", 24)
+    small = add_vehicle("LU 23456", "TRUCK", 10)
+    van = add_vehicle("LU 34567", "COURIER", 4)
+    assert client.post('/admin/vehicles', headers=admin, json={
+        "registration": "LU 12345", "transport_type": "TRUCK", "capacity": 5, "depot_province": "lubelskie"
+    }).status_code == 400
+    assert client.post('/admin/vehicles', headers=admin, json={
+        "registration": "LU 99999", "transport_type": "PICKUP", "capacity": 5, "depot_province": "lubelskie"
+    }).status_code == 400
+    assert client.post('/admin/vehicles', headers=user, json={}).status_code == 403
+
+    # Duża ciężarówka w serwisie 14-16 maja
+    resp = client.post(f'/admin/vehicles/{big}/unavailability', headers=admin, json={
+        "start_date": "2025-05-14", "end_date": "2025-05-16", "reason": "przegląd"
+    })
+    assert resp.status_code == 201
+    available = client.get('/admin/vehicles', headers=admin, query_string={"date": "2025-05-15"}).get_json()
+    assert [v["vehicle_id"] for v in available] == [small, van]
+    assert len(client.get('/admin/vehicles', headers=admin).get_json()) == 3
+
+    product_id = client.post('/product', json={"description": "Pszenica", "price": 1.0},
+                             headers=admin).get_json()["product_id"]
+    def order(quantity, transport_type="TRUCK", day="2025-05-15"):
+        return {"product_id": product_id, "delivery_date": day, "address": "ul. Polna 1",
+                "transport_type": transport_type, "province": "lubelskie", "quantity": quantity}
+    bad = client.post('/order', headers=user, json=order(0))
+    assert bad.status_code == 400
+    order_ids = client.post('/orders/bulk', headers=user, json={"orders": [
+        order(6), order(4), order(12), order(3, "COURIER"), order(2, "PICKUP"), order(5, day="2025-05-20")
+    ]}).get_json()["order_ids"]
+    assert client.get(f'/order/{order_ids[0]}', headers=user).get_json()["quantity"] == 6
+
+    summary = client.post('/admin/transport-plan', headers=admin, json={"date": "2025-05-15"}).get_json()
+    # Bez dużej ciężarówki zostaje 10 palet ładowności - zamówienie 12 palet czeka
+    assert summary == {
+        "date": "2025-05-15", "orders": 4, "assigned": 3, "vehicles_used": 2,
+        "unassigned_order_ids": [order_ids[2]],
+    }
+    plan = client.get('/admin/transport-plan', headers=admin, query_string={"date": "2025-05-15"}).get_json()
+    assert [(t["vehicle_id"], t["load"], t["order_ids"]) for t in plan["trips"]] == [
+        (small, 10, [order_ids[0], order_ids[1]]),
+        (van, 3, [order_ids[3]]),
+    ]
+    assert plan["trips"][0]["registration"] == "LU 23456"
+    assert client.get(f'/order/{order_ids[0]}', headers=user).get_json()["vehicle"] == "LU 23456"
+    assert client.get(f'/order/{order_ids[2]}', headers=user).get_json()["vehicle"] is None
+
+    # Po wycofaniu dostawczaka i przesunięciu serwisu plan jest liczony od nowa
+    assert client.put(f'/admin/vehicles/{van}', headers=admin, json={"active": False}).status_code == 200
+    client.put(f'/admin/vehicles/{big}', headers=admin, json={"capacity": 33})
+    db.session.query(VehicleUnavailability).delete()
+    db.session.commit()
+    summary = client.post('/admin/transport-plan', headers=admin, json={"date": "2025-05-15"}).get_json()
+    assert summary["assigned"] == 3 and summary["unassigned_order_ids"] == [order_ids[3]]
+    assert db.session.query(TransportAssignment).count() == 3
+
+    assert client.post('/admin/transport-plan', headers=admin, json={}).status_code == 400
+    assert client.get('/admin/transport-plan', headers=user, query_string={"date": "2025-05-15"}).status_code == 403
@@ -0,0 +1,142 @@
+# thumbnails.py
+
+import importlib.util
+import io
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import wait
+
+from flask import current_app
+
+from executors import add_done_callback, native_thread_pool
+
+# Pillow jest opcjonalny - bez niego serwujemy tylko oryginały. Importujemy
+# go dopiero przy pierwszej miniaturze, żeby nie wydłużać startu workerów.
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+logger = logging.getLogger(__name__)
+
+# Warianty obrazów: nazwa -> maksymalny wymiar (dłuższy bok) w pikselach
+VARIANTS = {
+    "thumb": 128,
+    "medium": 512,
+}
+
+
+class ThumbnailPipeline:
+    """
+    Generuje w tle pomniejszone warianty obrazów produktów (VARIANTS)
+    i zapisuje je w magazynie obrazów obok oryginału.
+
+    Praca odbywa się w puli wątków tworzonej leniwie przy pierwszym zleceniu,
+    więc aplikacja utworzona przed fork() (gunicorn --preload) nie dziedziczy
+    martwych wątków. Dopóki wariant nie powstanie, endpoint obrazu
+    serwuje oryginał.
+
+    Obrazy, których nie udało się przetworzyć, nie są zlecane ponownie;
+    pamiętamy najwyżej max_failed ostatnio użytych (LRU).
+    """
+
+    def __init__(self, store, max_workers=2, image_format="WEBP", quality=80, max_failed=1024):
+        self.store = store
+        self.max_workers = max_workers
+        self.quality = quality
+        self.image_format = image_format
+        self.max_failed = max_failed
+        self._executor = None
+        self._pending = {}
+        self._failed = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return PILLOW_AVAILABLE
+
+    def schedule(self, digest):
+        """Zleca wygenerowanie wariantów obrazu (jeśli jeszcze nie istnieją)."""
+        if not self.enabled or self._known_failed(digest):
+            return None
+        if all(self.store.exists(digest, variant) for variant in VARIANTS):
+            return None
+        with self._lock:
+            if digest in self._pending:
+                return self._pending[digest]
+            if self._executor is None:
+                self._executor = native_thread_pool(self.max_workers, "thumbnails")
+            future = self._executor.submit(self._generate, digest)
+            self._pending[digest] = future
+        add_done_callback(future, lambda done: self._done(digest, done))
+        return future
+
+    def wait(self, timeout=None):
+        """Czeka na zakończenie wszystkich zleconych zadań (np. w testach)."""
+        with self._lock:
+            futures = list(self._pending.values())
+        wait(futures, timeout=timeout)
+
+    def _done(self, digest, future):
+        # Błąd obsługujemy tutaj, a nie w _generate: pod gevent _generate działa
+        # w wątku systemowym, który nie może czekać na blokady gevent (także w logging)
+        error = future.result()
+        if error is not None:
+            # Uszkodzony lub nieobsługiwany obraz - zostajemy przy oryginale
+            logger.warning("Nie udało się wygenerować miniatur obrazu %s", digest, exc_info=error)
+        with self._lock:
+            self._pending.pop(digest, None)
+            if error is not None:
+                self._failed[digest] = True
+                self._failed.move_to_end(digest)
+                while len(self._failed) > self.max_failed:
+                    self._failed.popitem(last=False)
+
+    def _known_failed(self, digest):
+        with self._lock:
+            if digest not in self._failed:
+                return False
+            self._failed.move_to_end(digest)
+            return True
+
+    def _output_format(self):
+        from PIL import features
+        if self.image_format == "WEBP" and not features.check("webp"):
+            self.image_format = "JPEG"
+        return self.image_format
+
+    def _generate(self, digest):
+        """Tworzy warianty obrazu; zwraca wyjątek, jeśli się nie udało (obsługuje go _done)."""
+        from PIL import Image
+        try:
+            with Image.open(self.store.path(digest)) as original:
+                original.load()
+                for variant, size in VARIANTS.items():
+                    self.store.put_variant(digest, variant, self._resize(original, size))
+        except Exception as e:
+            return e
+        return None
+
+    def _resize(self, original, size):
+        image_format = self._output_format()
+        image = original.copy()
+        image.thumbnail((size, size))
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, quality=self.quality)
+        return buffer.getvalue()
+
+
+def init_thumbnails(app, store):
+    pipeline = ThumbnailPipeline(
+        store,
+        max_workers=app.config.get('THUMBNAIL_WORKERS', 2),
+        image_format=app.config.get('THUMBNAIL_FORMAT', 'WEBP'),
+        quality=app.config.get('THUMBNAIL_QUALITY', 80),
+        max_failed=app.config.get('THUMBNAIL_FAILED_MAX_ENTRIES', 1024),
+    )
+    app.extensions['thumbnails'] = pipeline
+    return pipeline
+
+
+def get_thumbnails():
+    return current_app.extensions['thumbnails']
@@ -0,0 +1,112 @@
+# user_cache.py
+
+import threading
+import time
+import weakref
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import event
+
+from db_models import db, User
+
+# Dane użytkownika potrzebne do autoryzacji - bez obiektu ORM,
+# więc wpis cache nie jest związany z żadną sesją
+CachedUser = namedtuple('CachedUser', ['id', 'username', 'email', 'is_admin'])
+
+
+class UserCache:
+    """
+    Ograniczony cache LRU użytkowników z czasem życia wpisu (ttl sekund).
+
+    Zmiana użytkownika zapisana przez ORM w tym procesie od razu usuwa
+    jego wpis (listener after_update/after_delete). Pozostałe procesy
+    (workery gunicorna) widzą zmianę roli najpóźniej po ttl sekundach.
+    ttl=0 wyłącza cache.
+    """
+
+    def __init__(self, max_entries=1024, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Zwraca CachedUser albo None, jeśli użytkownik nie istnieje."""
+        key = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        row = db.session.query(User.id, User.username, User.email, User.is_admin).filter(
+            User.id == user_id
+        ).first()
+        user = CachedUser(*row) if row is not None else None
+        if self.ttl > 0 and user is not None:
+            with self._lock:
+                self._entries[key] = (now + self.ttl, user)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id=None):
+        """Usuwa wpis użytkownika (albo wszystkie wpisy, gdy user_id=None)."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(user_id), None)
+
+
+def role_claims(user):
+    """Dodatkowe claims tokenu JWT z rolą użytkownika (ustawiane przy logowaniu)."""
+    return {"is_admin": bool(user.is_admin)}
+
+
+def get_current_user():
+    """Zalogowany użytkownik (CachedUser) z cache albo None."""
+    return get_user_cache().get(get_jwt_identity())
+
+
+def current_user_is_admin():
+    """
+    Sprawdza rolę admina bieżącego żądania. Token z claim is_admin=false
+    jest odrzucany bez zapytania do bazy; dla admina (i starszych tokenów
+    bez claim) rola potwierdzana jest w cache użytkowników, żeby odebranie
+    uprawnień działało bez czekania na wygaśnięcie tokenu.
+    """
+    if get_jwt().get('is_admin') is False:
+        return False
+    user = get_current_user()
+    return user is not None and user.is_admin
+
+
+# Cache wszystkich aplikacji w procesie - listener ORM jest globalny dla modelu
+_caches = weakref.WeakSet()
+
+
+def _invalidate_user(mapper, connection, target):
+    for cache in list(_caches):
+        cache.invalidate(target.id)
+
+
+def init_user_cache(app):
+    cache = UserCache(
+        max_entries=app.config.get('USER_CACHE_MAX_ENTRIES', 1024),
+        ttl=app.config.get('USER_CACHE_TTL', 30.0),
+    )
+    app.extensions['user_cache'] = cache
+    _caches.add(cache)
+    if not event.contains(User, 'after_update', _invalidate_user):
+        event.listen(User, 'after_update', _invalidate_user)
+        event.listen(User, 'after_delete', _invalidate_user)
+    return cache
+
+
+def get_user_cache():
+    return current_app.extensions['user_cache']
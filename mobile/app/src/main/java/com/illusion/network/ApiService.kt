@@ -4,7 +4,7 @@ import retrofit2.Retrofit
 import retrofit2.converter.gson.GsonConverterFactory
 
 object ApiService {
-    private const val BASE_URL = "http://10.0.2.2:5000"
+    const val BASE_URL = "http://10.0.2.2:5000"
 
     val instance: ApiServiceInterface by lazy {
         Retrofit.Builder()
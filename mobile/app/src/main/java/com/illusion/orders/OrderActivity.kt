@@ -2,9 +2,7 @@ package com.illusion.orders
 
 import android.app.DatePickerDialog
 import android.content.Intent
-import android.graphics.BitmapFactory
 import android.os.Bundle
-import android.util.Base64
 import android.widget.*
 import androidx.appcompat.app.AppCompatActivity
 import com.bumptech.glide.Glide
@@ -55,11 +53,10 @@ class OrderActivity : AppCompatActivity() {
                 if (response.isSuccessful) {
                     val product = response.body()
                     if (product != null) {
-                        product.image?.let {
-                            val imageBytes = Base64.decode(it, Base64.DEFAULT)
-                            val bitmap =
-                                BitmapFactory.decodeByteArray(imageBytes, 0, imageBytes.size)
-                            productImageView.setImageBitmap(bitmap)
+                        product.image_url?.let {
+                            Glide.with(this@OrderActivity)
+                                .load(ApiService.BASE_URL + it)
+                                .into(productImageView)
                         }
 
                         productDescription.text = product.description
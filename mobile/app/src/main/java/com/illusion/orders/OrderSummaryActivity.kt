@@ -1,9 +1,7 @@
 package com.illusion.orders
 
 import android.content.Intent
-import android.graphics.BitmapFactory
 import android.os.Bundle
-import android.util.Base64
 import android.widget.Button
 import android.widget.ImageView
 import android.widget.TextView
@@ -50,15 +48,10 @@ class OrderSummaryActivity : AppCompatActivity() {
                         if (summary != null) {
 
                             if (summary != null) {
-                                summary.image?.let {
-                                    val imageBytes = Base64.decode(it, Base64.DEFAULT)
-                                    val bitmap =
-                                        BitmapFactory.decodeByteArray(
-                                            imageBytes,
-                                            0,
-                                            imageBytes.size
-                                        )
-                                    productImageView.setImageBitmap(bitmap)
+                                summary.image_url?.let {
+                                    Glide.with(this@OrderSummaryActivity)
+                                        .load(ApiService.BASE_URL + it)
+                                        .into(productImageView)
                                 }
                             }
 
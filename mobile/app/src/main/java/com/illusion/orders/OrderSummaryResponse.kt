@@ -10,5 +10,5 @@ data class OrderSummaryResponse(
     val transport_type: String,
     val delivery_date: String,
     val product_id: Int,
-    val image: String? = null // Optional field for image
+    val image_url: String? = null // Relative URL of the product image, optional
 )
\ No newline at end of file
@@ -1,14 +1,13 @@
 package com.illusion.products
 
 import android.content.Intent
-import android.graphics.BitmapFactory
 import android.os.Bundle
-import android.util.Base64
 import android.widget.Button
 import android.widget.ImageView
 import android.widget.TextView
 import android.widget.Toast
 import androidx.appcompat.app.AppCompatActivity
+import com.bumptech.glide.Glide
 import com.example.agromobile.R
 import com.illusion.orders.OrderActivity
 import com.illusion.network.ApiService
@@ -43,11 +42,10 @@ class ProductDetailActivity : AppCompatActivity() {
                         productDescriptionView.text = product.description
                         productPriceView.text = "Price: ${product.price} PLN"
 
-                        product.image?.let {
-                            val imageBytes = Base64.decode(it, Base64.DEFAULT)
-                            val bitmap =
-                                BitmapFactory.decodeByteArray(imageBytes, 0, imageBytes.size)
-                            productImageView.setImageBitmap(bitmap)
+                        product.image_url?.let {
+                            Glide.with(this@ProductDetailActivity)
+                                .load(ApiService.BASE_URL + it)
+                                .into(productImageView)
                         }
 
                             // Set up the Order button click listener
@@ -4,5 +4,5 @@ data class ProductDetailResponse(
     val id: Int,
     val description: String,
     val price: Double,
-    val image: String? // Base64-encoded string for image
+    val image_url: String? // Relative URL of the product image, null if none
 )
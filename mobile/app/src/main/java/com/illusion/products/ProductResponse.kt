@@ -4,5 +4,5 @@ data class ProductResponse(
     val id: Int,
     val description: String,
     val price: Double,
-    val image: String? // Base64-encoded string for image, optional
+    val image_url: String? // Relative URL of the product image, optional
 )
\ No newline at end of file
@@ -3,7 +3,7 @@ import { Container, Row, Col, Card, Form, Button } from 'react-bootstrap';
 import { useLocation, useNavigate } from 'react-router';
 import { useAuth } from './AuthContext';
 import { districts, deliveryMethods } from './EnumValues'
-import { addOrder } from './Services';
+import { addOrder, imageUrl } from './Services';
 
 const OrderForm = () => {
 	const [district, setDistrict] = useState('');
@@ -34,7 +34,7 @@ const OrderForm = () => {
 					<Card>
 						<Card.Body>
 							<Card.Title>Product Details</Card.Title>
-							<Card.Img variant="top" src={`data:image/png;base64,${product.image}`} alt="" style={{ maxHeight: '256px', objectFit: 'contain' }} />
+							<Card.Img variant="top" src={imageUrl(product)} alt="" style={{ maxHeight: '256px', objectFit: 'contain' }} />
 							<Card.Text><strong>Description:</strong> {product.description}</Card.Text>
 							<Card.Text><strong>Price:</strong> ${product.price}</Card.Text>
 						</Card.Body>
@@ -1,3 +1,4 @@
+import { imageUrl } from './Services';
 import { Form, Button, Col, Row, Alert, Container } from 'react-bootstrap';
 
 const ProductForm = ({ product, setProduct, onSubmit, loading, error, title }) => {
@@ -65,10 +66,10 @@ const ProductForm = ({ product, setProduct, onSubmit, loading, error, title }) =
 								onChange={handleImageChange}
 							/>
 
-							{product.image && (
+							{(product.image || product.image_url) && (
 								<div className="mt-3">
 									<img
-										src={`data:image/png;base64,${product.image}`}
+										src={product.image ? `data:image/png;base64,${product.image}` : imageUrl(product)}
 										alt="Product"
 										style={{ width: '100px', height: '100px', objectFit: 'cover' }}
 									/>
@@ -1,12 +1,13 @@
 import { useState, useEffect } from "react";
-import { Card, Button, Container, Row, Col } from 'react-bootstrap';
+import { Alert, Card, Button, Container, Row, Col } from 'react-bootstrap';
 import { useNavigate } from "react-router";
 import { useAuth } from "./AuthContext";
-import { delProduct, getProducts } from "./Services";
+import { delProduct, getProducts, imageUrl } from "./Services";
 
 const ProductView = ({ product, isAdmin, onListUpdated }) => {
 	const nav = useNavigate()
 	const auth = useAuth()
+	const [error, setError] = useState(null)
 
 	const handleEdit = e => {
 		e.preventDefault();
@@ -20,14 +21,20 @@ const ProductView = ({ product, isAdmin, onListUpdated }) => {
 
 	const handleDelete = async e => {
 		e.preventDefault();
-		await delProduct(auth, product.id);
-		onListUpdated();
+		setError(null);
+		try {
+			await delProduct(auth, product.id);
+			onListUpdated();
+		} catch (err) {
+			// 409 - produktu z zamówieniami nie można usunąć
+			setError(err.response ? err.response.data.msg : 'Błąd usuwania produktu');
+		}
 	}
 
 
 	return <Col key={product.id} sm={12} md={6} lg={4} className="mb-4">
 		<Card style={{ width: '24rem' }}>
-			<Card.Img variant="top" src={`data:image/png;base64,${product.image}`} alt="" style={{ maxHeight: '256px', objectFit: 'cover' }} />
+			<Card.Img variant="top" src={imageUrl(product)} alt="" style={{ maxHeight: '256px', objectFit: 'cover' }} />
 			<Card.Body>
 				<Card.Title>Produkt {product.id}</Card.Title>
 				<Card.Text>
@@ -49,6 +56,7 @@ const ProductView = ({ product, isAdmin, onListUpdated }) => {
 						}
 					</div>
 				</div>
+				{error && <Alert variant="danger" className="mt-3">{error}</Alert>}
 			</Card.Body>
 		</Card>
 	</Col>
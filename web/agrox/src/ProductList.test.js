@@ -6,6 +6,8 @@ import { BrowserRouter as Router } from "react-router";
 
 jest.mock("./Services", () => ({
   getProducts: jest.fn(),
+  delProduct: jest.fn(),
+  imageUrl: jest.fn(),
 }));
 
 jest.mock("./AuthContext", () => ({
@@ -49,4 +51,23 @@ describe("ProductList", () => {
       expect(screen.getByText("Edytuj")).toBeInTheDocument();
     });
   });
+
+  it("shows the server message when a product cannot be deleted", async () => {
+    const mockProduct = { id: 1, image: "image1", description: "Product 1", price: "10" };
+    useAuth.mockReturnValue({ is_admin: () => true });
+    getProducts.mockResolvedValue({ data: [mockProduct] });
+    delProduct.mockRejectedValue({
+      response: { status: 409, data: { msg: "Nie można usunąć produktu, który ma zamówienia" } },
+    });
+    render(
+      <Router>
+        <ProductList />
+      </Router>
+    );
+    fireEvent.click(await screen.findByText("Usuń"));
+    expect(
+      await screen.findByText("Nie można usunąć produktu, który ma zamówienia")
+    ).toBeInTheDocument();
+    expect(getProducts).toHaveBeenCalledTimes(1);
+  });
 });
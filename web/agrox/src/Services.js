@@ -4,6 +4,8 @@ export const client = axios.create({
 	baseURL: "http://localhost:5000",
 });
 
+export const imageUrl = (product) => product.image_url ? `${client.defaults.baseURL}${product.image_url}` : undefined
+
 const headers = (auth) => { console.log('aaa' + auth.token); return { headers: { Authorization: `Bearer ${auth.token}` } }; };
 
 export const doRegister = (username, email, password) => client.post('register', { username, email, password })